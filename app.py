@@ -5,6 +5,8 @@ print("***********************************")
 print("*** statainer APP STARTING ***")
 print("***********************************")
 
+import signal
+import sys
 import threading
 import time
 import warnings
@@ -28,14 +30,18 @@ from config import (
     APP_SECRET_KEY,
     APP_SECRET_KEY_EPHEMERAL,
     APP_VERSION,
+    AUTH_CACHE_TTL_SECONDS,
     AUTH_ENABLED,
     AUTH_PASSWORD,
     AUTH_USER,
     CADVISOR_URL,
+    DB_MAINTENANCE_INTERVAL_SECONDS,
     DOCKER_SOCKET_URL,
     ENABLE_PROXY_FIX,
     LOGIN_MODE,
+    LOG_SEARCH_CPU_SECONDS,
     MAX_SECONDS,
+    NOTIFICATION_HISTORY_MAX_ROWS,
     PROXY_FIX_X_FOR,
     PROXY_FIX_X_HOST,
     PROXY_FIX_X_PORT,
@@ -54,14 +60,17 @@ from config import (
     SESSION_COOKIE_SECURE,
     SESSION_IDLE_MINUTES,
     STREAM_HEARTBEAT_SECONDS,
+    UPDATE_BATCH_MAX_PARALLEL,
     WAITRESS_THREADS,
     LOGIN_RATE_LIMIT_MAX_ATTEMPTS,
     LOGIN_RATE_LIMIT_WINDOW_SECONDS,
 )
 from docker_client import get_docker_status, initialize_docker_clients
+from rollback_artifacts import rollback_artifacts
 from routes import main_routes
 from sampler import sample_metrics
-from users_db import count_users, init_db
+from update_manager import update_inventory
+from users_db import count_users, init_db, purge_expired_update_history, trim_notification_records
 
 
 def build_content_security_policy():
@@ -131,6 +140,7 @@ def create_app(test_config=None):
         APP_VERSION=APP_VERSION,
         APP_ENV=APP_ENV,
         APP_SECRET_KEY_EPHEMERAL=APP_SECRET_KEY_EPHEMERAL,
+        AUTH_CACHE_TTL_SECONDS=AUTH_CACHE_TTL_SECONDS,
         AUTH_ENABLED=AUTH_ENABLED,
         AUTH_USER=AUTH_USER,
         AUTH_PASSWORD=AUTH_PASSWORD,
@@ -138,6 +148,7 @@ def create_app(test_config=None):
         DOCKER_SOCKET_URL=DOCKER_SOCKET_URL,
         ENABLE_PROXY_FIX=ENABLE_PROXY_FIX,
         LOGIN_MODE=LOGIN_MODE,
+        LOG_SEARCH_CPU_SECONDS=LOG_SEARCH_CPU_SECONDS,
         SAMPLE_INTERVAL=SAMPLE_INTERVAL,
         MAX_SECONDS=MAX_SECONDS,
         PROXY_FIX_X_FOR=PROXY_FIX_X_FOR,
@@ -157,6 +168,7 @@ def create_app(test_config=None):
         SESSION_COOKIE_SAMESITE=SESSION_COOKIE_SAMESITE,
         SESSION_IDLE_MINUTES=SESSION_IDLE_MINUTES,
         STREAM_HEARTBEAT_SECONDS=STREAM_HEARTBEAT_SECONDS,
+        UPDATE_BATCH_MAX_PARALLEL=UPDATE_BATCH_MAX_PARALLEL,
         LOGIN_RATE_LIMIT_MAX_ATTEMPTS=LOGIN_RATE_LIMIT_MAX_ATTEMPTS,
         LOGIN_RATE_LIMIT_WINDOW_SECONDS=LOGIN_RATE_LIMIT_WINDOW_SECONDS,
     )
@@ -212,6 +224,42 @@ def start_sampler_thread():
     print("Sampling thread started.")
 
 
+def run_db_maintenance(interval_seconds=DB_MAINTENANCE_INTERVAL_SECONDS):
+    """Purge expired update history, trim stored notifications and prune rollback images once at startup and then every interval."""
+    while True:
+        try:
+            deleted = purge_expired_update_history()
+            if deleted:
+                print(f"DB maintenance: purged {deleted} expired update history entries.")
+            trimmed = trim_notification_records(keep=NOTIFICATION_HISTORY_MAX_ROWS)
+            if trimmed:
+                print(f"DB maintenance: trimmed {trimmed} old notifications.")
+        except Exception as e:
+            print(f"WARN: DB maintenance failed: {e}")
+        try:
+            pruned = rollback_artifacts.prune()
+            if pruned['removed_images'] or pruned['removed_override_files']:
+                print(
+                    f"Rollback maintenance: removed {len(pruned['removed_images'])} images and "
+                    f"{len(pruned['removed_override_files'])} override files, "
+                    f"reclaimed {pruned['reclaimed_bytes']} bytes."
+                )
+        except Exception as e:
+            print(f"WARN: Rollback image pruning failed: {e}")
+        time.sleep(max(60, int(interval_seconds)))
+
+
+def start_maintenance_thread():
+    maintenance_thread = threading.Thread(target=run_db_maintenance, daemon=True)
+    maintenance_thread.start()
+
+
+def handle_shutdown_signal(signum, _frame):
+    """Turn SIGTERM (docker stop) into a normal exit so atexit hooks flush queued writes."""
+    print(f"Received signal {signum}, shutting down...")
+    sys.exit(0)
+
+
 def initialize_runtime():
     """Prepare auth DB and Docker connectivity without failing the whole app."""
     bootstrap_user = app.config.get("AUTH_USER", "")
@@ -256,7 +304,11 @@ if __name__ == '__main__':
     print("Starting Flask server...")
 
     docker_ready = initialize_runtime()
+    signal.signal(signal.SIGTERM, handle_shutdown_signal)
     start_sampler_thread()
+    start_maintenance_thread()
+    if docker_ready:
+        update_inventory.watch_container_events()
 
     if docker_ready:
         time.sleep(1)
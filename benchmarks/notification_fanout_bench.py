@@ -0,0 +1,126 @@
+"""Latency benchmark for pushover_client.send against local stand-in servers.
+
+Starts one HTTP/1.1 keep-alive server per channel (each answering after a
+fixed delay), points every channel at them, and times send() twice: once the
+old way (channels one after another, a new connection per request) and once
+with the pooled per-channel sessions and concurrent fan-out.
+
+    python benchmarks/notification_fanout_bench.py --sends 50 --delay-ms 20
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pushover_client  # noqa: E402
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without this, delayed ACKs
+    # add ~40 ms to every response on a reused connection.
+    disable_nagle_algorithm = True
+    delay_seconds = 0.0
+
+    def _answer(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        time.sleep(self.delay_seconds)
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    do_POST = _answer
+    do_PUT = _answer
+
+    def log_message(self, *_args):
+        pass
+
+
+def start_server(delay_seconds):
+    handler = type('Handler', (StandInHandler,), {'delay_seconds': delay_seconds})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def configure_channels(urls):
+    pushover_client.PUSHOVER_URL = f"{urls['pushover']}/1/messages.json"
+    pushover_client.TELEGRAM_API_URL = urls['telegram']
+    os.environ.update({
+        'PUSHOVER_TOKEN': 'bench', 'PUSHOVER_USER': 'bench',
+        'SLACK_WEBHOOK_URL': f"{urls['slack']}/hook",
+        'TELEGRAM_BOT_TOKEN': 'bench', 'TELEGRAM_CHAT_ID': '1',
+        'DISCORD_WEBHOOK_URL': f"{urls['discord']}/hook",
+        'NTFY_SERVER_URL': urls['ntfy'], 'NTFY_TOPIC': 'bench',
+        'GENERIC_WEBHOOK_URL': f"{urls['webhook']}/hook",
+    })
+
+
+def send_sequential_unpooled():
+    """The previous behaviour: one channel after another, a new connection each time."""
+    pooled_session = pushover_client._channel_session
+    pushover_client._channel_session = lambda channel_name: requests.Session()
+    try:
+        context = pushover_client.build_notification_context('bench', 'bench', 0)
+        return all(
+            pushover_client.send_channel(name, 'bench', 'bench', 0, context=context)['ok']
+            for name in pushover_client.CHANNEL_NAMES
+        )
+    finally:
+        pushover_client._channel_session = pooled_session
+
+
+def send_pooled_concurrent():
+    return len(pushover_client.send('bench', title='bench')['successful_channels']) == len(pushover_client.CHANNEL_NAMES)
+
+
+def measure(label, sender, sends):
+    sender()  # warm up; opens the pooled connections
+    latencies = []
+    failures = 0
+    for _ in range(sends):
+        started = time.perf_counter()
+        if not sender():
+            failures += 1
+        latencies.append((time.perf_counter() - started) * 1000)
+    print(
+        f'{label:>22}: mean {statistics.mean(latencies):7.1f} ms  '
+        f'p50 {statistics.median(latencies):7.1f} ms  max {max(latencies):7.1f} ms  ({failures} failed sends)'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sends', type=int, default=50)
+    parser.add_argument('--delay-ms', type=float, default=20, help='server response delay per channel')
+    args = parser.parse_args()
+
+    servers = {}
+    urls = {}
+    for name in pushover_client.CHANNEL_NAMES:
+        servers[name], urls[name] = start_server(args.delay_ms / 1000)
+    configure_channels(urls)
+    print(f'{len(servers)} channels, {args.delay_ms:g} ms server delay, {args.sends} sends')
+    try:
+        measure('sequential, unpooled', send_sequential_unpooled, args.sends)
+        measure('concurrent, pooled', send_pooled_concurrent, args.sends)
+    finally:
+        for server in servers.values():
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Microbenchmark for sampler.should_emit_notification.
+
+Feeds the same stream of events (many containers, scope rules, quiet hours,
+cooldown and dedupe on) through the previous implementation, which normalized
+the settings, re-split the rule text, ran fnmatch and swept both state maps
+on every event, and through the compiled NotificationPolicy.
+
+    python benchmarks/notification_policy_bench.py --events 10000 --containers 500
+"""
+
+import argparse
+import fnmatch
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp_dir = tempfile.TemporaryDirectory()
+os.environ['USERS_DB_PATH'] = os.path.join(_tmp_dir.name, 'bench.db')
+
+import users_db  # noqa: E402
+
+users_db.migrate_add_columns_and_role_and_settings()
+
+import sampler  # noqa: E402
+
+SETTINGS = {
+    'project_rule_mode': 'include',
+    'project_rules': 'shop-*\napi-*\nbilling\njobs-*\nreports-?',
+    'container_rule_mode': 'exclude',
+    'container_rules': 'db-*\n*-sidecar\ncron',
+    'silence_enabled': True,
+    'silence_start': '03:00',
+    'silence_end': '03:05',
+    'cooldown_seconds': 60,
+    'dedupe_enabled': True,
+    'dedupe_window_seconds': 300,
+}
+
+
+def legacy_should_emit(event, settings, cooldowns, dedupes):
+    """should_emit_notification as it was before the compiled policy."""
+    effective = sampler.normalize_notification_settings(settings)
+    timestamp = float(event.get('timestamp') or time.time())
+
+    def patterns(raw):
+        return [token.strip().lower() for token in sampler._normalize_rule_text(raw).splitlines() if token.strip()]
+
+    def matches(value, pattern_list):
+        value = str(value or '').strip().lower()
+        return bool(value) and any(fnmatch.fnmatch(value, pattern) for pattern in pattern_list)
+
+    for field, mode_key, rules_key in (('project', 'project_rule_mode', 'project_rules'),
+                                       ('container', 'container_rule_mode', 'container_rules')):
+        pattern_list = patterns(effective.get(rules_key))
+        mode = effective.get(mode_key, 'all')
+        if mode == 'include' and pattern_list and not matches(event.get(field), pattern_list):
+            return False
+        if mode == 'exclude' and pattern_list and matches(event.get(field), pattern_list):
+            return False
+
+    if effective.get('silence_enabled'):
+        start_hour, start_minute = map(int, effective['silence_start'].split(':'))
+        end_hour, end_minute = map(int, effective['silence_end'].split(':'))
+        start, end = start_hour * 60 + start_minute, end_hour * 60 + end_minute
+        local = time.localtime(timestamp)
+        current = local.tm_hour * 60 + local.tm_min
+        if start != end and ((start <= current < end) if start < end else (current >= start or current < end)):
+            return False
+
+    base = f"{event.get('type')}:{event.get('cid')}:"
+    cooldown = int(effective.get('cooldown_seconds', 0) or 0)
+    if cooldown > 0 and cooldowns.get(base) and timestamp - cooldowns[base] < cooldown:
+        return False
+    dedupe_window = int(effective.get('dedupe_window_seconds', 0) or 0)
+    dedupe_key = f"{base}:{event.get('msg', '')}"
+    if effective.get('dedupe_enabled') and dedupe_window > 0:
+        if dedupes.get(dedupe_key) and timestamp - dedupes[dedupe_key] < dedupe_window:
+            return False
+    if cooldown > 0:
+        cooldowns[base] = timestamp
+    if effective.get('dedupe_enabled') and dedupe_window > 0:
+        dedupes[dedupe_key] = timestamp
+    cutoff = timestamp - max(cooldown, dedupe_window) - 60
+    for state_map in (cooldowns, dedupes):
+        for key, ts in list(state_map.items()):
+            if ts < cutoff:
+                state_map.pop(key, None)
+    return True
+
+
+def make_events(count, containers):
+    projects = ['shop-web', 'api-gw', 'billing', 'jobs-nightly', 'reports-1', 'internal']
+    names = ['web', 'worker', 'db-main', 'cache-sidecar', 'cron', 'api']
+    events = []
+    base_ts = 1_700_000_000.0
+    for index in range(count):
+        container = index % containers
+        events.append({
+            'type': ('cpu', 'ram', 'status')[index % 3],
+            'cid': f'c{container:05d}',
+            'container': f'{names[container % len(names)]}-{container}',
+            'project': projects[container % len(projects)],
+            'msg': f'usage spike {index % 7}',
+            'timestamp': base_ts + index * 0.5,
+        })
+    return events
+
+
+def run(label, check, events):
+    started = time.perf_counter()
+    emitted = sum(1 for event in events if check(event))
+    elapsed = time.perf_counter() - started
+    print(f'{label:>16}: {elapsed * 1000:8.1f} ms  {len(events) / elapsed:10.0f} events/s  ({emitted} emitted)')
+    return emitted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=10000)
+    parser.add_argument('--containers', type=int, default=500)
+    args = parser.parse_args()
+
+    events = make_events(args.events, args.containers)
+    legacy_cooldowns, legacy_dedupes = {}, {}
+    legacy_emitted = run('legacy', lambda event: legacy_should_emit(event, SETTINGS, legacy_cooldowns, legacy_dedupes), events)
+
+    sampler.notification_settings.clear()
+    sampler.notification_settings.update(sampler.normalize_notification_settings(SETTINGS))
+    sampler.refresh_notification_policy()
+    sampler.recent_notification_cooldowns.clear()
+    sampler.recent_notification_dedupes.clear()
+    sampler.notification_expiry_heap.clear()
+    compiled_emitted = run('compiled policy', sampler.should_emit_notification, events)
+    if compiled_emitted != legacy_emitted:
+        print(f'WARNING: implementations disagree ({legacy_emitted} vs {compiled_emitted} emitted)')
+
+
+if __name__ == '__main__':
+    main()
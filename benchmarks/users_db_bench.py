@@ -0,0 +1,84 @@
+"""Throughput benchmark for the users_db connection layer.
+
+Runs the same mixed read/write workload the web app generates per request
+(role + column lookups, a settings read, an audit insert) from several
+threads, once with a fresh sqlite3 connection per call (the previous
+behaviour) and once with the pooled WAL connections.
+
+    python benchmarks/users_db_bench.py --threads 8 --requests 500
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import users_db  # noqa: E402
+
+
+def connect_per_call():
+    conn = sqlite3.connect(users_db.get_db_path())
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def simulated_request(worker_id, index):
+    users_db.get_user_role('admin')
+    users_db.get_user_columns('admin')
+    users_db.get_global_setting('notification_settings')
+    users_db.record_audit_event('bench.request', 'bench', 'success', target_id=f'{worker_id}-{index}')
+
+
+def run_workload(threads, requests_per_thread):
+    errors = []
+
+    def worker(worker_id):
+        for index in range(requests_per_thread):
+            try:
+                simulated_request(worker_id, index)
+            except sqlite3.Error as exc:
+                errors.append(exc)
+
+    workers = [threading.Thread(target=worker, args=(worker_id,)) for worker_id in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return (threads * requests_per_thread) / elapsed, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=500, help='requests per thread')
+    args = parser.parse_args()
+
+    pooled_get_db = users_db.get_db
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for label, factory in (('per-call connect', connect_per_call), ('pooled WAL', pooled_get_db)):
+            os.environ['USERS_DB_PATH'] = os.path.join(tmp_dir, f"{label.replace(' ', '_')}.db")
+            users_db.get_db = pooled_get_db
+            users_db.migrate_add_columns_and_role_and_settings()
+            users_db.init_db('admin', 'adminpass')
+            users_db.close_db_connections()
+            if factory is connect_per_call:
+                # A fresh rollback-journal database, as before pooling existed.
+                conn = connect_per_call()
+                conn.execute('PRAGMA journal_mode=DELETE')
+                conn.close()
+            users_db.get_db = factory
+            throughput, errors = run_workload(args.threads, args.requests)
+            print(f'{label:>18}: {throughput:10.1f} req/s  ({errors} locked/errored requests)')
+        users_db.get_db = pooled_get_db
+        users_db.close_db_connections()
+
+
+if __name__ == '__main__':
+    main()
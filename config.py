@@ -53,6 +53,29 @@ CADVISOR_URL = os.environ.get("CADVISOR_URL", "http://cadvisor:8080")
 SAMPLE_INTERVAL = _get_int("SAMPLE_INTERVAL", 5)
 MAX_SECONDS = _get_int("MAX_SECONDS", 86400)
 STREAM_HEARTBEAT_SECONDS = _get_int("STREAM_HEARTBEAT_SECONDS", 15)
+LOG_SEARCH_CPU_SECONDS = _get_int("LOG_SEARCH_CPU_SECONDS", 5)
+DB_MAINTENANCE_INTERVAL_SECONDS = _get_int("DB_MAINTENANCE_INTERVAL_SECONDS", 3600)
+REGISTRY_DIGEST_CACHE_TTL_SECONDS = _get_int("REGISTRY_DIGEST_CACHE_TTL_SECONDS", 900)
+REGISTRY_DIGEST_NEGATIVE_TTL_SECONDS = _get_int("REGISTRY_DIGEST_NEGATIVE_TTL_SECONDS", 120)
+REGISTRY_DIRECT_CHECKS = _get_bool("REGISTRY_DIRECT_CHECKS", False)
+REGISTRY_INSECURE_HOSTS = os.environ.get("REGISTRY_INSECURE_HOSTS", "").strip()
+AUTO_UPDATE_MAX_CONCURRENT = _get_int("AUTO_UPDATE_MAX_CONCURRENT", 2)
+AUTO_UPDATE_PER_REGISTRY_LIMIT = _get_int("AUTO_UPDATE_PER_REGISTRY_LIMIT", 1)
+UPDATE_BATCH_MAX_PARALLEL = _get_int("UPDATE_BATCH_MAX_PARALLEL", 3)
+COMPOSE_PULL_TIMEOUT_SECONDS = _get_int("COMPOSE_PULL_TIMEOUT_SECONDS", 900)
+COMPOSE_UP_TIMEOUT_SECONDS = _get_int("COMPOSE_UP_TIMEOUT_SECONDS", 300)
+ROLLBACK_MAX_IMAGES = _get_int("ROLLBACK_MAX_IMAGES", 20)
+ROLLBACK_MAX_DISK_MB = _get_int("ROLLBACK_MAX_DISK_MB", 10240)
+NOTIFICATION_QUEUE_MAX_PENDING = _get_int("NOTIFICATION_QUEUE_MAX_PENDING", 500)
+NOTIFICATION_WORKERS = _get_int("NOTIFICATION_WORKERS", 4)
+NOTIFICATION_CHANNEL_CONCURRENCY = _get_int("NOTIFICATION_CHANNEL_CONCURRENCY", 2)
+NOTIFICATION_SHUTDOWN_TIMEOUT_SECONDS = _get_int("NOTIFICATION_SHUTDOWN_TIMEOUT_SECONDS", 5)
+NOTIFICATION_RETRY_ATTEMPTS = _get_int("NOTIFICATION_RETRY_ATTEMPTS", 3)
+NOTIFICATION_RETRY_BASE_DELAY_MS = _get_int("NOTIFICATION_RETRY_BASE_DELAY_MS", 500)
+NOTIFICATION_RETRY_MAX_DELAY_SECONDS = _get_int("NOTIFICATION_RETRY_MAX_DELAY_SECONDS", 30)
+NOTIFICATION_BREAKER_FAILURE_THRESHOLD = _get_int("NOTIFICATION_BREAKER_FAILURE_THRESHOLD", 5)
+NOTIFICATION_BREAKER_COOLDOWN_SECONDS = _get_int("NOTIFICATION_BREAKER_COOLDOWN_SECONDS", 60)
+NOTIFICATION_HISTORY_MAX_ROWS = _get_int("NOTIFICATION_HISTORY_MAX_ROWS", 20000)
 
 AUTH_ENABLED = _get_bool("AUTH_ENABLED", True)
 LOGIN_MODE = os.environ.get("LOGIN_MODE", "popup").strip().lower() or "popup"
@@ -67,6 +90,7 @@ SESSION_COOKIE_SAMESITE = os.environ.get("SESSION_COOKIE_SAMESITE", "Lax").strip
 
 LOGIN_RATE_LIMIT_MAX_ATTEMPTS = _get_int("LOGIN_RATE_LIMIT_MAX_ATTEMPTS", 5)
 LOGIN_RATE_LIMIT_WINDOW_SECONDS = _get_int("LOGIN_RATE_LIMIT_WINDOW_SECONDS", 300)
+AUTH_CACHE_TTL_SECONDS = _get_int("AUTH_CACHE_TTL_SECONDS", 60)
 
 TRUSTED_PROXY_HOPS = _get_int("TRUSTED_PROXY_HOPS", 0)
 ENABLE_PROXY_FIX = _get_bool("ENABLE_PROXY_FIX", TRUSTED_PROXY_HOPS > 0)
@@ -0,0 +1,501 @@
+# -*- coding: utf-8 -*-
+
+import codecs
+import collections
+import datetime
+import heapq
+import itertools
+import json
+import logging
+import queue
+import re
+import select
+import subprocess
+import sys
+import threading
+import time
+import zlib
+
+LOG_DOWNLOAD_CHUNK_BYTES = 64 * 1024
+LOG_GZIP_LEVEL = 6
+LOG_SEARCH_MAX_PATTERN_LENGTH = 512
+LOG_SEARCH_MAX_LINE_CHARS = 16 * 1024
+LOG_SEARCH_BUDGET_CHECK_EVERY = 256
+LOG_SINK_QUEUE_SIZE = 2000
+LOG_MERGE_MAX_PENDING = 5000
+
+
+def open_log_stream(container, tail='all', since=None, until=None, follow=False):
+    """Open a raw Docker log stream with timestamps, optionally time-bounded."""
+    kwargs = {
+        'stream': True,
+        'follow': follow,
+        'tail': tail,
+        'timestamps': True,
+    }
+    if since is not None:
+        kwargs['since'] = since
+    if until is not None:
+        kwargs['until'] = until
+    return container.logs(**kwargs)
+
+
+def close_log_stream(log_stream):
+    if hasattr(log_stream, 'close'):
+        try:
+            log_stream.close()
+        except Exception:
+            pass
+
+
+def iter_buffered_chunks(chunks, chunk_size=LOG_DOWNLOAD_CHUNK_BYTES):
+    """Coalesce the small per-line frames Docker emits into bounded writes."""
+    pending = bytearray()
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8', errors='replace')
+        pending += chunk
+        if len(pending) >= chunk_size:
+            yield bytes(pending)
+            pending.clear()
+    if pending:
+        yield bytes(pending)
+
+
+def iter_gzip_chunks(chunks, level=LOG_GZIP_LEVEL):
+    """Compress an iterable of byte chunks into a gzip stream on the fly."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def iter_log_lines(chunks):
+    """Split a stream of byte frames into decoded lines, keeping partial lines buffered."""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    buffer = ''
+    for chunk in chunks:
+        if isinstance(chunk, bytes):
+            buffer += decoder.decode(chunk)
+        else:
+            buffer += str(chunk or '')
+        if '\n' not in buffer:
+            continue
+        *lines, buffer = buffer.split('\n')
+        for line in lines:
+            yield line
+    buffer += decoder.decode(b'', final=True)
+    if buffer:
+        yield buffer
+
+
+def split_log_timestamp(line):
+    """Split the RFC3339 prefix Docker adds with timestamps=True from the log text."""
+    head, separator, rest = line.partition(' ')
+    if separator and len(head) >= 20 and head[4:5] == '-' and head[10:11] == 'T':
+        return head, rest
+    return None, line
+
+
+try:
+    from re import _parser as _regex_parser
+except ImportError:  # Python < 3.11
+    import sre_parse as _regex_parser
+
+_REGEX_REPEAT_OPS = {
+    _regex_parser.MAX_REPEAT,
+    _regex_parser.MIN_REPEAT,
+    getattr(_regex_parser, 'POSSESSIVE_REPEAT', _regex_parser.MAX_REPEAT),
+}
+
+
+def _iter_subpatterns(value):
+    if isinstance(value, _regex_parser.SubPattern):
+        yield value
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _iter_subpatterns(item)
+
+
+def _has_nested_repeat(parsed, enclosing_unbounded=None):
+    """True when a repeat sits inside another repeat and either one is unbounded.
+
+    enclosing_unbounded is None outside any repeat, otherwise whether the
+    nearest enclosing repeat has no upper bound.
+    """
+    for op, av in parsed:
+        if op in _REGEX_REPEAT_OPS:
+            _minimum, maximum, body = av
+            if maximum <= 1:
+                if _has_nested_repeat(body, enclosing_unbounded):
+                    return True
+                continue
+            unbounded = maximum == _regex_parser.MAXREPEAT
+            if enclosing_unbounded is not None and (unbounded or enclosing_unbounded):
+                return True
+            if _has_nested_repeat(body, unbounded):
+                return True
+            continue
+        for subpattern in _iter_subpatterns(av):
+            if _has_nested_repeat(subpattern, enclosing_unbounded):
+                return True
+    return False
+
+
+def compile_log_pattern(query, regex=False, case_sensitive=False):
+    """Compile a search query, raising ValueError for empty, oversized or invalid patterns.
+
+    Regex queries with nested unbounded repeats such as (a+)+ are rejected
+    because they backtrack exponentially on near-miss lines.
+    """
+    text = str(query or '')
+    if not text:
+        raise ValueError('A search query is required.')
+    if len(text) > LOG_SEARCH_MAX_PATTERN_LENGTH:
+        raise ValueError(f'Search query must be at most {LOG_SEARCH_MAX_PATTERN_LENGTH} characters.')
+    flags = 0 if case_sensitive else re.IGNORECASE
+    try:
+        pattern = re.compile(text if regex else re.escape(text), flags)
+    except re.error as exc:
+        raise ValueError(f'Invalid regular expression: {exc}') from exc
+    if regex and _has_nested_repeat(_regex_parser.parse(text, flags)):
+        raise ValueError('Regular expressions with nested repeats such as (a+)+ are not supported.')
+    return pattern
+
+
+# Runs in a separate interpreter (python -I -c) so it must stay self-contained.
+# re's own compile cache keeps repeated batches of one search cheap.
+_REGEX_MATCHER_SOURCE = """
+import json, re, sys
+for raw in sys.stdin:
+    request = json.loads(raw)
+    pattern = re.compile(request['pattern'], request['flags'])
+    hits = [index for index, text in enumerate(request['texts']) if pattern.search(text)]
+    sys.stdout.write(json.dumps(hits) + '\\n')
+    sys.stdout.flush()
+"""
+
+
+class IsolatedRegexMatcher:
+    """Evaluate user regexes in a child interpreter that can be killed.
+
+    A single re search cannot be interrupted, so the CPU budget in
+    search_log_lines cannot stop a pattern that backtracks badly on one
+    line. Batches of lines go to a long-lived child over a pipe; a batch
+    that is not answered before its deadline kills the child, and the next
+    batch starts a fresh one. Each waitress worker thread keeps its own
+    matcher (see thread_regex_matcher), so searches do not pay for an
+    interpreter start.
+    """
+
+    def __init__(self):
+        self._process = None
+
+    def _ensure_process(self):
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen(
+                [sys.executable, '-I', '-c', _REGEX_MATCHER_SOURCE],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                encoding='ascii',
+            )
+        return self._process
+
+    def match_batch(self, pattern, texts, timeout):
+        """Return the set of indexes in texts that match, or None when the child timed out or died."""
+        try:
+            process = self._ensure_process()
+            request = {'pattern': pattern.pattern, 'flags': int(pattern.flags), 'texts': texts}
+            process.stdin.write(json.dumps(request) + '\n')
+            process.stdin.flush()
+            ready, _, _ = select.select([process.stdout], [], [], max(0.0, timeout))
+            reply = process.stdout.readline() if ready else ''
+        except (OSError, ValueError):
+            reply = ''
+        if not reply:
+            self.close()
+            return None
+        return set(json.loads(reply))
+
+    def close(self):
+        process, self._process = self._process, None
+        if process is None:
+            return
+        if process.poll() is None:
+            process.kill()
+        for stream in (process.stdin, process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            logging.warning("Regex matcher process %s did not exit after SIGKILL", process.pid)
+
+
+_matcher_local = threading.local()
+
+
+def thread_regex_matcher():
+    """The calling thread's IsolatedRegexMatcher, created on first use.
+
+    The child exits on its own once the thread and its pipes are gone.
+    """
+    matcher = getattr(_matcher_local, 'matcher', None)
+    if matcher is None:
+        matcher = _matcher_local.matcher = IsolatedRegexMatcher()
+    return matcher
+
+
+def search_log_lines(lines, pattern, context=0, max_matches=200, cpu_budget_seconds=5.0, clock=time.thread_time,
+                     isolate=False):
+    """Yield ('match', payload) for each hit and a final ('summary', payload).
+
+    Scanning stops once max_matches is reached or the request thread has
+    spent cpu_budget_seconds of CPU time, so a single search cannot pin a
+    waitress worker on a huge log. With isolate=True the pattern runs in the
+    thread's IsolatedRegexMatcher; time spent waiting on it is charged to
+    the same budget and bounds each batch, which covers a single runaway
+    match. Reading and streaming the log are not charged.
+    """
+    context = max(0, int(context))
+    before = collections.deque(maxlen=context)
+    pending = []
+    match_count = 0
+    scanned = 0
+    truncated = None
+    started = clock()
+    matcher_seconds = 0.0
+    matcher = thread_regex_matcher() if isolate else None
+
+    lines = iter(lines)
+    line_numbers = itertools.count(1)
+    batches = iter(lambda: list(itertools.islice(lines, LOG_SEARCH_BUDGET_CHECK_EVERY)), [])
+    for batch in batches:
+        entries = []
+        for line in batch:
+            timestamp, text = split_log_timestamp(line)
+            entries.append({'line': next(line_numbers), 'timestamp': timestamp, 'text': text})
+        hits = None
+        if matcher is not None and match_count < max_matches:
+            remaining = cpu_budget_seconds - (clock() - started) - matcher_seconds
+            texts = [entry['text'][:LOG_SEARCH_MAX_LINE_CHARS] for entry in entries]
+            waited_from = time.monotonic()
+            hits = matcher.match_batch(pattern, texts, timeout=remaining)
+            matcher_seconds += time.monotonic() - waited_from
+            if hits is None:
+                truncated = 'cpu_budget'
+                break
+
+        for index, entry in enumerate(entries):
+            scanned += 1
+            if pending:
+                waiting = []
+                for match in pending:
+                    match['after'].append(entry)
+                    if len(match['after']) >= context:
+                        yield 'match', match
+                    else:
+                        waiting.append(match)
+                pending = waiting
+
+            if match_count < max_matches:
+                if hits is not None:
+                    found = index in hits
+                else:
+                    found = pattern.search(entry['text'], 0, LOG_SEARCH_MAX_LINE_CHARS) is not None
+                if found:
+                    match_count += 1
+                    match = {**entry, 'before': list(before), 'after': []}
+                    if context:
+                        pending.append(match)
+                    else:
+                        yield 'match', match
+
+            if context:
+                before.append(entry)
+
+            if match_count >= max_matches and not pending:
+                truncated = 'max_matches'
+                break
+        if truncated:
+            break
+        if (clock() - started) + matcher_seconds >= cpu_budget_seconds:
+            truncated = 'cpu_budget'
+            break
+
+    for match in pending:
+        yield 'match', match
+
+    yield 'summary', {
+        'scanned_lines': scanned,
+        'matches': match_count,
+        'truncated': truncated,
+        'cpu_seconds': round(clock() - started + matcher_seconds, 4),
+    }
+
+
+def parse_log_timestamp(value):
+    """Convert Docker's RFC3339Nano timestamp to epoch seconds, or None."""
+    raw = str(value or '').strip()
+    if not raw:
+        return None
+    if raw.endswith('Z'):
+        raw = raw[:-1] + '+00:00'
+    base, dot, rest = raw.partition('.')
+    if dot:
+        digits = ''.join(itertools.takewhile(str.isdigit, rest))
+        raw = f'{base}.{digits[:6].ljust(6, "0")}{rest[len(digits):]}'
+    try:
+        return datetime.datetime.fromisoformat(raw).timestamp()
+    except ValueError:
+        return None
+
+
+def build_log_record(line, container_id, container_name, service):
+    """Tag one timestamped log line with its source; returns (sort_ts, record)."""
+    timestamp, text = split_log_timestamp(line)
+    sort_ts = parse_log_timestamp(timestamp)
+    record = {
+        'service': service,
+        'container': container_name,
+        'container_id': container_id,
+        'timestamp': timestamp,
+        'text': text,
+    }
+    return (sort_ts if sort_ts is not None else time.time()), record
+
+
+class TimestampMerger:
+    """Reorder buffer that releases records in timestamp order.
+
+    Records are held for window_seconds after they arrive so that slightly
+    late lines from other containers can still be slotted in ahead of them.
+    """
+
+    def __init__(self, window_seconds=0.5, max_pending=LOG_MERGE_MAX_PENDING, clock=time.monotonic):
+        self.window_seconds = max(0.0, float(window_seconds))
+        self.max_pending = max(1, int(max_pending))
+        self._clock = clock
+        self._heap = []
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, sort_ts, record):
+        heapq.heappush(self._heap, (sort_ts, next(self._sequence), self._clock(), record))
+
+    def pop_ready(self, flush=False):
+        cutoff = self._clock() - self.window_seconds
+        ready = []
+        while self._heap and (flush or self._heap[0][2] <= cutoff or len(self._heap) > self.max_pending):
+            ready.append(heapq.heappop(self._heap)[3])
+        return ready
+
+
+class LogSink:
+    """Bounded per-client queue that followers fan records into."""
+
+    def __init__(self, maxsize=LOG_SINK_QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def push(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _ContainerFollower:
+    def __init__(self, hub, container, service):
+        self.hub = hub
+        self.container = container
+        self.container_id = container.id
+        self.container_name = str(getattr(container, 'name', '') or container.id)
+        self.service = service
+        self.subscribers = set()
+        self.finished = False
+        self._stopped = threading.Event()
+        self._stream = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        close_log_stream(self._stream)
+
+    def _run(self):
+        try:
+            self._stream = open_log_stream(self.container, tail=0, follow=True)
+            if self._stopped.is_set():
+                return
+            for line in iter_log_lines(self._stream):
+                if self._stopped.is_set():
+                    break
+                self.hub._fan_out(self, build_log_record(line, self.container_id, self.container_name, self.service))
+        except Exception as exc:
+            if not self._stopped.is_set():
+                logging.warning("Log follower for %s stopped: %s", self.container_name, exc)
+        finally:
+            close_log_stream(self._stream)
+            self.finished = True
+
+
+class LogFollowerHub:
+    """Share one Docker follow connection per container across all SSE clients."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._followers = {}
+
+    def subscribe(self, container, service, sink):
+        with self._lock:
+            follower = self._followers.get(container.id)
+            created = follower is None or follower.finished
+            if created:
+                follower = _ContainerFollower(self, container, service)
+                self._followers[container.id] = follower
+            follower.subscribers.add(sink)
+        if created:
+            follower.start()
+        return follower
+
+    def unsubscribe(self, container_id, sink):
+        with self._lock:
+            follower = self._followers.get(container_id)
+            if follower is None:
+                return
+            follower.subscribers.discard(sink)
+            if follower.subscribers:
+                return
+            self._followers.pop(container_id, None)
+        follower.stop()
+
+    def is_following(self, container_id):
+        with self._lock:
+            follower = self._followers.get(container_id)
+            return follower is not None and not follower.finished
+
+    def follower_count(self):
+        with self._lock:
+            return len(self._followers)
+
+    def _fan_out(self, follower, item):
+        with self._lock:
+            subscribers = list(follower.subscribers)
+        for sink in subscribers:
+            sink.push(item)
+
+
+log_follower_hub = LogFollowerHub()
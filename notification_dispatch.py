@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+
+import atexit
+import collections
+import logging
+import threading
+import time
+
+from config import (
+    NOTIFICATION_CHANNEL_CONCURRENCY, NOTIFICATION_QUEUE_MAX_PENDING, NOTIFICATION_SHUTDOWN_TIMEOUT_SECONDS,
+    NOTIFICATION_WORKERS
+)
+from pushover_client import CHANNEL_NAMES, build_notification_context, get_configured_services, send_channel
+
+DEFAULT_DIGEST_WINDOW_SECONDS = 300
+DIGEST_TOP_OFFENDERS = 5
+
+
+def _empty_channel_counters():
+    return {'queued': 0, 'delivered': 0, 'failed': 0, 'short_circuited': 0, 'dropped': 0, 'digested': 0}
+
+
+def _format_window(seconds):
+    seconds = int(seconds)
+    if seconds % 60 == 0:
+        return f'{seconds // 60} min'
+    return f'{seconds}s'
+
+
+def _format_counts(counter, limit=None):
+    return ', '.join(f'{name} {count}' for name, count in counter.most_common(limit))
+
+
+class ChannelDigest:
+    """Events held back for one channel until its digest window closes."""
+
+    def __init__(self, due_at):
+        self.due_at = due_at
+        self.count = 0
+        self.priority = None
+        self.first = None
+        self.by_type = collections.Counter()
+        self.by_project = collections.Counter()
+        self.by_container = collections.Counter()
+        self.first_timestamp = None
+        self.last_timestamp = None
+
+    def add(self, message, title, priority, event):
+        event = event or {}
+        timestamp = float(event.get('timestamp') or time.time())
+        if self.first is None:
+            self.first = (message, title, priority, event)
+            self.first_timestamp = timestamp
+        self.count += 1
+        self.last_timestamp = timestamp
+        self.priority = priority if self.priority is None else max(self.priority, priority)
+        self.by_type[str(event.get('type') or 'other').lower()] += 1
+        self.by_project[str(event.get('project') or 'no project')] += 1
+        if event.get('container'):
+            self.by_container[str(event['container'])] += 1
+
+    def summary(self, window_seconds):
+        """Return (message, title, priority, event) for the whole window.
+
+        A window that caught a single event sends that event unchanged.
+        """
+        if self.count == 1:
+            return self.first
+        top_containers = self.by_container.most_common(DIGEST_TOP_OFFENDERS)
+        lines = [
+            f'{self.count} notifications in the last {_format_window(window_seconds)}',
+            f'By type: {_format_counts(self.by_type)}',
+            f'By project: {_format_counts(self.by_project, DIGEST_TOP_OFFENDERS)}',
+        ]
+        if top_containers:
+            lines.append(f'Top containers: {_format_counts(self.by_container, DIGEST_TOP_OFFENDERS)}')
+        event = {
+            'type': 'digest',
+            'count': self.count,
+            'window_seconds': int(window_seconds),
+            'by_type': dict(self.by_type),
+            'by_project': dict(self.by_project),
+            'top_containers': [{'container': name, 'count': count} for name, count in top_containers],
+            'first_timestamp': self.first_timestamp,
+            'timestamp': self.last_timestamp,
+        }
+        event['msg'] = '\n'.join(lines)
+        return event['msg'], f'statainer digest: {self.count} notifications', self.priority, event
+
+
+class NotificationDispatcher:
+    """Deliver notifications to outbound channels on a worker pool.
+
+    Each event becomes one delivery per configured channel. Deliveries wait in
+    a bounded FIFO; when it is full the oldest pending delivery is dropped so
+    fresh alerts win. At most per_channel_limit deliveries run against one
+    channel at a time, and workers skip past deliveries for a saturated channel
+    so one slow webhook cannot hold up the others. shutdown() stops intake and
+    waits a bounded time for the queue to drain.
+
+    Channels put in digest mode with configure_digest() do not get one delivery
+    per event: events are counted into a ChannelDigest and a single summary is
+    queued when the channel's window closes.
+    """
+
+    def __init__(self, max_pending=NOTIFICATION_QUEUE_MAX_PENDING, workers=NOTIFICATION_WORKERS,
+                 per_channel_limit=NOTIFICATION_CHANNEL_CONCURRENCY, sender=send_channel,
+                 configured_services=get_configured_services):
+        self.max_pending = max(1, int(max_pending))
+        self.workers = max(1, int(workers))
+        self.per_channel_limit = max(1, int(per_channel_limit))
+        self._sender = sender
+        self._configured_services = configured_services
+        self._condition = threading.Condition()
+        self._pending = collections.deque()
+        self._in_flight = collections.Counter()
+        self._threads = []
+        self._closed = False
+        self._counters = {'submitted': 0, 'overflow': 0, 'dropped_at_shutdown': 0, 'rejected_after_shutdown': 0}
+        self._channels = {name: _empty_channel_counters() for name in CHANNEL_NAMES}
+        self._digest_channels = frozenset()
+        self._digest_window_seconds = DEFAULT_DIGEST_WINDOW_SECONDS
+        self._digests = {}
+        self._digest_thread = None
+
+    def configure_digest(self, channels, window_seconds=DEFAULT_DIGEST_WINDOW_SECONDS):
+        """Put the given channels in digest mode; channels leaving it flush what they hold."""
+        overflowed = 0
+        with self._condition:
+            self._digest_channels = frozenset(name for name in channels if name in self._channels)
+            self._digest_window_seconds = max(1, int(window_seconds))
+            for channel_name in list(self._digests):
+                if channel_name not in self._digest_channels:
+                    overflowed += self._flush_digest_locked(channel_name)
+            self._condition.notify_all()
+        self._log_overflow(overflowed)
+
+    def submit(self, message, title='statainer', priority=0, event=None):
+        """Hand an event to every configured channel, queued or digested; returns the channel count."""
+        configured = self._configured_services()
+        channels = [name for name in CHANNEL_NAMES if configured.get(name, {}).get('configured')]
+        if not channels:
+            return 0
+        context = build_notification_context(message, title, priority, event=event)
+        overflowed = 0
+        with self._condition:
+            if self._closed:
+                self._counters['rejected_after_shutdown'] += 1
+                return 0
+            self._counters['submitted'] += 1
+            for channel_name in channels:
+                if channel_name in self._digest_channels:
+                    self._add_to_digest_locked(channel_name, message, title, priority, event)
+                else:
+                    overflowed += self._enqueue_locked(channel_name, message, title, priority, event, context)
+            self._condition.notify_all()
+        self._log_overflow(overflowed)
+        return len(channels)
+
+    def stats(self):
+        with self._condition:
+            return {
+                **self._counters,
+                'pending': len(self._pending),
+                'in_flight': sum(self._in_flight.values()),
+                'max_pending': self.max_pending,
+                'workers': self.workers,
+                'per_channel_limit': self.per_channel_limit,
+                'closed': self._closed,
+                'digest': {
+                    'channels': sorted(self._digest_channels),
+                    'window_seconds': self._digest_window_seconds,
+                    'held': {name: digest.count for name, digest in self._digests.items()},
+                },
+                'channels': {
+                    name: {**counters, 'in_flight': self._in_flight[name]}
+                    for name, counters in self._channels.items()
+                },
+            }
+
+    def wait_idle(self, timeout=None):
+        """Block until nothing is pending or in flight; returns False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._pending and not sum(self._in_flight.values()),
+                timeout=timeout,
+            )
+
+    def shutdown(self, timeout=NOTIFICATION_SHUTDOWN_TIMEOUT_SECONDS):
+        """Stop accepting events and give queued deliveries up to timeout seconds to finish.
+
+        Digests still open are sent early rather than lost.
+        """
+        overflowed = 0
+        with self._condition:
+            self._closed = True
+            for channel_name in list(self._digests):
+                overflowed += self._flush_digest_locked(channel_name)
+            self._condition.notify_all()
+        self._log_overflow(overflowed)
+        drained = self.wait_idle(timeout=timeout)
+        with self._condition:
+            abandoned = len(self._pending)
+            for item in self._pending:
+                self._channels[item['channel']]['dropped'] += 1
+            self._pending.clear()
+            self._counters['dropped_at_shutdown'] += abandoned
+            self._condition.notify_all()
+        if abandoned:
+            logging.warning("Dropped %d queued notifications at shutdown", abandoned)
+        return drained
+
+    def _log_overflow(self, overflowed):
+        if overflowed:
+            logging.warning("Notification queue full; dropped %d oldest deliveries", overflowed)
+
+    def _enqueue_locked(self, channel_name, message, title, priority, event, context=None):
+        """Append one delivery, dropping the oldest pending one if full; returns how many were dropped."""
+        dropped_count = 0
+        if len(self._pending) >= self.max_pending:
+            dropped = self._pending.popleft()
+            self._counters['overflow'] += 1
+            self._channels[dropped['channel']]['dropped'] += 1
+            dropped_count = 1
+        self._pending.append({
+            'channel': channel_name,
+            'message': message,
+            'title': title,
+            'priority': priority,
+            'event': event,
+            'context': context if context is not None else build_notification_context(message, title, priority, event=event),
+            'queued_at': time.monotonic(),
+        })
+        self._channels[channel_name]['queued'] += 1
+        self._start_workers_locked()
+        return dropped_count
+
+    def _add_to_digest_locked(self, channel_name, message, title, priority, event):
+        digest = self._digests.get(channel_name)
+        if digest is None:
+            digest = self._digests[channel_name] = ChannelDigest(time.monotonic() + self._digest_window_seconds)
+        digest.add(message, title, priority, event)
+        self._channels[channel_name]['digested'] += 1
+        if self._digest_thread is None or not self._digest_thread.is_alive():
+            self._digest_thread = threading.Thread(target=self._digest_loop, name='notification-digest', daemon=True)
+            self._digest_thread.start()
+
+    def _flush_digest_locked(self, channel_name):
+        digest = self._digests.pop(channel_name, None)
+        if digest is None or not digest.count:
+            return 0
+        message, title, priority, event = digest.summary(self._digest_window_seconds)
+        return self._enqueue_locked(channel_name, message, title, priority, event)
+
+    def _digest_loop(self):
+        while True:
+            overflowed = 0
+            with self._condition:
+                if not self._digests:
+                    if self._closed:
+                        return
+                    self._condition.wait()
+                    continue
+                now = time.monotonic()
+                next_due = min(digest.due_at for digest in self._digests.values())
+                if next_due > now:
+                    self._condition.wait(next_due - now)
+                    continue
+                for channel_name, digest in list(self._digests.items()):
+                    if digest.due_at <= now:
+                        overflowed += self._flush_digest_locked(channel_name)
+                self._condition.notify_all()
+            self._log_overflow(overflowed)
+
+    def _start_workers_locked(self):
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        while len(self._threads) < self.workers:
+            worker = threading.Thread(
+                target=self._worker_loop, name=f'notification-dispatch-{len(self._threads)}', daemon=True,
+            )
+            self._threads.append(worker)
+            worker.start()
+
+    def _next_item_locked(self):
+        for index, item in enumerate(self._pending):
+            if self._in_flight[item['channel']] < self.per_channel_limit:
+                del self._pending[index]
+                return item
+        return None
+
+    def _worker_loop(self):
+        while True:
+            with self._condition:
+                item = self._next_item_locked()
+                while item is None:
+                    if self._closed and not self._pending:
+                        return
+                    self._condition.wait()
+                    item = self._next_item_locked()
+                self._in_flight[item['channel']] += 1
+
+            try:
+                result = self._sender(
+                    item['channel'], item['message'], title=item['title'], priority=item['priority'],
+                    event=item['event'], context=item['context'],
+                )
+            except Exception as exc:
+                logging.exception("Notification delivery to %s failed", item['channel'])
+                result = {'ok': False, 'error': str(exc)}
+
+            if result.get('ok'):
+                outcome = 'delivered'
+            elif result.get('circuit_open'):
+                outcome = 'short_circuited'
+            else:
+                outcome = 'failed'
+            with self._condition:
+                self._in_flight[item['channel']] -= 1
+                self._channels[item['channel']][outcome] += 1
+                self._condition.notify_all()
+
+
+notification_dispatcher = NotificationDispatcher()
+atexit.register(notification_dispatcher.shutdown)
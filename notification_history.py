@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+import bisect
+import logging
+import sqlite3
+import threading
+
+from users_db import enqueue_notification_record, load_recent_notification_records
+
+NOTIFICATION_MEMORY_ITEMS = 1000
+
+
+class NotificationHistory:
+    """Recent notifications in publish order, indexed for since-queries.
+
+    Every event is handed to the batched SQLite writer, which fills in its
+    seq once the row is stored. Producers stamp their own timestamps, so
+    events can arrive slightly out of order; next to each event the index
+    keeps the highest timestamp seen so far. Bisecting that list finds the
+    first event that can be newer than `since` in O(log n), and only the tail
+    after it is filtered.
+    """
+
+    def __init__(self, capacity=NOTIFICATION_MEMORY_ITEMS, persist=enqueue_notification_record):
+        self.capacity = max(1, int(capacity))
+        self._persist = persist
+        self._lock = threading.Lock()
+        self._events = []
+        self._max_timestamps = []
+
+    def load(self, events):
+        """Seed from stored events, oldest first, so history survives a restart."""
+        with self._lock:
+            self._events = []
+            self._max_timestamps = []
+            for event in events[-self.capacity:]:
+                self._append_locked(event)
+        return len(events)
+
+    def append(self, event):
+        """Index and persist an event; its seq stays None until the writer stores it."""
+        # The key exists before the event is shared so the writer only replaces a value.
+        event.setdefault('seq', None)
+        with self._lock:
+            self._append_locked(event)
+        if self._persist is not None:
+            try:
+                self._persist(event)
+            except Exception as exc:
+                logging.warning("Could not queue notification for storage: %s", exc)
+
+    def _append_locked(self, event):
+        timestamp = float(event.get('timestamp') or 0)
+        previous = self._max_timestamps[-1] if self._max_timestamps else float('-inf')
+        self._events.append(event)
+        self._max_timestamps.append(max(previous, timestamp))
+        # Trim in chunks so appends stay amortized O(1).
+        if len(self._events) >= 2 * self.capacity:
+            del self._events[:-self.capacity]
+            del self._max_timestamps[:-self.capacity]
+
+    def latest(self, max_items=50):
+        if max_items <= 0:
+            return []
+        with self._lock:
+            return self._events[-min(int(max_items), self.capacity):]
+
+    def since(self, since_ts, max_items=50):
+        """Events newer than since_ts among the newest max_items, oldest first."""
+        if max_items <= 0:
+            return []
+        with self._lock:
+            start = bisect.bisect_right(self._max_timestamps, since_ts)
+            start = max(start, len(self._events) - min(int(max_items), self.capacity))
+            return [event for event in self._events[start:] if float(event.get('timestamp') or 0) > since_ts]
+
+
+notification_history = NotificationHistory()
+
+
+def load_persisted_notifications():
+    """Warm the in-memory index from the notification log."""
+    try:
+        return notification_history.load(load_recent_notification_records(notification_history.capacity))
+    except sqlite3.Error as exc:
+        logging.warning("Could not load stored notifications: %s", exc)
+        return 0
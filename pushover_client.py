@@ -1,14 +1,139 @@
 # pushover_client.py
 import datetime
+import email.utils
 import json
 import logging
 import os
+import random
 import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from config import (
+    NOTIFICATION_BREAKER_COOLDOWN_SECONDS, NOTIFICATION_BREAKER_FAILURE_THRESHOLD, NOTIFICATION_RETRY_ATTEMPTS,
+    NOTIFICATION_RETRY_BASE_DELAY_MS, NOTIFICATION_RETRY_MAX_DELAY_SECONDS
+)
 
 PUSHOVER_URL = "https://api.pushover.net/1/messages.json"
+TELEGRAM_API_URL = "https://api.telegram.org"
 DEFAULT_HOST = socket.gethostname()
+CHANNEL_NAMES = ("pushover", "slack", "telegram", "discord", "ntfy", "webhook")
+# Connections kept alive per channel; matches the dispatcher's default
+# per-channel concurrency with some headroom for test sends from the UI.
+CHANNEL_POOL_SIZE = 4
+RETRYABLE_STATUS_CODES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_breakers = {}
+# Indirection so tests can skip the real backoff waits.
+_sleep = time.sleep
+
+
+def _channel_session(channel_name):
+    """Return the keep-alive session for a channel, creating it on first use."""
+    with _sessions_lock:
+        session = _sessions.get(channel_name)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=CHANNEL_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[channel_name] = session
+        return session
+
+
+class ChannelCircuitBreaker:
+    """Skip a channel that keeps failing instead of waiting out its timeout every time.
+
+    After failure_threshold consecutive failed deliveries the circuit opens and
+    deliveries are refused for cooldown_seconds (or for as long as a 429/503
+    Retry-After asked). The first delivery after that is a single trial: success
+    closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=NOTIFICATION_BREAKER_FAILURE_THRESHOLD,
+                 cooldown_seconds=NOTIFICATION_BREAKER_COOLDOWN_SECONDS, clock=time.monotonic):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.cooldown_seconds = max(0, int(cooldown_seconds))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CIRCUIT_CLOSED
+        self._consecutive_failures = 0
+        self._open_until = 0.0
+        self._trial_in_flight = False
+        self._last_error = None
+        self._times_opened = 0
+        self._short_circuited = 0
+
+    def allow(self):
+        with self._lock:
+            if self._state == CIRCUIT_CLOSED:
+                return True
+            if self._state == CIRCUIT_OPEN and self._clock() >= self._open_until:
+                self._state = CIRCUIT_HALF_OPEN
+                self._trial_in_flight = False
+            if self._state == CIRCUIT_HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self._short_circuited += 1
+            return False
+
+    def release_trial(self):
+        """Free the half-open trial slot when an attempt ended without a delivery outcome."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self._state = CIRCUIT_CLOSED
+            self._consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self, error=None, open_for=None):
+        """Count a failed delivery; open_for (seconds) opens the circuit immediately."""
+        with self._lock:
+            self._consecutive_failures += 1
+            self._last_error = error
+            self._trial_in_flight = False
+            if (open_for is not None or self._state == CIRCUIT_HALF_OPEN
+                    or self._consecutive_failures >= self.failure_threshold):
+                if self._state != CIRCUIT_OPEN:
+                    self._times_opened += 1
+                self._state = CIRCUIT_OPEN
+                self._open_until = self._clock() + (self.cooldown_seconds if open_for is None else open_for)
+
+    def retry_in_seconds(self):
+        with self._lock:
+            return max(0.0, self._open_until - self._clock()) if self._state == CIRCUIT_OPEN else 0.0
+
+    def snapshot(self):
+        retry_in = self.retry_in_seconds()
+        with self._lock:
+            return {
+                "state": self._state,
+                "consecutive_failures": self._consecutive_failures,
+                "retry_in_seconds": round(retry_in, 1),
+                "last_error": self._last_error,
+                "times_opened": self._times_opened,
+                "short_circuited": self._short_circuited,
+            }
+
+
+def _channel_breaker(channel_name):
+    with _sessions_lock:
+        breaker = _breakers.get(channel_name)
+        if breaker is None:
+            breaker = _breakers[channel_name] = ChannelCircuitBreaker()
+        return breaker
 
 
 def get_configured_services():
@@ -104,7 +229,8 @@ def _priority_label(priority):
     return "lowest"
 
 
-def _build_context(message, title, priority, event=None):
+def build_notification_context(message, title, priority, event=None):
+    """Template context shared by every channel's payload for one notification."""
     event = dict(event or {})
     timestamp = float(event.get("timestamp", datetime.datetime.now(datetime.timezone.utc).timestamp()))
     timestamp_iso = datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc).isoformat()
@@ -181,7 +307,7 @@ def _map_ntfy_priority(priority):
 def _send_pushover(message, title, priority):
     pushover_token = os.getenv("PUSHOVER_TOKEN")
     pushover_user = os.getenv("PUSHOVER_USER")
-    resp = requests.post(
+    resp = _channel_session("pushover").post(
         PUSHOVER_URL,
         timeout=5,
         data={
@@ -197,7 +323,7 @@ def _send_pushover(message, title, priority):
 
 
 def _send_slack(message, title):
-    resp = requests.post(
+    resp = _channel_session("slack").post(
         os.getenv("SLACK_WEBHOOK_URL"),
         timeout=5,
         json={"text": f"*{title}*\n{message}"},
@@ -209,8 +335,8 @@ def _send_slack(message, title):
 def _send_telegram(message, title):
     telegram_bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
     telegram_chat_id = os.getenv("TELEGRAM_CHAT_ID")
-    url = f"https://api.telegram.org/bot{telegram_bot_token}/sendMessage"
-    resp = requests.post(
+    url = f"{TELEGRAM_API_URL}/bot{telegram_bot_token}/sendMessage"
+    resp = _channel_session("telegram").post(
         url,
         timeout=5,
         data={"chat_id": telegram_chat_id, "text": f"{title}\n{message}"},
@@ -220,7 +346,7 @@ def _send_telegram(message, title):
 
 
 def _send_discord(message, title):
-    resp = requests.post(
+    resp = _channel_session("discord").post(
         os.getenv("DISCORD_WEBHOOK_URL"),
         timeout=5,
         json={"content": f"**{title}**\n{message}"},
@@ -259,7 +385,7 @@ def _send_ntfy(message, title, priority, context):
             raise ValueError("NTFY_USERNAME and NTFY_PASSWORD must be set together")
         auth = (username, password)
 
-    resp = requests.post(
+    resp = _channel_session("ntfy").post(
         f"{server_url}/{topic}",
         timeout=_parse_timeout("NTFY_TIMEOUT", default=5),
         data=message.encode("utf-8"),
@@ -318,43 +444,148 @@ def _send_generic_webhook(context):
             headers["Content-Type"] = content_type
         request_kwargs["json"] = _build_generic_webhook_payload(context)
 
-    resp = requests.request(**request_kwargs)
+    resp = _channel_session("webhook").request(**request_kwargs)
     resp.raise_for_status()
     return resp
 
 
+def _channel_sender(channel_name, message, title, priority, context):
+    if channel_name == "pushover":
+        return lambda: _send_pushover(message, title, priority)
+    if channel_name == "slack":
+        return lambda: _send_slack(message, title)
+    if channel_name == "telegram":
+        return lambda: _send_telegram(message, title)
+    if channel_name == "discord":
+        return lambda: _send_discord(message, title)
+    if channel_name == "ntfy":
+        return lambda: _send_ntfy(message, title, priority, context)
+    if channel_name == "webhook":
+        return lambda: _send_generic_webhook(context)
+    raise ValueError(f"unknown notification channel: {channel_name}")
+
+
+def _retry_after_seconds(response):
+    """Seconds requested by a Retry-After header (delta-seconds or HTTP date), else None."""
+    value = (getattr(response, "headers", None) or {}).get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def _classify_failure(exc):
+    """Return (retryable, retry_after_seconds) for an exception raised by a channel sender."""
+    if isinstance(exc, requests.HTTPError):
+        response = exc.response
+        status_code = getattr(response, "status_code", None)
+        retry_after = _retry_after_seconds(response) if status_code in (429, 503) else None
+        return status_code in RETRYABLE_STATUS_CODES, retry_after
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True, None
+    return False, None
+
+
+def _backoff_delay(attempt):
+    """Full-jitter exponential backoff: uniform in [0, base * 2**attempt], capped."""
+    ceiling = NOTIFICATION_RETRY_BASE_DELAY_MS / 1000.0 * (2 ** attempt)
+    return min(float(NOTIFICATION_RETRY_MAX_DELAY_SECONDS), random.uniform(0, ceiling))
+
+
+def send_channel(channel_name, message, title="statainer", priority=0, event=None, context=None):
+    """Send a notification to a single channel and return its status entry.
+
+    Timeouts, connection errors and 429/5xx answers are retried with backoff,
+    honouring Retry-After when it fits within NOTIFICATION_RETRY_MAX_DELAY_SECONDS.
+    A channel whose circuit is open is not contacted at all.
+    """
+    if not get_configured_services()[channel_name]["configured"]:
+        return _error_result(False, skipped="missing env vars")
+    breaker = _channel_breaker(channel_name)
+    if not breaker.allow():
+        result = _error_result(True, error=f"circuit open; retrying in {breaker.retry_in_seconds():.0f}s")
+        result["circuit_open"] = True
+        return result
+    # Anything that escapes before an outcome is recorded (building the
+    # request, an interrupted backoff sleep) must not strand the trial slot.
+    outcome_recorded = False
+    try:
+        if context is None:
+            context = build_notification_context(message, title, priority, event=event)
+        sender = _channel_sender(channel_name, message, title, priority, context)
+
+        attempts = max(1, NOTIFICATION_RETRY_ATTEMPTS)
+        for attempt in range(1, attempts + 1):
+            try:
+                resp = sender()
+            except Exception as exc:
+                retryable, retry_after = _classify_failure(exc)
+                delay = retry_after if retry_after is not None else _backoff_delay(attempt - 1)
+                if retryable and attempt < attempts and delay <= NOTIFICATION_RETRY_MAX_DELAY_SECONDS:
+                    logging.warning("%s send failed (attempt %d/%d), retrying in %.1fs: %s",
+                                    channel_name.capitalize(), attempt, attempts, delay, exc)
+                    _sleep(delay)
+                    continue
+                breaker.record_failure(str(exc), open_for=retry_after if retry_after else None)
+                outcome_recorded = True
+                logging.error("%s send failed: %s", channel_name.capitalize(), exc)
+                result = _error_result(True, error=str(exc))
+                result["attempts"] = attempt
+                return result
+            breaker.record_success()
+            outcome_recorded = True
+            result = _ok_result(True, resp.status_code)
+            result["attempts"] = attempt
+            return result
+    finally:
+        if not outcome_recorded:
+            breaker.release_trial()
+
+
+def get_channel_health():
+    """Configuration and circuit-breaker state for every channel."""
+    configured = get_configured_services()
+    return {
+        channel_name: {**configured[channel_name], **_channel_breaker(channel_name).snapshot()}
+        for channel_name in CHANNEL_NAMES
+    }
+
+
 def send(message, title="statainer", priority=0, event=None):
-    """Send a notification to all configured services and return per-channel status."""
+    """Send a notification to all configured services and return per-channel status.
+
+    Configured channels are sent concurrently, so the call takes about as long
+    as the slowest channel rather than the sum of all of them.
+    """
     configured = get_configured_services()
-    context = _build_context(message, title, priority, event=event)
+    context = build_notification_context(message, title, priority, event=event)
     channel_results = {}
-    successful_channels = []
-
-    channels = [
-        ("pushover", configured["pushover"]["configured"], lambda: _send_pushover(message, title, priority)),
-        ("slack", configured["slack"]["configured"], lambda: _send_slack(message, title)),
-        ("telegram", configured["telegram"]["configured"], lambda: _send_telegram(message, title)),
-        ("discord", configured["discord"]["configured"], lambda: _send_discord(message, title)),
-        ("ntfy", configured["ntfy"]["configured"], lambda: _send_ntfy(message, title, priority, context)),
-        ("webhook", configured["webhook"]["configured"], lambda: _send_generic_webhook(context)),
-    ]
-
-    for channel_name, is_configured, sender in channels:
-        if not is_configured:
+    targets = []
+    for channel_name in CHANNEL_NAMES:
+        if configured[channel_name]["configured"]:
+            targets.append(channel_name)
+        else:
             channel_results[channel_name] = _error_result(False, skipped="missing env vars")
-            continue
 
-        try:
-            resp = sender()
-            channel_results[channel_name] = _ok_result(True, resp.status_code)
-            successful_channels.append(channel_name)
-        except Exception as exc:
-            logging.error("%s send failed: %s", channel_name.capitalize(), exc)
-            channel_results[channel_name] = _error_result(True, error=str(exc))
+    def deliver(channel_name):
+        return send_channel(channel_name, message, title, priority, event=event, context=context)
+
+    if len(targets) > 1:
+        with ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix="notify-fanout") as executor:
+            channel_results.update(zip(targets, executor.map(deliver, targets)))
+    else:
+        channel_results.update((channel_name, deliver(channel_name)) for channel_name in targets)
 
     return {
-        "ok": bool(successful_channels),
+        "ok": any(result["ok"] for result in channel_results.values()),
         "configured_any": any(info["configured"] for info in configured.values()),
-        "successful_channels": successful_channels,
-        "channels": channel_results,
+        "successful_channels": [name for name in CHANNEL_NAMES if channel_results[name]["ok"]],
+        "channels": {name: channel_results[name] for name in CHANNEL_NAMES},
     }
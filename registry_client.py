@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_REGISTRY = 'docker.io'
+MANIFEST_ACCEPT = ', '.join((
+    'application/vnd.oci.image.index.v1+json',
+    'application/vnd.docker.distribution.manifest.list.v2+json',
+    'application/vnd.oci.image.manifest.v1+json',
+    'application/vnd.docker.distribution.manifest.v2+json',
+))
+DOCKER_HUB_API_HOST = 'registry-1.docker.io'
+REGISTRY_REQUEST_TIMEOUT = (5, 15)
+REGISTRY_POOL_SIZE = 16
+DEFAULT_TOKEN_TTL_SECONDS = 60
+DEFAULT_RATE_LIMIT_WINDOW_SECONDS = 60
+_CHALLENGE_PARAM_RE = re.compile(r'(\w+)="([^"]*)"')
+
+
+def normalize_image_ref(image_ref):
+    """Canonical registry/repository:tag form, e.g. 'redis:7' -> 'docker.io/library/redis:7'."""
+    ref = str(image_ref or '').strip()
+    if not ref:
+        return ''
+    name, at, digest = ref.partition('@')
+    last_segment = name.rsplit('/', 1)[-1]
+    if ':' in last_segment:
+        repository, tag = name.rsplit(':', 1)
+    else:
+        repository, tag = name, 'latest'
+    first, slash, rest = repository.partition('/')
+    if not slash:
+        repository = f'{DEFAULT_REGISTRY}/library/{first}'
+    elif '.' not in first and ':' not in first and first != 'localhost':
+        repository = f'{DEFAULT_REGISTRY}/{repository}'
+    elif first in ('index.docker.io', 'registry-1.docker.io'):
+        repository = f'{DEFAULT_REGISTRY}/{rest}'
+        if '/' not in rest:
+            repository = f'{DEFAULT_REGISTRY}/library/{rest}'
+    normalized = f'{repository.lower()}:{tag}'
+    return f'{normalized}@{digest}' if at else normalized
+
+
+class RegistryError(Exception):
+    """The registry could not answer directly; callers fall back to dockerd."""
+
+
+class RegistryRateLimited(RegistryError):
+    def __init__(self, host, retry_at):
+        super().__init__(f'Registry {host} rate limit reached; retry after {time.ctime(retry_at)}')
+        self.host = host
+        self.retry_at = retry_at
+
+    def __reduce__(self):
+        return type(self), (self.host, self.retry_at)
+
+
+def split_image_ref(image_ref):
+    """Return (registry host, repository, tag or digest) for an image reference."""
+    normalized = normalize_image_ref(image_ref)
+    if not normalized:
+        raise RegistryError('Empty image reference')
+    name, at, digest = normalized.partition('@')
+    repository_path, tag = name.rsplit(':', 1) if ':' in name.rsplit('/', 1)[-1] else (name, 'latest')
+    host, repository = repository_path.split('/', 1)
+    if host == DEFAULT_REGISTRY:
+        host = DOCKER_HUB_API_HOST
+    return host, repository, (digest if at else tag)
+
+
+def parse_rate_limit_remaining(value):
+    """Parse 'RateLimit-Remaining: 76;w=21600' into (76, 21600); missing parts are None."""
+    if not value:
+        return None, None
+    remaining_part, _, params = str(value).partition(';')
+    try:
+        remaining = int(remaining_part.strip())
+    except ValueError:
+        return None, None
+    window = None
+    match = re.search(r'w=(\d+)', params)
+    if match:
+        window = int(match.group(1))
+    return remaining, window
+
+
+class RegistryClient:
+    """Resolve manifest digests with HEAD requests straight against the registry.
+
+    Bearer tokens are fetched once per repository and reused until they expire,
+    HTTP connections are pooled per host, a known digest is sent as
+    If-None-Match, and a registry that reports RateLimit-Remaining: 0 (or
+    answers 429) is not contacted again until its window resets.
+    """
+
+    def __init__(self, insecure_hosts=(), timeout=REGISTRY_REQUEST_TIMEOUT, session=None, clock=time.time):
+        self.insecure_hosts = {str(host).strip() for host in insecure_hosts if str(host).strip()}
+        self.timeout = timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = {}
+        self._known_digests = {}
+        self._blocked_until = {}
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=REGISTRY_POOL_SIZE, pool_maxsize=REGISTRY_POOL_SIZE)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _base_url(self, host):
+        scheme = 'http' if host in self.insecure_hosts else 'https'
+        return f'{scheme}://{host}'
+
+    def _cached_token(self, host, repository):
+        with self._lock:
+            token, expires_at = self._tokens.get((host, repository), (None, 0))
+        return token if token and expires_at > self._clock() else None
+
+    def _fetch_token(self, host, repository, challenge):
+        scheme, _, params_text = str(challenge or '').partition(' ')
+        if scheme.lower() != 'bearer':
+            raise RegistryError(f'Unsupported auth challenge from {host}: {challenge}')
+        params = dict(_CHALLENGE_PARAM_RE.findall(params_text))
+        realm = params.pop('realm', None)
+        if not realm:
+            raise RegistryError(f'Auth challenge from {host} has no realm')
+        params.setdefault('scope', f'repository:{repository}:pull')
+        try:
+            response = self.session.get(realm, params=params, timeout=self.timeout)
+        except requests.RequestException as exc:
+            raise RegistryError(f'Token request to {realm} failed: {exc}') from exc
+        if response.status_code != 200:
+            raise RegistryError(f'Token request to {realm} returned HTTP {response.status_code}')
+        try:
+            payload = response.json()
+        except ValueError as exc:
+            raise RegistryError(f'Token response from {realm} is not JSON') from exc
+        token = payload.get('token') or payload.get('access_token')
+        if not token:
+            raise RegistryError(f'Token response from {realm} has no token')
+        expires_in = int(payload.get('expires_in') or DEFAULT_TOKEN_TTL_SECONDS)
+        with self._lock:
+            # Renew a little early so an in-flight HEAD never carries an expired token.
+            self._tokens[(host, repository)] = (token, self._clock() + max(1, expires_in - 5))
+        return token
+
+    def _check_rate_limit(self, host):
+        with self._lock:
+            blocked_until = self._blocked_until.get(host, 0)
+        if blocked_until > self._clock():
+            raise RegistryRateLimited(host, blocked_until)
+
+    def _record_rate_limit(self, host, response):
+        remaining, window = parse_rate_limit_remaining(response.headers.get('RateLimit-Remaining'))
+        retry_after = response.headers.get('Retry-After')
+        if response.status_code == 429 or remaining == 0:
+            try:
+                wait_seconds = int(retry_after) if retry_after else (window or DEFAULT_RATE_LIMIT_WINDOW_SECONDS)
+            except ValueError:
+                wait_seconds = window or DEFAULT_RATE_LIMIT_WINDOW_SECONDS
+            with self._lock:
+                self._blocked_until[host] = self._clock() + wait_seconds
+            logging.warning("Registry %s rate limit exhausted; pausing direct checks for %ss", host, wait_seconds)
+
+    def _head_manifest(self, url, token, known_digest):
+        headers = {'Accept': MANIFEST_ACCEPT}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        if known_digest:
+            headers['If-None-Match'] = f'"{known_digest}"'
+        try:
+            return self.session.head(url, headers=headers, timeout=self.timeout, allow_redirects=True)
+        except requests.RequestException as exc:
+            raise RegistryError(f'HEAD {url} failed: {exc}') from exc
+
+    def head_digest(self, image_ref):
+        """Return the Docker-Content-Digest for image_ref or raise RegistryError."""
+        host, repository, reference = split_image_ref(image_ref)
+        self._check_rate_limit(host)
+        url = f'{self._base_url(host)}/v2/{repository}/manifests/{reference}'
+        known_key = (host, repository, reference)
+        with self._lock:
+            known_digest = self._known_digests.get(known_key)
+
+        response = self._head_manifest(url, self._cached_token(host, repository), known_digest)
+        if response.status_code == 401:
+            token = self._fetch_token(host, repository, response.headers.get('WWW-Authenticate'))
+            response = self._head_manifest(url, token, known_digest)
+        self._record_rate_limit(host, response)
+
+        if response.status_code == 304 and known_digest:
+            return known_digest
+        if response.status_code == 429:
+            raise RegistryRateLimited(host, self._blocked_until.get(host, self._clock()))
+        if response.status_code != 200:
+            raise RegistryError(f'HEAD {url} returned HTTP {response.status_code}')
+        digest = response.headers.get('Docker-Content-Digest')
+        if not digest:
+            raise RegistryError(f'HEAD {url} returned no Docker-Content-Digest header')
+        with self._lock:
+            self._known_digests[known_key] = digest
+        return digest
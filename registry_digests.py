@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+import copy
+import logging
+import threading
+import time
+
+from config import (
+    REGISTRY_DIGEST_CACHE_TTL_SECONDS, REGISTRY_DIGEST_NEGATIVE_TTL_SECONDS, REGISTRY_DIRECT_CHECKS,
+    REGISTRY_INSECURE_HOSTS
+)
+from registry_client import RegistryClient, RegistryError, RegistryRateLimited, normalize_image_ref
+
+# Forced checks still reuse a digest fetched this recently, so one forced
+# sampler pass over twenty redis:7 containers makes a single registry call.
+FORCED_CHECK_MAX_AGE_SECONDS = 30
+
+
+def _fresh_error(error):
+    """A copy of a cached lookup error for one caller.
+
+    Raising one shared instance from many threads keeps growing its
+    __traceback__, so every caller gets its own exception of the same type.
+    """
+    try:
+        fresh = copy.copy(error)
+    except Exception:
+        fresh = None
+    if not isinstance(fresh, Exception) or fresh is error:
+        fresh = RegistryError(str(error))
+    return fresh
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.digest = None
+        self.error = None
+
+
+class RegistryDigestCache:
+    """Remote manifest digests keyed by normalized image reference.
+
+    Successful lookups live for ttl_seconds and failures for negative_ttl_seconds
+    (a copy of the original exception is raised on a negative hit). Concurrent lookups of
+    the same reference share one registry call.
+    """
+
+    def __init__(self, ttl_seconds=REGISTRY_DIGEST_CACHE_TTL_SECONDS,
+                 negative_ttl_seconds=REGISTRY_DIGEST_NEGATIVE_TTL_SECONDS, clock=time.monotonic, direct_client=None):
+        self.direct_client = direct_client
+        self.ttl_seconds = max(0, int(ttl_seconds))
+        self.negative_ttl_seconds = max(0, int(negative_ttl_seconds))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._in_flight = {}
+        self._counters = {
+            'hits': 0, 'negative_hits': 0, 'misses': 0, 'coalesced': 0, 'errors': 0,
+            'direct_lookups': 0, 'direct_fallbacks': 0, 'rate_limited': 0,
+        }
+
+    def get_digest(self, client, image_ref, max_age=None):
+        """Return the registry digest for image_ref, raising the lookup error on failure.
+
+        max_age narrows how old a cached success may be (used by forced checks).
+        """
+        key = normalize_image_ref(image_ref)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                fetched_at, digest, error = entry
+                age = now - fetched_at
+                if error is not None and age < self.negative_ttl_seconds:
+                    self._counters['negative_hits'] += 1
+                    raise _fresh_error(error)
+                limit = self.ttl_seconds if max_age is None else min(self.ttl_seconds, max_age)
+                if error is None and age < limit:
+                    self._counters['hits'] += 1
+                    return digest
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _InFlight()
+                self._counters['misses'] += 1
+            else:
+                self._counters['coalesced'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise _fresh_error(call.error)
+            return call.digest
+
+        try:
+            call.digest = self._fetch_digest(client, image_ref)
+        except Exception as exc:
+            call.error = exc
+        with self._lock:
+            self._entries[key] = (self._clock(), call.digest, call.error)
+            self._in_flight.pop(key, None)
+            if call.error is not None:
+                self._counters['errors'] += 1
+        call.done.set()
+        if call.error is not None:
+            raise call.error
+        return call.digest
+
+    def _fetch_digest(self, client, image_ref):
+        if self.direct_client is not None:
+            try:
+                digest = self.direct_client.head_digest(image_ref)
+                with self._lock:
+                    self._counters['direct_lookups'] += 1
+                return digest
+            except RegistryRateLimited:
+                # dockerd would spend the same pull quota; fail and let the negative cache hold it.
+                with self._lock:
+                    self._counters['rate_limited'] += 1
+                raise
+            except RegistryError as exc:
+                with self._lock:
+                    self._counters['direct_fallbacks'] += 1
+                logging.info("Direct registry check for %s failed, asking dockerd: %s", image_ref, exc)
+        return client.images.get_registry_data(image_ref).id
+
+    def invalidate(self, image_ref=None):
+        with self._lock:
+            if image_ref is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(normalize_image_ref(image_ref), None)
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, 'entries': len(self._entries), 'in_flight': len(self._in_flight)}
+
+
+digest_cache = RegistryDigestCache(
+    direct_client=RegistryClient(insecure_hosts=REGISTRY_INSECURE_HOSTS.split(',')) if REGISTRY_DIRECT_CHECKS else None,
+)
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import re
+import threading
+import time
+
+import docker.errors
+
+from config import ROLLBACK_MAX_DISK_MB, ROLLBACK_MAX_IMAGES
+from docker_client import get_docker_client
+from metrics_utils import parse_datetime
+from update_manager import ROLLBACK_REPOSITORY_PREFIX, rollback_dir, rollback_image_targets
+from users_db import disable_update_history_rollback
+
+_OVERRIDE_NAME_RE = re.compile(r'^(.+)-history-(\d+)\.override\.yml$')
+
+
+def _override_files():
+    """Map (project fragment, history token) -> list of (path, mtime) for override files in the rollback dir."""
+    files = {}
+    directory = rollback_dir()
+    for name in os.listdir(directory):
+        match = _OVERRIDE_NAME_RE.search(name)
+        if not match:
+            continue
+        path = os.path.join(directory, name)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            continue
+        files.setdefault((match.group(1), match.group(2)), []).append((path, mtime))
+    return files
+
+
+def _override_project(repository, token, overrides):
+    """Project fragment of the override files written with a rollback tag, or None.
+
+    Repositories are named <project>-<service>, so the longest project
+    fragment with the same token that prefixes the name wins.
+    """
+    name = repository.split('/', 1)[-1]
+    candidates = [project for project, override_token in overrides if override_token == token and name.startswith(f'{project}-')]
+    return max(candidates, key=len, default=None)
+
+
+class RollbackArtifactManager:
+    """Keep rollback image tags and compose override files within a budget.
+
+    Artifacts are discovered from Docker (tags under ROLLBACK_REPOSITORY_PREFIX)
+    and the rollback override directory rather than stored separately, so
+    tags removed by hand are never double counted. Pruning removes the
+    oldest tags first and keeps only the image behind the newest rollback of
+    each container or project; older history entries whose image is pruned
+    stop offering a rollback. Reclaimed
+    bytes only count images that actually left the host, since a tag on an
+    image still used by a container frees nothing.
+    """
+
+    def __init__(self, max_images=ROLLBACK_MAX_IMAGES, max_bytes=ROLLBACK_MAX_DISK_MB * 1024 * 1024):
+        self.max_images = max(1, int(max_images))
+        self.max_bytes = max(0, int(max_bytes))
+        self._lock = threading.Lock()
+        self._last_prune = None
+        self._total_reclaimed_bytes = 0
+
+    def list_artifacts(self, client=None):
+        """Rollback tags oldest first, each with its image size and override files."""
+        client = client or get_docker_client()
+        overrides = _override_files()
+        artifacts = []
+        for image in client.images.list(name=f'{ROLLBACK_REPOSITORY_PREFIX}/*'):
+            size = int(image.attrs.get('Size') or 0)
+            for tag in image.tags or []:
+                if not tag.startswith(f'{ROLLBACK_REPOSITORY_PREFIX}/'):
+                    continue
+                repository, _, tag_name = tag.rpartition(':')
+                token = tag_name.split('-', 1)[-1]
+                project = _override_project(repository, token, overrides)
+                override_entries = overrides.get((project, token), [])
+                created_at = max((mtime for _path, mtime in override_entries), default=None)
+                if created_at is None:
+                    image_created = parse_datetime(image.attrs.get('Created'))
+                    created_at = image_created.timestamp() if image_created else 0
+                artifacts.append({
+                    'ref': tag,
+                    'repository': repository,
+                    'token': token,
+                    'project': project,
+                    'image_id': image.id,
+                    'size_bytes': size,
+                    'created_at': float(created_at),
+                    'override_files': [path for path, _mtime in override_entries],
+                })
+        artifacts.sort(key=lambda item: (item['created_at'], item['ref']))
+        return artifacts
+
+    def _usage(self, artifacts):
+        # Several tags can point at one image; count its size once.
+        sizes = {item['image_id']: item['size_bytes'] for item in artifacts}
+        return len(artifacts), sum(sizes.values())
+
+    def prune(self, client=None):
+        """Remove the oldest rollback tags until the count and disk budgets hold."""
+        client = client or get_docker_client()
+        with self._lock:
+            artifacts = self.list_artifacts(client)
+            entries_by_image, protected_image_ids = rollback_image_targets()
+
+            removed = []
+            reclaimed_bytes = 0
+            disabled_entries = []
+            remaining = list(artifacts)
+            for item in artifacts:
+                count, used_bytes = self._usage(remaining)
+                if count <= self.max_images and used_bytes <= self.max_bytes:
+                    break
+                if item['image_id'] in protected_image_ids:
+                    continue
+                try:
+                    client.images.remove(item['ref'], noprune=False)
+                except docker.errors.APIError as exc:
+                    logging.warning("Could not remove rollback image %s: %s", item['ref'], exc)
+                    continue
+                remaining.remove(item)
+                removed.append(item['ref'])
+                if not any(other['image_id'] == item['image_id'] for other in remaining):
+                    try:
+                        client.images.get(item['image_id'])
+                    except docker.errors.ImageNotFound:
+                        reclaimed_bytes += item['size_bytes']
+                        disabled_entries.extend(entries_by_image.get(item['image_id'], []))
+            if disabled_entries:
+                disable_update_history_rollback(disabled_entries, 'Rollback image was pruned.')
+
+            live_overrides = {(item['project'], item['token']) for item in remaining}
+            removed_files = []
+            for key, entries in _override_files().items():
+                if key in live_overrides:
+                    continue
+                for path, _mtime in entries:
+                    try:
+                        os.remove(path)
+                        removed_files.append(os.path.basename(path))
+                    except OSError as exc:
+                        logging.warning("Could not remove rollback override %s: %s", path, exc)
+
+            self._total_reclaimed_bytes += reclaimed_bytes
+            self._last_prune = {
+                'pruned_at': time.time(),
+                'removed_images': removed,
+                'removed_override_files': removed_files,
+                'reclaimed_bytes': reclaimed_bytes,
+                'disabled_rollbacks': sorted(disabled_entries),
+            }
+            return dict(self._last_prune)
+
+    def stats(self, client=None):
+        artifacts = self.list_artifacts(client)
+        count, used_bytes = self._usage(artifacts)
+        with self._lock:
+            return {
+                'images': count,
+                'bytes': used_bytes,
+                'override_files': sum(len(item) for item in _override_files().values()),
+                'max_images': self.max_images,
+                'max_bytes': self.max_bytes,
+                'last_prune': dict(self._last_prune) if self._last_prune else None,
+                'total_reclaimed_bytes': self._total_reclaimed_bytes,
+                'artifacts': artifacts,
+            }
+
+
+rollback_artifacts = RollbackArtifactManager()
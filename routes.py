@@ -2,6 +2,8 @@
 
 import collections
 import datetime
+import heapq
+import queue
 import threading
 import time  # Add time import
 import requests  # Añadido para peticiones HTTP a cAdvisor
@@ -12,13 +14,19 @@ import json  # Add json import for embedding data
 import secrets
 import multiprocessing  # Add for CPU core detection
 from functools import wraps
+from container_logs import (
+    LogSink, TimestampMerger, build_log_record, close_log_stream, compile_log_pattern, iter_buffered_chunks,
+    iter_gzip_chunks, iter_log_lines, log_follower_hub, open_log_stream, search_log_lines
+)
 from update_notifications import build_update_result_event
 from users_db import (
-    validate_user, change_password, create_user_with_columns, list_users_with_columns,
+    validate_user, validate_user_cached, change_password, create_user_with_columns, list_users_with_columns,
     update_user_columns, delete_user, get_user_columns, get_user_role, user_exists,
-    list_audit_events, record_audit_event
+    list_audit_events, enqueue_audit_event, audit_queue_depth, list_update_jobs, get_update_history_entry,
+    list_notification_records
 )
 import update_manager
+from update_jobs import ACTIVE_JOB_STATES, PRIORITY_MANUAL, job_executor
 errors = docker.errors
 
 # Importar estado compartido y clientes/utilidades necesarias
@@ -26,7 +34,10 @@ import sampler
 from sampler import history  # Solo importar history para uso local
 from docker_client import get_api_client, get_docker_client, get_docker_status # Necesario para ambas APIs
 from metrics_utils import parse_datetime, format_uptime # Necesario para /api/metrics
-from pushover_client import get_configured_services, send as send_notification
+from notification_dispatch import notification_dispatcher
+from pushover_client import get_channel_health, get_configured_services, send as send_notification
+from registry_digests import digest_cache
+from rollback_artifacts import rollback_artifacts
 
 # Crear un Blueprint para las rutas
 main_routes = Blueprint('main_routes', __name__, template_folder='templates', static_folder='static')
@@ -109,7 +120,7 @@ def get_request_remote_addr():
 
 
 def audit_event(action, target_type, status, target_id=None, details=None):
-    record_audit_event(
+    enqueue_audit_event(
         action=action,
         target_type=target_type,
         status=status,
@@ -140,6 +151,30 @@ def parse_log_tail_arg():
     return parse_positive_int_arg(request.args.get('tail', 100), 100, minimum=1, maximum=10000)
 
 
+def parse_log_stream_tail_arg(default=100):
+    raw_tail = str(request.args.get('tail', default) or '').strip().lower()
+    if raw_tail == 'all':
+        return 'all'
+    return parse_positive_int_arg(raw_tail, 100, minimum=1)
+
+
+def parse_log_time_arg(name):
+    """Parse a ?since= / ?until= bound given as epoch seconds or an ISO datetime."""
+    raw_value = str(request.args.get(name) or '').strip()
+    if not raw_value:
+        return None
+    try:
+        return int(float(raw_value))
+    except ValueError:
+        pass
+    parsed = parse_datetime(raw_value)
+    if parsed is None:
+        raise ValueError(f"Invalid '{name}' value: {raw_value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return int(parsed.timestamp())
+
+
 def read_container_log_text(container, tail):
     raw_logs = container.logs(tail=tail, timestamps=True)
     if isinstance(raw_logs, bytes):
@@ -232,7 +267,7 @@ def login():
         limited, retry_after = is_login_rate_limited(client_ip)
         if limited:
             error = f"Too many failed login attempts. Try again in {retry_after} seconds."
-            record_audit_event(
+            enqueue_audit_event(
                 action='login',
                 target_type='session',
                 status='failure',
@@ -257,7 +292,7 @@ def login():
             return redirect(url_for('main_routes.index'))
         else:
             record_failed_login(client_ip)
-            record_audit_event(
+            enqueue_audit_event(
                 action='login',
                 target_type='session',
                 status='failure',
@@ -295,7 +330,7 @@ def logout():
         samesite=current_app.config.get('SESSION_COOKIE_SAMESITE', 'Lax'),
     )
     if username:
-        record_audit_event(
+        enqueue_audit_event(
             action='logout',
             target_type='session',
             status='success',
@@ -342,7 +377,8 @@ def require_auth():
                 return jsonify({"error": "rate_limited", "message": f"Too many failed login attempts. Try again in {retry_after} seconds."}), 429
             return Response(f'Too many failed login attempts. Try again in {retry_after} seconds.', 429)
         auth = request.authorization
-        if not auth or not validate_user(auth.username, auth.password):
+        cache_ttl = int(current_app.config.get('AUTH_CACHE_TTL_SECONDS', 60))
+        if not auth or not validate_user_cached(auth.username, auth.password, ttl_seconds=cache_ttl):
             if auth and auth.username:
                 record_failed_login(client_ip)
             # If requesting API endpoint, return JSON 401 error
@@ -389,6 +425,11 @@ def api_system_status():
             'version': current_app.config.get('APP_VERSION', 'dev'),
             'ephemeral_secret_key': bool(current_app.config.get('APP_SECRET_KEY_EPHEMERAL')),
         },
+        'audit': {
+            'queue_depth': audit_queue_depth(),
+        },
+        'registry_digest_cache': digest_cache.stats(),
+        'notification_dispatch': notification_dispatcher.stats(),
     })
 
 def get_cadvisor_metrics():
@@ -1046,8 +1087,10 @@ def api_container_history(container_id):
 @main_routes.route('/api/logs/<container_id>')
 def api_container_logs(container_id):
     print(f"DEBUG LOGS: Snapshot request received for {container_id[:12]}")
-    tail = parse_log_tail_arg()
     download = request.args.get('download', '0') == '1'
+    if download:
+        return download_container_logs(container_id)
+    tail = parse_log_tail_arg()
     try:
         client = get_docker_client()
         container = client.containers.get(container_id)
@@ -1058,10 +1101,49 @@ def api_container_logs(container_id):
         print(f"ERROR LOGS: Error while reading logs for {container_id[:12]}: {e}")
         return jsonify({'error': f'Error accessing container logs: {str(e)}'}), 500
 
-    response = Response(logs, mimetype='text/plain; charset=utf-8')
-    if download:
-        filename = sanitize_download_filename(getattr(container, 'name', container_id))
-        response.headers['Content-Disposition'] = f'attachment; filename="{filename}-{container_id[:12]}-logs.txt"'
+    return Response(logs, mimetype='text/plain; charset=utf-8')
+
+
+def download_container_logs(container_id):
+    """Stream a log download straight from Docker without buffering the whole tail."""
+    tail = parse_log_stream_tail_arg()
+    compress = request.args.get('gzip', '0') == '1'
+    try:
+        since = parse_log_time_arg('since')
+        until = parse_log_time_arg('until')
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    try:
+        client = get_docker_client()
+        container = client.containers.get(container_id)
+        log_stream = open_log_stream(container, tail=tail, since=since, until=until)
+    except errors.NotFound:
+        return jsonify({'error': f"Container '{container_id}' not found."}), 404
+    except Exception as e:
+        print(f"ERROR LOGS: Error while opening log download for {container_id[:12]}: {e}")
+        return jsonify({'error': f'Error accessing container logs: {str(e)}'}), 500
+
+    def generate_download():
+        try:
+            chunks = iter_buffered_chunks(log_stream)
+            if compress:
+                chunks = iter_gzip_chunks(chunks)
+            for chunk in chunks:
+                yield chunk
+        except errors.APIError as api_e:
+            print(f"ERROR LOGS: Docker API error while downloading logs for {container_id[:12]}: {api_e}")
+        finally:
+            close_log_stream(log_stream)
+
+    filename = f"{sanitize_download_filename(getattr(container, 'name', container_id))}-{container_id[:12]}-logs.txt"
+    if compress:
+        response = Response(generate_download(), mimetype='application/gzip')
+        filename += '.gz'
+    else:
+        response = Response(generate_download(), mimetype='text/plain; charset=utf-8')
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['X-Accel-Buffering'] = 'no'
     return response
 
 
@@ -1096,15 +1178,8 @@ def stream_container_logs(container_id):
             })
 
             log_stream = container.logs(stream=True, follow=True, tail=0, timestamps=True)
-            buffer = ''
-            for chunk in log_stream:
-                buffer += chunk.decode('utf-8', errors='replace')
-                while '\n' in buffer:
-                    line, buffer = buffer.split('\n', 1)
-                    yield sse_event('line', {'text': line})
-
-            if buffer:
-                yield sse_event('line', {'text': buffer})
+            for line in iter_log_lines(log_stream):
+                yield sse_event('line', {'text': line})
         except errors.APIError as api_e:
             print(f"ERROR LOGS: Docker API error while streaming logs for {container_id[:12]}: {api_e}")
             yield sse_event('error', {'message': f'Docker API error while streaming logs: {str(api_e)}'})
@@ -1114,11 +1189,7 @@ def stream_container_logs(container_id):
             print(f"ERROR LOGS: Unexpected error while streaming logs for {container_id[:12]}: {log_e}")
             yield sse_event('error', {'message': f'Error streaming logs: {str(log_e)}'})
         finally:
-            if hasattr(log_stream, 'close'):
-                try:
-                    log_stream.close()
-                except Exception:
-                    pass
+            close_log_stream(log_stream)
             print(f"DEBUG LOGS: Log stream closed for {container_id[:12]}")
 
     response = Response(stream_with_context(generate_logs()), mimetype='text/event-stream')
@@ -1126,6 +1197,202 @@ def stream_container_logs(container_id):
     response.headers['X-Accel-Buffering'] = 'no'
     return response
 
+
+@main_routes.route('/api/logs/<container_id>/search')
+def search_container_logs(container_id):
+    """Stream server-side log matches with context lines as SSE events."""
+    print(f"DEBUG LOGS: Search request received for {container_id[:12]}")
+    tail = parse_log_stream_tail_arg(default='all')
+    context = parse_positive_int_arg(request.args.get('context', 0), 0, minimum=0, maximum=20)
+    max_matches = parse_positive_int_arg(request.args.get('max', 200), 200, minimum=1, maximum=1000)
+    cpu_budget = max(1, int(current_app.config.get('LOG_SEARCH_CPU_SECONDS', 5)))
+    use_regex = request.args.get('regex', '0') == '1'
+    try:
+        pattern = compile_log_pattern(
+            request.args.get('q', ''),
+            regex=use_regex,
+            case_sensitive=request.args.get('case', '0') == '1',
+        )
+        since = parse_log_time_arg('since')
+        until = parse_log_time_arg('until')
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    try:
+        client = get_docker_client()
+        container = client.containers.get(container_id)
+        container_name = str(container.name)
+        log_stream = open_log_stream(container, tail=tail, since=since, until=until)
+    except errors.NotFound:
+        return jsonify({'error': f"Container '{container_id}' not found."}), 404
+    except Exception as e:
+        print(f"ERROR LOGS: Error while opening log search for {container_id[:12]}: {e}")
+        return jsonify({'error': f'Error accessing container logs: {str(e)}'}), 500
+
+    def generate_matches():
+        try:
+            yield sse_event('connected', {
+                'container_id': container_id,
+                'container_name': container_name,
+                'query': pattern.pattern,
+                'context': context,
+            })
+            results = search_log_lines(
+                iter_log_lines(log_stream),
+                pattern,
+                context=context,
+                max_matches=max_matches,
+                cpu_budget_seconds=cpu_budget,
+                isolate=use_regex,
+            )
+            for kind, payload in results:
+                yield sse_event(kind, payload)
+        except errors.APIError as api_e:
+            print(f"ERROR LOGS: Docker API error while searching logs for {container_id[:12]}: {api_e}")
+            yield sse_event('error', {'message': f'Docker API error while searching logs: {str(api_e)}'})
+        except GeneratorExit:
+            pass
+        finally:
+            close_log_stream(log_stream)
+
+    response = Response(stream_with_context(generate_matches()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def list_project_containers(client, project):
+    """Running containers of a compose project, keyed by id with their service name."""
+    containers = client.containers.list(filters={'label': f'com.docker.compose.project={project}'})
+    members = {}
+    for container in containers:
+        labels = container.labels or {}
+        if labels.get('com.docker.compose.project') != project:
+            continue
+        members[container.id] = (container, labels.get('com.docker.compose.service') or container.name)
+    return members
+
+
+def read_project_log_snapshot(members, tail):
+    """Merge the last `tail` lines of every project container into one time-ordered list."""
+    per_container = []
+    for container_id, (container, service) in members.items():
+        log_stream = open_log_stream(container, tail=tail)
+        try:
+            per_container.append([
+                build_log_record(line, container_id, container.name, service)
+                for line in iter_log_lines(log_stream)
+            ])
+        finally:
+            close_log_stream(log_stream)
+    merged = heapq.merge(*per_container, key=lambda item: item[0])
+    return [(sort_ts, record) for sort_ts, record in merged]
+
+
+@main_routes.route('/api/logs/project/<project>/stream')
+def stream_project_logs(project):
+    """Follow every container of a compose project as one time-ordered SSE stream.
+
+    Each container is followed once through the shared follower hub, no matter
+    how many clients watch the project, and lines are released through a small
+    reorder window so interleaved output from different services stays ordered.
+    """
+    print(f"DEBUG LOGS: Project stream request received for {project}")
+    tail = parse_positive_int_arg(request.args.get('tail', 50), 50, minimum=0, maximum=1000)
+    window_ms = parse_positive_int_arg(request.args.get('window_ms', 500), 500, minimum=50, maximum=5000)
+    snapshot_only = request.args.get('once', '0') == '1'
+    heartbeat_seconds = max(5, int(current_app.config.get('STREAM_HEARTBEAT_SECONDS', 15)))
+    try:
+        client = get_docker_client()
+        members = list_project_containers(client, project)
+    except Exception as e:
+        print(f"ERROR LOGS: Error while listing containers for project {project}: {e}")
+        return jsonify({'error': f'Error accessing project containers: {str(e)}'}), 500
+    if not members:
+        return jsonify({'error': f"No running containers found for project '{project}'."}), 404
+
+    def generate_project_logs():
+        sink = LogSink()
+        subscribed = set()
+        snapshot_cutoffs = {}
+        merger = TimestampMerger(window_seconds=window_ms / 1000.0)
+
+        def follow(current_members):
+            for container_id, (container, service) in current_members.items():
+                if container_id in subscribed and log_follower_hub.is_following(container_id):
+                    continue
+                log_follower_hub.subscribe(container, service, sink)
+                subscribed.add(container_id)
+
+        try:
+            if not snapshot_only:
+                follow(members)
+            snapshot = read_project_log_snapshot(members, tail) if tail else []
+            for sort_ts, record in snapshot:
+                snapshot_cutoffs[record['container_id']] = sort_ts
+            yield sse_event('connected', {
+                'project': project,
+                'services': sorted({service for _container, service in members.values()}),
+                'containers': len(members),
+                'tail': tail,
+                'window_ms': window_ms,
+            })
+            yield sse_event('snapshot', {'project': project, 'lines': [record for _ts, record in snapshot]})
+            if snapshot_only:
+                return
+
+            last_refresh = last_heartbeat = time.time()
+            while True:
+                try:
+                    item = sink.queue.get(timeout=merger.window_seconds)
+                except queue.Empty:
+                    item = None
+                while item is not None:
+                    sort_ts, record = item
+                    if sort_ts > snapshot_cutoffs.get(record['container_id'], float('-inf')):
+                        merger.push(sort_ts, record)
+                    try:
+                        item = sink.queue.get_nowait()
+                    except queue.Empty:
+                        item = None
+
+                ready = merger.pop_ready()
+                if ready:
+                    yield sse_event('lines', {'project': project, 'items': ready})
+
+                now = time.time()
+                if now - last_refresh >= heartbeat_seconds:
+                    last_refresh = now
+                    current_members = list_project_containers(client, project)
+                    for container_id in subscribed - set(current_members):
+                        log_follower_hub.unsubscribe(container_id, sink)
+                    subscribed.intersection_update(current_members)
+                    follow(current_members)
+                if now - last_heartbeat >= heartbeat_seconds:
+                    last_heartbeat = now
+                    yield sse_event('heartbeat', {
+                        'timestamp': now,
+                        'containers': len(subscribed),
+                        'dropped': sink.dropped,
+                    })
+        except errors.APIError as api_e:
+            print(f"ERROR LOGS: Docker API error while streaming project {project}: {api_e}")
+            yield sse_event('error', {'message': f'Docker API error while streaming logs: {str(api_e)}'})
+        except GeneratorExit:
+            pass
+        except Exception as log_e:
+            print(f"ERROR LOGS: Unexpected error while streaming project {project}: {log_e}")
+            yield sse_event('error', {'message': f'Error streaming logs: {str(log_e)}'})
+        finally:
+            for container_id in subscribed:
+                log_follower_hub.unsubscribe(container_id, sink)
+            print(f"DEBUG LOGS: Project log stream closed for {project}")
+
+    response = Response(stream_with_context(generate_project_logs()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 # --- Ruta para obtener logs de un contenedor ---
 @main_routes.route('/logs/<container_id>')
 def get_container_logs(container_id):
@@ -1462,8 +1729,31 @@ def container_action(container_id, action):
 # --- Ruta API para notificaciones ---
 @main_routes.route('/api/notifications')
 def api_notifications():
-    """Devuelve notificaciones recientes. Permite filtrar por timestamp (?since=TIMESTAMP) y limitar cantidad."""
+    """Devuelve notificaciones recientes. Permite filtrar por timestamp (?since=TIMESTAMP) y limitar cantidad.
+
+    With history=1, before, type or project the stored history is paged
+    newest first instead (limit sets the page size); pass the X-Next-Before
+    header value as ?before= for the next page.
+    """
     from sampler import get_notifications
+    if any(request.args.get(key) for key in ('history', 'before', 'type', 'project')):
+        limit = parse_positive_int_arg(request.args.get('limit'), 50, minimum=1, maximum=500)
+        before_seq = parse_positive_int_arg(request.args.get('before'), 0, minimum=0) or None
+        try:
+            since_ts = float(request.args['since']) if request.args.get('since') else None
+        except ValueError:
+            return jsonify({'error': 'since must be a timestamp'}), 400
+        events = list_notification_records(
+            limit=limit,
+            before_seq=before_seq,
+            event_type=(request.args.get('type') or '').strip() or None,
+            project=(request.args.get('project') or '').strip() or None,
+            since=since_ts,
+        )
+        response = jsonify(events)
+        if len(events) == limit:
+            response.headers['X-Next-Before'] = str(events[-1]['seq'])
+        return response
     try:
         since = request.args.get('since', None)
         max_items = int(request.args.get('max', 50))
@@ -1495,12 +1785,23 @@ def api_notification_settings():
         'project_rule_mode', 'project_rules', 'container_rule_mode', 'container_rules',
         'silence_enabled', 'silence_start', 'silence_end',
         'dedupe_enabled', 'dedupe_window_seconds',
+        'digest_channels', 'digest_window_seconds',
     }
     filtered = {key: value for key, value in data.items() if key in allowed}
     settings = apply_notification_settings({**notification_settings, **filtered})
     return jsonify({'ok': True, 'settings': settings})
 
 
+@main_routes.route('/api/notification-status')
+@admin_required
+def api_notification_status():
+    """Per-channel circuit-breaker state plus outbound dispatch queue counters."""
+    return jsonify({
+        'channels': get_channel_health(),
+        'dispatch': notification_dispatcher.stats(),
+    })
+
+
 @main_routes.route('/api/notification-test', methods=['POST'])
 @admin_required
 @csrf_protect
@@ -1531,28 +1832,85 @@ def api_notification_test():
 @main_routes.route('/api/update-manager')
 @admin_required
 def api_update_manager():
-    """Return update-ready projects/containers and persistent update history."""
+    """Return update-ready projects/containers and persistent update history.
+
+    Without refresh=1 the precomputed inventory is served; its version is the
+    ETag, so a poll with If-None-Match gets 304 until something changes.
+    """
     refresh = request.args.get('refresh', '0') == '1'
     try:
         history_limit = max(1, min(int(request.args.get('history_limit', 20) or 20), 100))
     except (TypeError, ValueError):
         history_limit = 20
-    payload = update_manager.list_update_targets(history_limit=history_limit, force_refresh=refresh)
-    return jsonify(payload)
+    inventory = update_manager.update_inventory
+    if refresh:
+        payload = update_manager.list_update_targets(history_limit=history_limit, force_refresh=True)
+        payload.setdefault('version', inventory.version())
+        return jsonify(payload)
+
+    etag = f'"update-inventory-{inventory.version()}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        return Response(status=304, headers={'ETag': etag})
+    payload = inventory.payload(history_limit=history_limit)
+    response = jsonify(payload)
+    response.headers['ETag'] = f'"update-inventory-{payload["version"]}"'
+    return response
 
 
-@main_routes.route('/api/update-manager/update', methods=['POST'])
+@main_routes.route('/api/update-manager/version')
 @admin_required
-@csrf_protect
-def api_update_manager_update():
-    """Execute a safe update for a container or Compose project."""
-    data = request.get_json(force=True) or {}
-    target_type = str(data.get('target_type') or '').strip().lower()
-    target_id = str(data.get('target_id') or '').strip()
-    if target_type not in {'container', 'project'} or not target_id:
-        return jsonify({'ok': False, 'message': 'target_type and target_id are required.'}), 400
+def api_update_manager_version():
+    """Cheap poll target: the inventory version token only."""
+    return jsonify({'version': update_manager.update_inventory.version()})
 
-    result = update_manager.update_target(target_type, target_id, actor_username=get_request_username())
+
+def update_jobs_payload(limit):
+    return {
+        'jobs': list_update_jobs(limit=limit),
+        **job_executor.stats(),
+    }
+
+
+@main_routes.route('/api/update-manager/jobs')
+@admin_required
+def api_update_manager_jobs():
+    """Queued, running and recently finished auto-update jobs."""
+    limit = parse_positive_int_arg(request.args.get('limit', 50), 50, minimum=1, maximum=200)
+    return jsonify(update_jobs_payload(limit))
+
+
+@main_routes.route('/api/update-manager/jobs/stream')
+@admin_required
+def api_update_manager_jobs_stream():
+    """SSE feed that re-sends the job list whenever a job changes state."""
+    limit = parse_positive_int_arg(request.args.get('limit', 50), 50, minimum=1, maximum=200)
+    heartbeat_seconds = max(5, int(current_app.config.get('STREAM_HEARTBEAT_SECONDS', 15)))
+    snapshot_only = request.args.get('once', '0') == '1'
+
+    def generate_jobs():
+        try:
+            sequence = job_executor.stats()['sequence']
+            yield sse_event('jobs', update_jobs_payload(limit))
+            if snapshot_only:
+                return
+            while True:
+                next_sequence = job_executor.wait_for_change(sequence, timeout=heartbeat_seconds)
+                if next_sequence == sequence:
+                    yield sse_event('heartbeat', {'timestamp': time.time()})
+                    continue
+                sequence = next_sequence
+                yield sse_event('jobs', update_jobs_payload(limit))
+        except GeneratorExit:
+            pass
+
+    response = Response(stream_with_context(generate_jobs()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def record_manual_update_result(target_type, target_id, result, actor_username, actor_role, remote_addr):
+    """Notify and audit a finished manual update; safe to call outside a request."""
     emit_update_result_notification(
         target_type,
         target_id,
@@ -1565,19 +1923,248 @@ def api_update_manager_update():
         bool(result.get('ok')),
         history_entry=result.get('history_entry'),
     )
-    audit_event(
-        'update-manager.update',
-        target_type,
-        'success' if result.get('ok') else 'failure',
+    enqueue_audit_event(
+        action='update-manager.update',
+        target_type=target_type,
+        status='success' if result.get('ok') else 'failure',
+        actor_username=actor_username,
+        actor_role=actor_role,
         target_id=target_id,
+        remote_addr=remote_addr,
         details={
             'message': result.get('message'),
             'history_entry_id': (result.get('history_entry') or {}).get('id'),
         },
     )
+
+
+def run_manual_update_job(job):
+    """Executor runner for manual background updates; the job carries who asked for it."""
+    result = update_manager.update_target(
+        job['target_type'],
+        job['target_id'],
+        actor_username=job.get('actor_username'),
+        progress=lambda snapshot: job_executor.report_progress(job['id'], snapshot),
+    )
+    record_manual_update_result(
+        job['target_type'], job['target_id'], result,
+        job.get('actor_username'), job.get('actor_role'), job.get('remote_addr'),
+    )
+    return {
+        'ok': bool(result.get('ok')),
+        'message': result.get('message'),
+        'history_entry_id': (result.get('history_entry') or {}).get('id'),
+    }
+
+
+job_executor.register_runner('manual', run_manual_update_job)
+
+
+def update_job_event_payload(job):
+    payload = {'job': job}
+    if job.get('state') not in ACTIVE_JOB_STATES and job.get('history_entry_id'):
+        payload['history_entry'] = get_update_history_entry(job['history_entry_id'])
+    return payload
+
+
+@main_routes.route('/api/update-manager/jobs/<job_id>/stream')
+@admin_required
+def api_update_manager_job_stream(job_id):
+    """SSE feed for one job: state changes and pull progress until it finishes."""
+    if job_executor.get_job(job_id) is None:
+        return jsonify({'ok': False, 'message': 'Update job not found.'}), 404
+    heartbeat_seconds = max(5, int(current_app.config.get('STREAM_HEARTBEAT_SECONDS', 15)))
+    snapshot_only = request.args.get('once', '0') == '1'
+
+    def generate_job():
+        try:
+            sequence = job_executor.stats()['sequence']
+            job = job_executor.get_job(job_id)
+            yield sse_event('job', update_job_event_payload(job))
+            if snapshot_only or job['state'] not in ACTIVE_JOB_STATES:
+                return
+            last_sent = job
+            while True:
+                next_sequence = job_executor.wait_for_change(sequence, timeout=heartbeat_seconds)
+                if next_sequence == sequence:
+                    yield sse_event('heartbeat', {'timestamp': time.time()})
+                    continue
+                sequence = next_sequence
+                job = job_executor.get_job(job_id)
+                if job is None:
+                    return
+                if job == last_sent:
+                    continue
+                last_sent = job
+                yield sse_event('job', update_job_event_payload(job))
+                if job['state'] not in ACTIVE_JOB_STATES:
+                    return
+        except GeneratorExit:
+            pass
+
+    response = Response(stream_with_context(generate_job()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@main_routes.route('/api/update-manager/update', methods=['POST'])
+@admin_required
+@csrf_protect
+def api_update_manager_update():
+    """Execute a safe update for a container or Compose project.
+
+    With "background": true the update is queued on the job executor and a
+    202 with the job is returned; follow it on /api/update-manager/jobs/<id>/stream.
+    """
+    data = request.get_json(force=True) or {}
+    target_type = str(data.get('target_type') or '').strip().lower()
+    target_id = str(data.get('target_id') or '').strip()
+    if target_type not in {'container', 'project'} or not target_id:
+        return jsonify({'ok': False, 'message': 'target_type and target_id are required.'}), 400
+
+    actor_username = get_request_username()
+    actor_role = get_request_role()
+    remote_addr = get_request_remote_addr()
+
+    try:
+        job_target_id, target_name, registry = update_manager.resolve_update_job_target(target_type, target_id)
+    except errors.NotFound:
+        return jsonify({'ok': False, 'message': f'Container {target_id} was not found.'}), 404
+
+    if data.get('background'):
+        job = job_executor.submit(
+            target_type,
+            job_target_id,
+            target_name,
+            run_manual_update_job,
+            priority=PRIORITY_MANUAL,
+            registry=registry,
+            source='manual',
+            actor_username=actor_username,
+            actor_role=actor_role,
+            remote_addr=remote_addr,
+        )
+        if job is None:
+            return jsonify({'ok': False, 'message': f'An update for {target_name} is already queued or running.'}), 409
+        return jsonify({'ok': True, 'queued': True, 'job': job}), 202
+
+    # Same executor key as jobs and batch members, so nothing else recreates the target meanwhile.
+    if not job_executor.claim_target(target_type, target_name):
+        return jsonify({'ok': False, 'message': f'An update for {target_name} is already queued or running.'}), 409
+    try:
+        result = update_manager.update_target(target_type, target_id, actor_username=actor_username)
+    finally:
+        job_executor.release_target(target_type, target_name)
+    record_manual_update_result(target_type, target_id, result, actor_username, actor_role, remote_addr)
     return jsonify(result), 200 if result.get('ok') else 409
 
 
+@main_routes.route('/api/update-manager/update-batch', methods=['POST'])
+@admin_required
+@csrf_protect
+def api_update_manager_update_batch():
+    """Update several targets at once and stream each result as SSE.
+
+    Targets sharing an image are pulled once and run in order; independent
+    targets run in parallel up to UPDATE_BATCH_MAX_PARALLEL. The batch keeps
+    running if the client disconnects.
+    """
+    data = request.get_json(force=True) or {}
+    targets = []
+    for item in data.get('targets') or []:
+        if not isinstance(item, dict):
+            continue
+        target_type = str(item.get('target_type') or '').strip().lower()
+        target_id = str(item.get('target_id') or '').strip()
+        if target_type not in {'container', 'project'} or not target_id:
+            return jsonify({'ok': False, 'message': 'Every target needs a target_type and target_id.'}), 400
+        targets.append((target_type, target_id))
+    if not targets:
+        return jsonify({'ok': False, 'message': 'At least one target is required.'}), 400
+
+    parallel_cap = max(1, int(current_app.config.get('UPDATE_BATCH_MAX_PARALLEL', 3)))
+    max_parallel = parse_positive_int_arg(data.get('max_parallel', parallel_cap), parallel_cap, minimum=1, maximum=parallel_cap)
+    actor_username = get_request_username()
+    actor_role = get_request_role()
+    remote_addr = get_request_remote_addr()
+    results = queue.Queue()
+
+    def on_result(target_type, target_id, result):
+        record_manual_update_result(target_type, target_id, result, actor_username, actor_role, remote_addr)
+        results.put({
+            'target_type': target_type,
+            'target_id': target_id,
+            'ok': bool(result.get('ok')),
+            'message': result.get('message'),
+            'history_entry': result.get('history_entry'),
+        })
+
+    def run_batch():
+        try:
+            update_manager.run_update_batch(targets, actor_username=actor_username, max_parallel=max_parallel, on_result=on_result)
+        except Exception as exc:
+            print(f"ERROR UPDATE BATCH: {exc}")
+            results.put({'error': str(exc)})
+        finally:
+            results.put(None)
+
+    threading.Thread(target=run_batch, name='update-batch', daemon=True).start()
+
+    def generate_results():
+        succeeded = failed = 0
+        try:
+            while True:
+                item = results.get()
+                if item is None:
+                    break
+                if 'error' in item:
+                    yield sse_event('error', {'message': item['error']})
+                    continue
+                if item['ok']:
+                    succeeded += 1
+                else:
+                    failed += 1
+                yield sse_event('result', item)
+            yield sse_event('done', {'total': succeeded + failed, 'succeeded': succeeded, 'failed': failed})
+        except GeneratorExit:
+            pass
+
+    response = Response(stream_with_context(generate_results()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@main_routes.route('/api/update-manager/rollback-artifacts')
+@admin_required
+def api_update_manager_rollback_artifacts():
+    """Rollback images and override files on disk, the budget, and space reclaimed so far."""
+    try:
+        return jsonify(rollback_artifacts.stats())
+    except Exception as exc:
+        return jsonify({'ok': False, 'message': f'Unable to inspect rollback images: {exc}'}), 503
+
+
+@main_routes.route('/api/update-manager/rollback-artifacts/prune', methods=['POST'])
+@admin_required
+@csrf_protect
+def api_update_manager_rollback_artifacts_prune():
+    """Prune rollback images down to the configured budget now."""
+    try:
+        result = rollback_artifacts.prune()
+    except Exception as exc:
+        audit_event('update-manager.rollback-prune', 'rollback-artifacts', 'failure', details={'message': str(exc)})
+        return jsonify({'ok': False, 'message': f'Unable to prune rollback images: {exc}'}), 503
+    audit_event(
+        'update-manager.rollback-prune',
+        'rollback-artifacts',
+        'success',
+        details={'removed_images': len(result['removed_images']), 'reclaimed_bytes': result['reclaimed_bytes']},
+    )
+    return jsonify({'ok': True, **result})
+
+
 @main_routes.route('/api/update-manager/auto-update', methods=['POST'])
 @admin_required
 @csrf_protect
@@ -1658,11 +2245,29 @@ def api_list_users():
 @main_routes.route('/api/audit', methods=['GET'])
 @admin_required
 def api_audit_log():
+    """Newest-first audit events; pass the X-Next-Before header value as ?before= for the next page."""
     try:
         limit = max(1, min(500, int(request.args.get('limit', 100) or 100)))
     except (TypeError, ValueError):
         limit = 100
-    return jsonify(list_audit_events(limit=limit))
+    before_id = parse_positive_int_arg(request.args.get('before'), 0, minimum=0) or None
+    try:
+        since = parse_log_time_arg('since')
+        until = parse_log_time_arg('until')
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    events = list_audit_events(
+        limit=limit,
+        before_id=before_id,
+        actor=(request.args.get('actor') or '').strip() or None,
+        action=(request.args.get('action') or '').strip() or None,
+        since=since,
+        until=until,
+    )
+    response = jsonify(events)
+    if len(events) == limit:
+        response.headers['X-Next-Before'] = str(events[-1]['id'])
+    return response
 
 @main_routes.route('/api/users', methods=['POST'])
 @admin_required
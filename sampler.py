@@ -3,6 +3,10 @@
 import threading
 import time
 import collections
+import hashlib
+import heapq
+import re
+import math
 import docker.errors
 import logging
 import subprocess, json, os, fnmatch
@@ -28,9 +32,17 @@ from metrics_utils import (
     calc_net_io,
     calc_block_io
 )
-from pushover_client import send as push_notify
+from notification_dispatch import DEFAULT_DIGEST_WINDOW_SECONDS, notification_dispatcher
+from notification_history import load_persisted_notifications, notification_history
+from pushover_client import CHANNEL_NAMES
+from registry_client import RegistryError, split_image_ref
+from registry_digests import FORCED_CHECK_MAX_AGE_SECONDS, digest_cache, normalize_image_ref
+from update_jobs import PRIORITY_CONTAINER, PRIORITY_PROJECT, job_executor
 from update_notifications import build_update_available_message, build_update_result_event
-from users_db import get_auto_update_settings, get_notification_settings, set_notification_settings
+from users_db import (
+    delete_update_checks, get_auto_update_settings, get_notification_settings, load_update_checks,
+    save_update_check, set_notification_settings
+)
 
 # Configure basic logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -48,6 +60,8 @@ update_check_cache = {}
 update_check_details_cache = {}
 # Timestamp del último chequeo por contenedor
 update_check_time = {}
+# Bumped whenever the caches above change so the update inventory knows to rebuild
+update_check_sequence = 0
 # Intervalo mínimo entre chequeos automáticos (segundos)
 UPDATE_CHECK_MIN_INTERVAL = 24 * 3600  # 24 horas
 # Flag global para forzar chequeo inmediato en todos los contenedores
@@ -79,12 +93,10 @@ NOTIFICATION_SETTINGS_DEFAULTS = {
     'silence_end': '07:00',
     'dedupe_enabled': True,
     'dedupe_window_seconds': 120,
+    'digest_channels': [],
+    'digest_window_seconds': DEFAULT_DIGEST_WINDOW_SECONDS,
 }
 
-notifications = collections.deque(maxlen=500)  # Store recent notification events
-auto_update_in_progress = set()
-auto_update_lock = threading.Lock()
-
 
 def _to_bool(value, default=False):
     if isinstance(value, bool):
@@ -151,6 +163,15 @@ def _normalize_rule_text(value):
     return '\n'.join(cleaned)
 
 
+def _normalize_channel_list(value):
+    if isinstance(value, str):
+        tokens = value.replace(',', '\n').splitlines()
+    else:
+        tokens = list(value or [])
+    requested = {str(token).strip().lower() for token in tokens}
+    return [name for name in CHANNEL_NAMES if name in requested]
+
+
 def normalize_notification_settings(settings=None):
     raw = settings or {}
     normalized = dict(NOTIFICATION_SETTINGS_DEFAULTS)
@@ -176,10 +197,14 @@ def normalize_notification_settings(settings=None):
     normalized['silence_end'] = _normalize_time_value(raw.get('silence_end'), normalized['silence_end'])
     normalized['dedupe_enabled'] = _to_bool(raw.get('dedupe_enabled'), normalized['dedupe_enabled'])
     normalized['dedupe_window_seconds'] = _to_int(raw.get('dedupe_window_seconds'), normalized['dedupe_window_seconds'], minimum=0)
+    normalized['digest_channels'] = _normalize_channel_list(raw.get('digest_channels'))
+    normalized['digest_window_seconds'] = _to_int(raw.get('digest_window_seconds'), normalized['digest_window_seconds'], minimum=10)
     return normalized
 
 
 notification_settings = normalize_notification_settings(get_notification_settings(NOTIFICATION_SETTINGS_DEFAULTS))
+notification_dispatcher.configure_digest(notification_settings['digest_channels'], notification_settings['digest_window_seconds'])
+load_persisted_notifications()
 
 # Track when each container last exceeded threshold
 cpu_exceed_start = {}
@@ -198,73 +223,110 @@ api_client = None
 
 
 def apply_notification_settings(new_settings):
+    global notification_policy
     normalized = normalize_notification_settings(new_settings)
     notification_settings.clear()
     notification_settings.update(normalized)
+    notification_policy = NotificationPolicy(normalized)
     recent_notification_cooldowns.clear()
     recent_notification_dedupes.clear()
+    notification_expiry_heap.clear()
     previous_security_findings.clear()
+    notification_dispatcher.configure_digest(notification_settings['digest_channels'], notification_settings['digest_window_seconds'])
     set_notification_settings(notification_settings)
     return dict(notification_settings)
 
 
-def _rule_patterns(raw_value):
-    return [token.strip().lower() for token in _normalize_rule_text(raw_value).splitlines() if token.strip()]
+def _compile_rule_patterns(raw_value):
+    """Compile newline-separated glob rules into one case-insensitive regex (None if empty)."""
+    patterns = [token.strip().lower() for token in _normalize_rule_text(raw_value).splitlines() if token.strip()]
+    if not patterns:
+        return None
+    return re.compile('|'.join(f'(?:{fnmatch.translate(pattern)})' for pattern in patterns))
 
 
-def _matches_patterns(value, patterns):
-    normalized_value = str(value or '').strip().lower()
-    if not normalized_value:
-        return False
-    return any(fnmatch.fnmatch(normalized_value, pattern) for pattern in patterns)
+def _time_to_minutes(text):
+    hour, minute = map(int, text.split(':'))
+    return hour * 60 + minute
 
 
-def _is_silence_window_active(settings, timestamp):
-    if not settings.get('silence_enabled'):
-        return False
-
-    start_text = settings.get('silence_start', NOTIFICATION_SETTINGS_DEFAULTS['silence_start'])
-    end_text = settings.get('silence_end', NOTIFICATION_SETTINGS_DEFAULTS['silence_end'])
-    start_hour, start_minute = map(int, start_text.split(':'))
-    end_hour, end_minute = map(int, end_text.split(':'))
-    start_minutes = start_hour * 60 + start_minute
-    end_minutes = end_hour * 60 + end_minute
+class NotificationPolicy:
+    """Notification settings compiled once for the per-event checks.
 
-    if start_minutes == end_minutes:
-        return False
+    Scope rules become a single regex per rule list and the quiet-hours window
+    is parsed into minutes of the day, so should_emit_notification does no
+    string parsing per event. Rebuilt by apply_notification_settings.
+    """
 
-    local_time = time.localtime(timestamp)
-    current_minutes = local_time.tm_hour * 60 + local_time.tm_min
-    if start_minutes < end_minutes:
-        return start_minutes <= current_minutes < end_minutes
-    return current_minutes >= start_minutes or current_minutes < end_minutes
+    def __init__(self, settings):
+        self.settings = dict(settings)
+        self.project_mode = settings.get('project_rule_mode', 'all')
+        self.project_regex = _compile_rule_patterns(settings.get('project_rules'))
+        self.container_mode = settings.get('container_rule_mode', 'all')
+        self.container_regex = _compile_rule_patterns(settings.get('container_rules'))
+        self.silence_window = None
+        if settings.get('silence_enabled'):
+            start_minutes = _time_to_minutes(settings.get('silence_start', NOTIFICATION_SETTINGS_DEFAULTS['silence_start']))
+            end_minutes = _time_to_minutes(settings.get('silence_end', NOTIFICATION_SETTINGS_DEFAULTS['silence_end']))
+            if start_minutes != end_minutes:
+                self.silence_window = (start_minutes, end_minutes)
+        self.cooldown_seconds = int(settings.get('cooldown_seconds', 0) or 0)
+        dedupe_window_seconds = int(settings.get('dedupe_window_seconds', 0) or 0)
+        self.dedupe_window_seconds = dedupe_window_seconds if settings.get('dedupe_enabled') else 0
+
+    @staticmethod
+    def _rule_allows(mode, regex, value):
+        if regex is None or mode not in ('include', 'exclude'):
+            return True
+        normalized_value = str(value or '').strip().lower()
+        matched = bool(normalized_value) and regex.match(normalized_value) is not None
+        return matched if mode == 'include' else not matched
 
+    def passes_scope(self, event):
+        return (self._rule_allows(self.project_mode, self.project_regex, event.get('project'))
+                and self._rule_allows(self.container_mode, self.container_regex, event.get('container')))
 
-def _passes_notification_scope_rules(event, settings):
-    project_patterns = _rule_patterns(settings.get('project_rules'))
-    project_mode = settings.get('project_rule_mode', 'all')
-    project_value = event.get('project')
-    if project_mode == 'include' and project_patterns and not _matches_patterns(project_value, project_patterns):
-        return False
-    if project_mode == 'exclude' and project_patterns and _matches_patterns(project_value, project_patterns):
-        return False
-
-    container_patterns = _rule_patterns(settings.get('container_rules'))
-    container_mode = settings.get('container_rule_mode', 'all')
-    container_value = event.get('container')
-    if container_mode == 'include' and container_patterns and not _matches_patterns(container_value, container_patterns):
-        return False
-    if container_mode == 'exclude' and container_patterns and _matches_patterns(container_value, container_patterns):
-        return False
-    return True
+    def is_silenced(self, timestamp):
+        if self.silence_window is None:
+            return False
+        start_minutes, end_minutes = self.silence_window
+        local_time = time.localtime(timestamp)
+        current_minutes = local_time.tm_hour * 60 + local_time.tm_min
+        if start_minutes < end_minutes:
+            return start_minutes <= current_minutes < end_minutes
+        return current_minutes >= start_minutes or current_minutes < end_minutes
+
+
+notification_policy = NotificationPolicy(notification_settings)
+# (expires_at, recorded_ts, map_name, key) for entries in the two runtime maps;
+# popped lazily, and an entry is only removed if it was not refreshed since.
+notification_expiry_heap = []
+# Expired entries linger this long past their window, matching the old sweep.
+NOTIFICATION_EXPIRY_GRACE_SECONDS = 60
+
+
+def refresh_notification_policy():
+    """Recompile the policy from notification_settings after it was changed in place."""
+    global notification_policy
+    notification_policy = NotificationPolicy(normalize_notification_settings(notification_settings))
+    return notification_policy
+
+
+def _remember_notification(map_name, key, timestamp, window_seconds):
+    state_map = recent_notification_cooldowns if map_name == 'cooldown' else recent_notification_dedupes
+    state_map[key] = timestamp
+    heapq.heappush(
+        notification_expiry_heap,
+        (timestamp + window_seconds + NOTIFICATION_EXPIRY_GRACE_SECONDS, timestamp, map_name, key),
+    )
 
 
-def _cleanup_notification_runtime(now_ts, max_age):
-    expiry_cutoff = now_ts - max(max_age, 0) - 60
-    for state_map in (recent_notification_cooldowns, recent_notification_dedupes):
-        for key, ts in list(state_map.items()):
-            if ts < expiry_cutoff:
-                state_map.pop(key, None)
+def _expire_notification_runtime(now_ts):
+    while notification_expiry_heap and notification_expiry_heap[0][0] < now_ts:
+        _expires_at, recorded_ts, map_name, key = heapq.heappop(notification_expiry_heap)
+        state_map = recent_notification_cooldowns if map_name == 'cooldown' else recent_notification_dedupes
+        if state_map.get(key) == recorded_ts:
+            del state_map[key]
 
 
 def _repo_name_from_image_ref(image_ref):
@@ -305,36 +367,36 @@ def _format_version(image_ref, token, *, pending_label='pending'):
 
 
 def should_emit_notification(event, settings=None):
-    effective_settings = normalize_notification_settings(settings or notification_settings)
+    policy = NotificationPolicy(normalize_notification_settings(settings)) if settings else notification_policy
     event_timestamp = float(event.get('timestamp') or time.time())
 
-    if not _passes_notification_scope_rules(event, effective_settings):
+    if not policy.passes_scope(event):
         return False
-    if _is_silence_window_active(effective_settings, event_timestamp):
+    if policy.is_silenced(event_timestamp):
         return False
 
     event_type = str(event.get('type') or '').lower()
     event_container_id = str(event.get('cid') or event.get('container') or '')
     scope_suffix = str(event.get('scope') or event.get('finding') or '').strip().lower()
     base_signature = f'{event_type}:{event_container_id}:{scope_suffix}'
-    cooldown_seconds = int(effective_settings.get('cooldown_seconds', 0) or 0)
+    cooldown_seconds = policy.cooldown_seconds
     if cooldown_seconds > 0:
         last_cooldown_ts = recent_notification_cooldowns.get(base_signature)
         if last_cooldown_ts and (event_timestamp - last_cooldown_ts) < cooldown_seconds:
             return False
 
-    dedupe_window_seconds = int(effective_settings.get('dedupe_window_seconds', 0) or 0)
+    dedupe_window_seconds = policy.dedupe_window_seconds
     dedupe_signature = f"{base_signature}:{event.get('msg', '')}"
-    if effective_settings.get('dedupe_enabled') and dedupe_window_seconds > 0:
+    if dedupe_window_seconds > 0:
         last_dedupe_ts = recent_notification_dedupes.get(dedupe_signature)
         if last_dedupe_ts and (event_timestamp - last_dedupe_ts) < dedupe_window_seconds:
             return False
 
     if cooldown_seconds > 0:
-        recent_notification_cooldowns[base_signature] = event_timestamp
-    if effective_settings.get('dedupe_enabled') and dedupe_window_seconds > 0:
-        recent_notification_dedupes[dedupe_signature] = event_timestamp
-    _cleanup_notification_runtime(event_timestamp, max(cooldown_seconds, dedupe_window_seconds))
+        _remember_notification('cooldown', base_signature, event_timestamp, cooldown_seconds)
+    if dedupe_window_seconds > 0:
+        _remember_notification('dedupe', dedupe_signature, event_timestamp, dedupe_window_seconds)
+    _expire_notification_runtime(event_timestamp)
     return True
 
 
@@ -415,7 +477,7 @@ def _has_docker_socket_mount(container):
 
 
 def collect_security_findings(container, settings=None):
-    effective_settings = normalize_notification_settings(settings or notification_settings)
+    effective_settings = normalize_notification_settings(settings) if settings else notification_policy.settings
     if not effective_settings.get('security_enabled', True):
         return []
 
@@ -506,7 +568,7 @@ def collect_security_findings(container, settings=None):
 
 
 def get_new_security_notifications(container, settings=None):
-    effective_settings = normalize_notification_settings(settings or notification_settings)
+    effective_settings = normalize_notification_settings(settings) if settings else notification_policy.settings
     container_id = getattr(container, 'id', None)
     if not container_id:
         return []
@@ -534,18 +596,23 @@ def publish_metrics_snapshot():
 
 def publish_notification(event):
     global notification_sequence
-    notifications.append(event)
+    notification_history.append(event)
     with stream_condition:
         notification_sequence += 1
         stream_condition.notify_all()
 
 
 def dispatch_external_notification(event):
-    """Forward a notification event to all configured outbound channels."""
+    """Queue a notification event for every configured outbound channel.
+
+    Delivery happens on the dispatcher's worker pool so a slow webhook never
+    blocks the sampler loop. Channels in digest mode get a periodic summary
+    instead; the in-app feed is published separately and sees every event.
+    """
     event_type = str(event.get('type') or '').lower()
     priority = 1 if event_type in {'cpu', 'ram', 'status', 'security'} else 0
     title = f"statainer {event_type.upper()}" if event_type else "statainer"
-    push_notify(event.get('msg', 'statainer notification'), title=title, priority=priority, event=event)
+    notification_dispatcher.submit(event.get('msg', 'statainer notification'), title=title, priority=priority, event=event)
 
 
 def resolve_auto_update_target(container, settings=None):
@@ -584,11 +651,19 @@ def build_update_available_event(container, details=None, timestamp=None):
     }
 
 
-def _run_auto_update_job(target_type, target_id, target_name, job_key):
+def _run_auto_update_job(job):
+    target_type = job['target_type']
+    target_id = job['target_id']
+    target_name = job['target_name']
     try:
         import update_manager
 
-        result = update_manager.update_target(target_type, target_id, actor_username='auto-update')
+        result = update_manager.update_target(
+            target_type,
+            target_id,
+            actor_username='auto-update',
+            progress=lambda snapshot: job_executor.report_progress(job['id'], snapshot),
+        )
         emit_notification(build_update_result_event(
             target_type,
             target_id,
@@ -597,6 +672,11 @@ def _run_auto_update_job(target_type, target_id, target_name, job_key):
             history_entry=result.get('history_entry'),
             fallback_message=result.get('message'),
         ))
+        return {
+            'ok': bool(result.get('ok')),
+            'message': result.get('message'),
+            'history_entry_id': (result.get('history_entry') or {}).get('id'),
+        }
     except Exception as exc:
         logging.exception("Auto-update worker failed for %s %s", target_type, target_name)
         emit_notification(build_update_result_event(
@@ -606,30 +686,34 @@ def _run_auto_update_job(target_type, target_id, target_name, job_key):
             False,
             fallback_message=str(exc),
         ))
-    finally:
-        with auto_update_lock:
-            auto_update_in_progress.discard(job_key)
+        return {'ok': False, 'message': str(exc)}
 
 
-def queue_auto_update(target_type, target_id, target_name):
+def queue_auto_update(target_type, target_id, target_name, image_ref=None):
+    """Hand an auto-update to the bounded job executor; False if it is already queued or running."""
     normalized_type = 'project' if str(target_type or '').strip().lower() == 'project' else 'container'
     normalized_name = str(target_name or '').strip()
     if not normalized_name or not target_id:
         return False
 
-    job_key = (normalized_type, normalized_name)
-    with auto_update_lock:
-        if job_key in auto_update_in_progress:
-            return False
-        auto_update_in_progress.add(job_key)
-
-    worker = threading.Thread(
-        target=_run_auto_update_job,
-        args=(normalized_type, target_id, normalized_name, job_key),
-        daemon=True,
+    registry = None
+    if image_ref:
+        try:
+            registry = split_image_ref(image_ref)[0]
+        except RegistryError:
+            registry = None
+    job = job_executor.submit(
+        normalized_type,
+        target_id,
+        normalized_name,
+        _run_auto_update_job,
+        priority=PRIORITY_PROJECT if normalized_type == 'project' else PRIORITY_CONTAINER,
+        registry=registry,
     )
-    worker.start()
-    return True
+    return job is not None
+
+
+job_executor.register_runner('auto', _run_auto_update_job)
 
 
 def get_metrics_sequence():
@@ -651,7 +735,7 @@ def wait_for_stream_event(last_metrics_seq, last_notification_seq, timeout=15):
         return metrics_sequence, notification_sequence, timed_out
 
 
-def get_update_check_details(container):
+def get_update_check_details(container, force=False):
     image_ref = ''
     current_image = getattr(container, 'image', None)
     try:
@@ -692,7 +776,11 @@ def get_update_check_details(container):
             logging.warning(f"[UpdateCheck] RepoDigest not found for {image_ref}")
             return details
 
-        remote_manifest_digest = client.images.get_registry_data(image_ref).id
+        remote_manifest_digest = digest_cache.get_digest(
+            client,
+            image_ref,
+            max_age=FORCED_CHECK_MAX_AGE_SECONDS if force else None,
+        )
         details['latest_token'] = remote_manifest_digest
         details['latest_version'] = _format_version(image_ref, remote_manifest_digest)
         details['update_available'] = current_token != remote_manifest_digest
@@ -715,19 +803,106 @@ def get_update_check_details(container):
         logging.warning(f"[UpdateCheck] Unexpected error while checking updates for {container.name}: {e}")
         return details
 
-def check_image_update(container):
+def check_image_update(container, force=False):
     """
     Comprueba si hay una actualización disponible para la imagen del contenedor.
     Retorna: True si hay actualización, False si no, None si no se pudo comprobar.
     Busca el digest real de la imagen local tal como está referenciada en el registro (por ejemplo, "nginx@sha256:...").
     Así, evita problemas si hay varias imágenes locales con el mismo id pero diferentes referencias.
     """
-    details = get_update_check_details(container)
+    details = get_update_check_details(container, force=force)
     container_id = getattr(container, 'id', None)
     if container_id:
         update_check_details_cache[container_id] = details
     return details.get('update_available')
 
+def update_check_phase(image_ref, interval=UPDATE_CHECK_MIN_INTERVAL):
+    """Stable per-image offset inside the check interval, so images re-check at different times of day."""
+    digest = hashlib.sha1(normalize_image_ref(image_ref).encode('utf-8')).digest()
+    return (int.from_bytes(digest[:8], 'big') / 2 ** 64) * interval
+
+
+def next_update_check_due(image_ref, last_check, interval=UPDATE_CHECK_MIN_INTERVAL):
+    """First time at the image's phase that is at least a full interval after last_check.
+
+    The interval is a floor and the phase only ever adds to it. In steady
+    state checks land exactly one interval apart; after a burst (first
+    start, forced re-check) they fan out across the following window.
+    """
+    phase = update_check_phase(image_ref, interval)
+    earliest = last_check + interval
+    return phase + math.ceil((earliest - phase) / interval) * interval
+
+
+def is_update_check_due(container, now):
+    cid = container.id
+    if cid not in update_check_cache:
+        return True
+    attrs = getattr(container, 'attrs', None) or {}
+    checked_image_id = (update_check_details_cache.get(cid) or {}).get('current_image_id')
+    if checked_image_id and attrs.get('Image') and attrs.get('Image') != checked_image_id:
+        return True
+    image_ref = (attrs.get('Config') or {}).get('Image') or ''
+    return now >= next_update_check_due(image_ref, update_check_time.get(cid, 0))
+
+
+def _update_checks_changed():
+    global update_check_sequence
+    update_check_sequence += 1
+    import update_manager
+
+    update_manager.update_inventory.mark_dirty()
+
+
+def record_update_check(container_id, update_available, details=None, checked_at=None):
+    """Store an update check result in memory and in the database."""
+    checked_at = time.time() if checked_at is None else checked_at
+    update_check_cache[container_id] = update_available
+    update_check_time[container_id] = checked_at
+    if details is not None:
+        update_check_details_cache[container_id] = details
+    details = update_check_details_cache.get(container_id) or {}
+    try:
+        save_update_check(container_id, details.get('image_ref'), update_available, details, checked_at)
+    except Exception as e:
+        logging.warning(f"[UpdateCheck] Could not persist update check for {container_id[:12]}: {e}")
+    _update_checks_changed()
+
+
+def forget_update_checks(container_ids):
+    container_ids = list(container_ids)
+    if not container_ids:
+        return
+    removed = False
+    for cid in container_ids:
+        removed = update_check_cache.pop(cid, None) is not None or removed
+        removed = update_check_details_cache.pop(cid, None) is not None or removed
+        removed = update_check_time.pop(cid, None) is not None or removed
+    if removed:
+        _update_checks_changed()
+    try:
+        delete_update_checks(container_ids)
+    except Exception as e:
+        logging.warning(f"[UpdateCheck] Could not delete persisted update checks: {e}")
+
+
+def load_persisted_update_checks():
+    """Seed the in-memory update check caches from the database after a restart."""
+    global update_check_sequence
+    try:
+        persisted = load_update_checks()
+    except Exception as e:
+        logging.warning(f"[UpdateCheck] Could not load persisted update checks: {e}")
+        return 0
+    for cid, check in persisted.items():
+        update_check_cache[cid] = check['update_available']
+        update_check_details_cache[cid] = check['details']
+        update_check_time[cid] = check['checked_at']
+    update_check_sequence += 1
+    logging.info(f"[UpdateCheck] Loaded {len(persisted)} persisted update checks.")
+    return len(persisted)
+
+
 def get_gpu_usage():
     """
     Devuelve una lista de dicts [{'index':0,'gpu_util':34,'mem_used':1024,'mem_total':8192}, …]
@@ -770,6 +945,8 @@ def sample_metrics():
 
     time.sleep(1)
     initialize_sampler_clients()
+    load_persisted_update_checks()
+    job_executor.restore()
 
     while True:
         containers_to_sample = []
@@ -881,12 +1058,10 @@ def sample_metrics():
                 container_project = extract_compose_project(container)
                 # --- NUEVO: Lógica de chequeo de actualización con cache y forzado ---
                 force_check = force_update_check_all or (cid in force_update_check_ids)
-                last_check = update_check_time.get(cid, 0)
-                # Si forzado o nunca chequeado o pasado el intervalo, hacer chequeo
-                if force_check or (now - last_check > UPDATE_CHECK_MIN_INTERVAL) or (cid not in update_check_cache):
-                    update_available = check_image_update(container)
-                    update_check_cache[cid] = update_available
-                    update_check_time[cid] = now
+                # Si forzado, nunca chequeado, imagen cambiada o llegado su turno, hacer chequeo
+                if force_check or is_update_check_due(container, now):
+                    update_available = check_image_update(container, force=force_check)
+                    record_update_check(cid, update_available, checked_at=now)
                     if cid in force_update_check_ids:
                         force_update_check_ids.discard(cid)
                 else:
@@ -1011,7 +1186,8 @@ def sample_metrics():
                     if is_new_update:
                         auto_update_target = resolve_auto_update_target(container, settings=auto_update_settings)
                         if auto_update_target:
-                            queue_auto_update(*auto_update_target)
+                            image_ref = (container.attrs.get('Config') or {}).get('Image')
+                            queue_auto_update(*auto_update_target, image_ref=image_ref)
                         else:
                             details = update_check_details_cache.get(cid) or {}
                             emit_notification(build_update_available_event(container, details=details, timestamp=now))
@@ -1021,9 +1197,7 @@ def sample_metrics():
             except docker.errors.NotFound:
                 if cid in history: del history[cid]
                 if cid in previous_stats: del previous_stats[cid]
-                if cid in update_check_cache: del update_check_cache[cid]
-                if cid in update_check_details_cache: del update_check_details_cache[cid]
-                if cid in update_check_time: del update_check_time[cid]
+                forget_update_checks([cid])
                 previous_security_findings.pop(cid, None)
                 continue
 
@@ -1048,13 +1222,9 @@ def sample_metrics():
                 if cid_hist_removed in history: del history[cid_hist_removed]
                 if cid_hist_removed in previous_stats:
                     del previous_stats[cid_hist_removed]
-                if cid_hist_removed in update_check_cache:
-                    del update_check_cache[cid_hist_removed]
-                if cid_hist_removed in update_check_details_cache:
-                    del update_check_details_cache[cid_hist_removed]
-                if cid_hist_removed in update_check_time:
-                    del update_check_time[cid_hist_removed]
                 previous_security_findings.pop(cid_hist_removed, None)
+            # Includes checks restored from the DB for containers removed while we were down.
+            forget_update_checks((history_ids_to_remove | set(update_check_cache)) - all_container_ids)
 
         except docker.errors.DockerException as e:
             logging.warning(f"Docker error during history cleanup: {e}")
@@ -1067,7 +1237,6 @@ def sample_metrics():
 
 # API helper for notifications (to be imported in routes.py)
 def get_notifications(since_ts=None, max_items=50):
-    now = time.time()
     if since_ts is not None:
-        return [n for n in list(notifications)[-max_items:] if n['timestamp'] > since_ts]
-    return list(notifications)[-max_items:]
+        return notification_history.since(since_ts, max_items)
+    return notification_history.latest(max_items)
@@ -186,6 +186,9 @@ export function createDashboardContext(config = {}) {
       notifDedupeEnabled: byId('notifDedupeEnabled'),
       notifDedupeWindowMinutes: byId('notifDedupeWindowMinutes'),
       notifDedupeWindowSeconds: byId('notifDedupeWindowSeconds'),
+      notifDigestChannels: Array.from(document.querySelectorAll('.notif-digest-channel')),
+      notifDigestWindowMinutes: byId('notifDigestWindowMinutes'),
+      notifDigestWindowSeconds: byId('notifDigestWindowSeconds'),
       compareActions: Array.from(document.querySelectorAll('.compare-action')),
     },
     state: {
@@ -23,6 +23,8 @@ const DEFAULT_NOTIFICATION_SETTINGS = {
   silence_end: '07:00',
   dedupe_enabled: true,
   dedupe_window_seconds: 120,
+  digest_channels: [],
+  digest_window_seconds: 300,
 };
 
 function normalizeNotifType(type) {
@@ -123,6 +125,15 @@ export function createNotificationController(ctx) {
         DEFAULT_NOTIFICATION_SETTINGS.dedupe_window_seconds,
         0,
       ),
+      digest_channels: (ctx.elements.notifDigestChannels || [])
+        .filter((element) => element.checked)
+        .map((element) => element.value),
+      digest_window_seconds: durationInputsToSeconds(
+        ctx.elements.notifDigestWindowMinutes,
+        ctx.elements.notifDigestWindowSeconds,
+        DEFAULT_NOTIFICATION_SETTINGS.digest_window_seconds,
+        10,
+      ),
     };
   }
 
@@ -155,6 +166,8 @@ export function createNotificationController(ctx) {
     const windowDuration = splitDuration(merged.window_seconds, 1);
     const cooldownDuration = splitDuration(merged.cooldown_seconds, 0);
     const dedupeDuration = splitDuration(merged.dedupe_window_seconds, 0);
+    const digestDuration = splitDuration(merged.digest_window_seconds, 10);
+    const digestChannels = new Set(Array.isArray(merged.digest_channels) ? merged.digest_channels : []);
     ctx.elements.notifCpuThreshold.value = merged.cpu_threshold;
     ctx.elements.notifRamThreshold.value = merged.ram_threshold;
     ctx.elements.notifWindowMinutes.value = windowDuration.minutes;
@@ -180,6 +193,13 @@ export function createNotificationController(ctx) {
     ctx.elements.notifDedupeEnabled.checked = Boolean(merged.dedupe_enabled);
     ctx.elements.notifDedupeWindowMinutes.value = dedupeDuration.minutes;
     ctx.elements.notifDedupeWindowSeconds.value = dedupeDuration.seconds;
+    (ctx.elements.notifDigestChannels || []).forEach((element) => {
+      element.checked = digestChannels.has(element.value);
+    });
+    if (ctx.elements.notifDigestWindowMinutes) {
+      ctx.elements.notifDigestWindowMinutes.value = digestDuration.minutes;
+      ctx.elements.notifDigestWindowSeconds.value = digestDuration.seconds;
+    }
     syncSilenceInputsState();
     syncSecurityInputsState();
   }
@@ -207,6 +227,8 @@ export function createNotificationController(ctx) {
     localStorage.setItem('notifSilenceEnd', settings.silence_end || DEFAULT_NOTIFICATION_SETTINGS.silence_end);
     localStorage.setItem('notifDedupeEnabled', settings.dedupe_enabled);
     localStorage.setItem('notifDedupeWindowSeconds', settings.dedupe_window_seconds);
+    localStorage.setItem('notifDigestChannels', (settings.digest_channels || []).join(','));
+    localStorage.setItem('notifDigestWindowSeconds', settings.digest_window_seconds);
   }
 
   function restoreSettingsFromLocalStorage() {
@@ -233,6 +255,8 @@ export function createNotificationController(ctx) {
       silence_end: stringFromStorage('notifSilenceEnd', DEFAULT_NOTIFICATION_SETTINGS.silence_end),
       dedupe_enabled: boolFromStorage('notifDedupeEnabled', DEFAULT_NOTIFICATION_SETTINGS.dedupe_enabled),
       dedupe_window_seconds: stringFromStorage('notifDedupeWindowSeconds', DEFAULT_NOTIFICATION_SETTINGS.dedupe_window_seconds),
+      digest_channels: stringFromStorage('notifDigestChannels', '').split(',').filter(Boolean),
+      digest_window_seconds: stringFromStorage('notifDigestWindowSeconds', DEFAULT_NOTIFICATION_SETTINGS.digest_window_seconds),
     });
   }
 
@@ -123,6 +123,17 @@ function renderPlaceholder(message) {
   return `<div class="update-manager-empty">${escapeHtml(message)}</div>`;
 }
 
+function formatDurationSeconds(value) {
+  const seconds = Number(value);
+  if (!Number.isFinite(seconds)) {
+    return '—';
+  }
+  if (seconds < 60) {
+    return `${seconds.toFixed(1)}s`;
+  }
+  return `${Math.floor(seconds / 60)}m ${Math.round(seconds % 60)}s`;
+}
+
 function renderKeyValue(label, value, valueClass = '') {
   return `
     <div class="update-entry-detail">
@@ -353,6 +364,8 @@ function renderHistoryEntry(entry, index) {
             ${renderKeyValue('New version', renderVersion(entry.new_version))}
             ${renderKeyValue('Result', `<span class="update-target-state" data-state="${escapeHtml(result)}">${escapeHtml(formatStateLabel(result))}</span>`)}
             ${renderKeyValue('Date', escapeHtml(formatTimestamp(entry.created_at)))}
+            ${entry.pull_seconds != null ? renderKeyValue('Pull time', escapeHtml(formatDurationSeconds(entry.pull_seconds))) : ''}
+            ${entry.downtime_seconds != null ? renderKeyValue('Downtime', escapeHtml(formatDurationSeconds(entry.downtime_seconds))) : ''}
           </div>
           ${notes}
           <div class="update-entry-actions">
@@ -957,14 +970,66 @@ export function createUpdateManagerController(ctx, deps) {
     syncActionLockState();
   }
 
+  function formatPullProgress(targetId, progress) {
+    if (!progress) {
+      return `Updating ${targetId}…`;
+    }
+    if (progress.phase) {
+      return `compose ${progress.phase}: ${progress.status || '…'}`;
+    }
+    const parts = [`Pulling ${progress.image_ref || targetId}`];
+    if (progress.percent != null) {
+      parts.push(`${Number(progress.percent).toFixed(0)}%`);
+    }
+    if (progress.layers_total) {
+      parts.push(`${progress.layers_done}/${progress.layers_total} layers`);
+    }
+    if (progress.bytes_per_second) {
+      parts.push(`${(progress.bytes_per_second / (1024 * 1024)).toFixed(1)} MB/s`);
+    }
+    return parts.join(' · ');
+  }
+
+  function followUpdateJob(job, targetId) {
+    return new Promise((resolve) => {
+      const source = new EventSource(`/api/update-manager/jobs/${encodeURIComponent(job.id)}/stream`);
+      source.addEventListener('job', (event) => {
+        const payload = JSON.parse(event.data || '{}');
+        const current = payload.job || {};
+        if (current.state === 'queued' || current.state === 'running') {
+          if (current.progress) {
+            setManagerStatus(formatPullProgress(targetId, current.progress), 'info');
+          }
+          return;
+        }
+        source.close();
+        resolve({
+          ok: current.state === 'succeeded',
+          message: current.message,
+          history_entry: payload.history_entry || null,
+        });
+      });
+      source.onerror = () => {
+        source.close();
+        resolve({ ok: false, message: `Lost the progress stream for ${targetId}; check the update history.` });
+      };
+    });
+  }
+
   async function requestUpdateTarget(targetType, targetId) {
     const response = await fetch('/api/update-manager/update', {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({ target_type: targetType, target_id: targetId }),
+      body: JSON.stringify({ target_type: targetType, target_id: targetId, background: true }),
     });
-    const payload = await response.json().catch(() => ({}));
-    if (!response.ok || !payload.ok) {
+    let payload = await response.json().catch(() => ({}));
+    if (response.status === 202 && payload.job) {
+      payload = await followUpdateJob(payload.job, targetId);
+      setManagerStatus('');
+    } else if (!response.ok) {
+      payload = { ...payload, ok: false };
+    }
+    if (!payload.ok) {
       const error = new Error(payload.message || `Update failed for ${targetId}.`);
       error.historyEntry = payload.history_entry || null;
       throw error;
@@ -29,6 +29,8 @@ DEFAULT_NOTIFICATION_SETTINGS = {
     'silence_end': '07:00',
     'dedupe_enabled': True,
     'dedupe_window_seconds': 120,
+    'digest_channels': [],
+    'digest_window_seconds': 300,
 }
 
 
@@ -40,6 +42,7 @@ def temp_db(tmp_path, monkeypatch):
     users_db.init_db("admin", "adminpass")
     sampler.notification_settings.clear()
     sampler.notification_settings.update(DEFAULT_NOTIFICATION_SETTINGS)
+    sampler.refresh_notification_policy()
     return db_path
 
 
@@ -41,6 +41,8 @@ NOTIFICATION_SETTINGS = {
     'silence_end': '07:00',
     'dedupe_enabled': True,
     'dedupe_window_seconds': 120,
+    'digest_channels': [],
+    'digest_window_seconds': 300,
 }
 USERS = [
     {'username': 'admin', 'columns': [], 'role': 'admin'},
@@ -1292,6 +1294,8 @@ def test_reset():
         'silence_end': '07:00',
         'dedupe_enabled': True,
         'dedupe_window_seconds': 120,
+        'digest_channels': [],
+        'digest_window_seconds': 300,
     })
     NOTIFICATION_EVENTS.clear()
     UPDATE_HISTORY.clear()
@@ -0,0 +1,195 @@
+import gzip
+import itertools
+import threading
+import time
+
+import pytest
+
+import container_logs
+
+
+def test_iter_log_lines_handles_split_frames_and_multibyte_chars():
+    snowman = "☃".encode("utf-8")
+    chunks = [b"first li", b"ne\nsecond " + snowman[:1], snowman[1:] + b"\ntrailing"]
+
+    assert list(container_logs.iter_log_lines(chunks)) == ["first line", "second ☃", "trailing"]
+
+
+def test_buffered_gzip_chunks_roundtrip():
+    frames = [f"line {index}\n".encode("ascii") for index in range(1000)]
+
+    buffered = list(container_logs.iter_buffered_chunks(frames, chunk_size=1024))
+    compressed = b"".join(container_logs.iter_gzip_chunks(buffered))
+
+    assert all(len(chunk) < 1024 + 16 for chunk in buffered)
+    assert gzip.decompress(compressed) == b"".join(frames)
+
+
+def test_compile_log_pattern_supports_literal_and_regex_queries():
+    literal = container_logs.compile_log_pattern("a.b")
+    regex = container_logs.compile_log_pattern("err(or)?", regex=True)
+
+    assert literal.search("xxA.Bxx") is not None
+    assert literal.search("axb") is None
+    assert regex.search("ERROR: boom") is not None
+    with pytest.raises(ValueError, match="Invalid regular expression"):
+        container_logs.compile_log_pattern("(", regex=True)
+    with pytest.raises(ValueError, match="required"):
+        container_logs.compile_log_pattern("")
+
+
+def test_compile_log_pattern_rejects_nested_unbounded_repeats():
+    for query in ("(a+)+$", r"(\w+\s?)*x", "(a|b+)*"):
+        with pytest.raises(ValueError, match="nested repeats"):
+            container_logs.compile_log_pattern(query, regex=True)
+
+    assert container_logs.compile_log_pattern(r"(\d{1,3}\.){3}\d{1,3}", regex=True) is not None
+    assert container_logs.compile_log_pattern(r"\w+\s+timeout", regex=True) is not None
+    assert container_logs.compile_log_pattern("(a+)+", regex=False).search("(A+)+") is not None
+
+
+def test_search_log_lines_returns_matches_with_context_and_timestamps():
+    lines = [
+        "2026-01-01T10:00:00.000000000Z boot",
+        "2026-01-01T10:00:01.000000000Z Traceback (most recent call last):",
+        "2026-01-01T10:00:02.000000000Z ValueError: bad",
+        "2026-01-01T10:00:03.000000000Z recovered",
+    ]
+    pattern = container_logs.compile_log_pattern("traceback")
+
+    results = list(container_logs.search_log_lines(lines, pattern, context=1))
+
+    assert [kind for kind, _payload in results] == ["match", "summary"]
+    match = results[0][1]
+    assert match["line"] == 2
+    assert match["timestamp"] == "2026-01-01T10:00:01.000000000Z"
+    assert match["text"] == "Traceback (most recent call last):"
+    assert [entry["text"] for entry in match["before"]] == ["boot"]
+    assert [entry["text"] for entry in match["after"]] == ["ValueError: bad"]
+    assert results[1][1]["matches"] == 1
+    assert results[1][1]["truncated"] is None
+
+
+def test_search_log_lines_stops_when_cpu_budget_is_spent():
+    ticks = itertools.count()
+    lines = (f"line {index}" for index in range(100000))
+    pattern = container_logs.compile_log_pattern("nomatch")
+
+    results = list(container_logs.search_log_lines(
+        lines,
+        pattern,
+        cpu_budget_seconds=1,
+        clock=lambda: next(ticks),
+    ))
+
+    summary = results[-1][1]
+    assert summary["truncated"] == "cpu_budget"
+    assert summary["scanned_lines"] == container_logs.LOG_SEARCH_BUDGET_CHECK_EVERY
+
+
+def test_search_log_lines_isolated_matcher_matches_like_inline_search():
+    lines = [f"2026-01-01T10:00:{index:02d}.000000000Z request {index} took {index * 7}ms" for index in range(40)]
+    pattern = container_logs.compile_log_pattern(r"took \d*7\dms", regex=True)
+
+    inline = list(container_logs.search_log_lines(lines, pattern, context=1))
+    isolated = list(container_logs.search_log_lines(lines, pattern, context=1, isolate=True))
+
+    assert isolated[:-1] == inline[:-1]
+    assert isolated[-1][1]["matches"] == inline[-1][1]["matches"] > 0
+
+
+def test_search_log_lines_isolated_matcher_stops_a_runaway_match_and_recovers():
+    lines = ["a" * 4000 for _ in range(3)]
+    pattern = container_logs.compile_log_pattern(".*.*.*x", regex=True)
+
+    results = list(container_logs.search_log_lines(lines, pattern, cpu_budget_seconds=0.5, isolate=True))
+
+    summary = results[-1][1]
+    assert [kind for kind, _payload in results] == ["summary"]
+    assert summary["truncated"] == "cpu_budget"
+    assert summary["scanned_lines"] == 0
+    assert 0.5 <= summary["cpu_seconds"] < 5
+
+    recovered = list(container_logs.search_log_lines(
+        ["boom"], container_logs.compile_log_pattern("bo+m", regex=True), isolate=True,
+    ))
+    assert recovered[-1][1]["matches"] == 1
+
+
+def test_search_log_lines_reuses_the_thread_matcher_and_only_charges_matching_time():
+    def slow_lines():
+        for index in range(4 * container_logs.LOG_SEARCH_BUDGET_CHECK_EVERY):
+            if index % container_logs.LOG_SEARCH_BUDGET_CHECK_EVERY == 0:
+                time.sleep(0.4)
+            yield f"line {index}"
+
+    pattern = container_logs.compile_log_pattern(r"line \d+7$", regex=True)
+    matcher = container_logs.thread_regex_matcher()
+
+    first = list(container_logs.search_log_lines(["line 17"], pattern, isolate=True))
+    first_process = matcher._process
+    results = list(container_logs.search_log_lines(slow_lines(), pattern, max_matches=1000, cpu_budget_seconds=1, isolate=True))
+
+    assert first[-1][1]["matches"] == 1
+    assert matcher._process is first_process
+    assert results[-1][1]["truncated"] is None
+    assert results[-1][1]["scanned_lines"] == 4 * container_logs.LOG_SEARCH_BUDGET_CHECK_EVERY
+
+
+def test_timestamp_merger_reorders_within_window():
+    now = [100.0]
+    merger = container_logs.TimestampMerger(window_seconds=0.5, clock=lambda: now[0])
+
+    merger.push(2.0, {"text": "late-arriving second"})
+    now[0] += 0.2
+    merger.push(1.0, {"text": "first"})
+
+    assert merger.pop_ready() == []
+    now[0] += 0.5
+    assert [record["text"] for record in merger.pop_ready()] == ["first", "late-arriving second"]
+
+
+def test_follower_hub_shares_one_docker_stream_per_container():
+    opened = []
+    released = threading.Event()
+    closed = threading.Event()
+
+    class DummyStream:
+        def __iter__(self):
+            released.wait(5)
+            yield b"2026-01-01T10:00:00.000000000Z hello\n"
+            closed.wait(5)
+
+        def close(self):
+            closed.set()
+
+    class DummyContainer:
+        id = "c1"
+        name = "demo-web-1"
+
+        def logs(self, **kwargs):
+            opened.append(kwargs)
+            return DummyStream()
+
+    hub = container_logs.LogFollowerHub()
+    first_sink = container_logs.LogSink()
+    second_sink = container_logs.LogSink()
+    container = DummyContainer()
+
+    hub.subscribe(container, "web", first_sink)
+    hub.subscribe(container, "web", second_sink)
+    released.set()
+    sort_ts, record = first_sink.queue.get(timeout=2)
+
+    assert len(opened) == 1
+    assert opened[0]["follow"] is True
+    assert record["service"] == "web"
+    assert record["text"] == "hello"
+    assert sort_ts == container_logs.parse_log_timestamp("2026-01-01T10:00:00Z")
+    assert second_sink.queue.get(timeout=2)[1] == record
+
+    hub.unsubscribe("c1", first_sink)
+    assert hub.follower_count() == 1
+    hub.unsubscribe("c1", second_sink)
+    assert hub.follower_count() == 0
+    assert closed.is_set()
@@ -0,0 +1,140 @@
+import threading
+
+import notification_dispatch
+
+
+def configured(*channels):
+    return lambda: {name: {"configured": name in channels} for name in notification_dispatch.CHANNEL_NAMES}
+
+
+def test_slow_channel_does_not_block_other_channels():
+    release = threading.Event()
+    delivered = []
+
+    def sender(channel, message, title, priority, event, context):
+        if channel == "webhook":
+            release.wait(5)
+        delivered.append((channel, message))
+        return {"ok": True}
+
+    dispatcher = notification_dispatch.NotificationDispatcher(
+        max_pending=50, workers=3, per_channel_limit=1, sender=sender,
+        configured_services=configured("slack", "webhook"),
+    )
+
+    for index in range(3):
+        assert dispatcher.submit(f"alert {index}") == 2
+
+    # The webhook is capped at one in-flight delivery, so the other workers
+    # drain every Slack delivery while it is stuck.
+    for _ in range(100):
+        if sum(1 for channel, _ in delivered if channel == "slack") == 3:
+            break
+        threading.Event().wait(0.02)
+    stats = dispatcher.stats()
+    assert stats["channels"]["slack"]["delivered"] == 3
+    assert stats["channels"]["webhook"]["in_flight"] == 1
+
+    release.set()
+    assert dispatcher.wait_idle(timeout=5)
+    assert dispatcher.stats()["channels"]["webhook"]["delivered"] == 3
+
+
+def test_full_queue_drops_oldest_and_shutdown_accounts_for_leftovers():
+    release = threading.Event()
+    seen = []
+
+    def sender(channel, message, title, priority, event, context):
+        release.wait(5)
+        seen.append(message)
+        return {"ok": message != "alert 4"}
+
+    dispatcher = notification_dispatch.NotificationDispatcher(
+        max_pending=2, workers=1, per_channel_limit=1, sender=sender,
+        configured_services=configured("slack"),
+    )
+
+    dispatcher.submit("alert 0")
+    for _ in range(100):
+        if dispatcher.stats()["in_flight"] == 1:
+            break
+        threading.Event().wait(0.02)
+    for index in range(1, 5):
+        dispatcher.submit(f"alert {index}")
+
+    stats = dispatcher.stats()
+    assert stats["pending"] == 2
+    assert stats["overflow"] == 2
+    assert stats["channels"]["slack"]["dropped"] == 2
+
+    release.set()
+    assert dispatcher.shutdown(timeout=5) is True
+    assert seen == ["alert 0", "alert 3", "alert 4"]
+    assert dispatcher.submit("too late") == 0
+
+    stats = dispatcher.stats()
+    assert stats["channels"]["slack"]["delivered"] == 2
+    assert stats["channels"]["slack"]["failed"] == 1
+    assert stats["rejected_after_shutdown"] == 1
+    assert stats["closed"] is True
+
+
+def test_digest_channels_get_one_summary_per_window_while_others_get_every_event():
+    delivered = []
+
+    def sender(channel, message, title, priority, event, context):
+        delivered.append((channel, title, priority, event))
+        return {"ok": True}
+
+    dispatcher = notification_dispatch.NotificationDispatcher(
+        workers=2, sender=sender, configured_services=configured("slack", "discord"),
+    )
+    dispatcher.configure_digest(["discord"], window_seconds=1)
+
+    events = [
+        {"type": "cpu", "project": "shop", "container": "web", "timestamp": 1.0},
+        {"type": "cpu", "project": "shop", "container": "web", "timestamp": 2.0},
+        {"type": "ram", "project": "shop", "container": "db", "timestamp": 3.0},
+        {"type": "status", "container": "cron", "timestamp": 4.0},
+    ]
+    for index, event in enumerate(events):
+        dispatcher.submit(f"event {index}", title="statainer", priority=1 if index == 2 else 0, event=event)
+
+    assert dispatcher.stats()["digest"]["held"] == {"discord": 4}
+    for _ in range(150):
+        if any(channel == "discord" for channel, *_ in delivered):
+            break
+        threading.Event().wait(0.02)
+    assert dispatcher.wait_idle(timeout=5)
+
+    assert sum(1 for channel, *_ in delivered if channel == "slack") == 4
+    digests = [item for item in delivered if item[0] == "discord"]
+    assert len(digests) == 1
+    _, title, priority, event = digests[0]
+    assert title == "statainer digest: 4 notifications"
+    assert priority == 1
+    assert event["by_type"] == {"cpu": 2, "ram": 1, "status": 1}
+    assert event["by_project"] == {"shop": 3, "no project": 1}
+    assert event["top_containers"][0] == {"container": "web", "count": 2}
+    assert "By type: cpu 2, ram 1, status 1" in event["msg"]
+    assert dispatcher.stats()["channels"]["discord"]["digested"] == 4
+
+
+def test_leaving_digest_mode_flushes_and_single_event_is_sent_unchanged():
+    delivered = []
+
+    def sender(channel, message, title, priority, event, context):
+        delivered.append((message, title, event))
+        return {"ok": True}
+
+    dispatcher = notification_dispatch.NotificationDispatcher(
+        workers=1, sender=sender, configured_services=configured("ntfy"),
+    )
+    dispatcher.configure_digest(["ntfy"], window_seconds=3600)
+    dispatcher.submit("web restarted", title="statainer STATUS", event={"type": "status", "container": "web"})
+
+    dispatcher.configure_digest([], window_seconds=3600)
+
+    assert dispatcher.wait_idle(timeout=5)
+    assert delivered == [("web restarted", "statainer STATUS", {"type": "status", "container": "web"})]
+    assert dispatcher.stats()["digest"]["held"] == {}
@@ -0,0 +1,49 @@
+import notification_history
+import users_db
+
+
+def make_history(capacity=10):
+    stored = []
+    history = notification_history.NotificationHistory(
+        capacity=capacity, persist=lambda event: stored.append(event["msg"]),
+    )
+    return history, stored
+
+
+def test_since_returns_late_arrivals_and_respects_max_items():
+    history, stored = make_history()
+    for timestamp, msg in ((10.0, "a"), (12.0, "b"), (11.5, "late"), (13.0, "c")):
+        history.append({"timestamp": timestamp, "msg": msg})
+
+    assert [event["msg"] for event in history.since(11.0)] == ["b", "late", "c"]
+    assert [event["msg"] for event in history.since(11.0, max_items=2)] == ["late", "c"]
+    assert history.since(13.0) == []
+    assert stored == ["a", "b", "late", "c"]
+
+
+def test_history_keeps_capacity_after_load():
+    history, _stored = make_history(capacity=3)
+    history.load([{"seq": 40, "timestamp": 1.0, "msg": "old"}, {"seq": 41, "timestamp": 2.0, "msg": "older"}])
+
+    for index in range(6):
+        history.append({"timestamp": 10.0 + index, "msg": f"new {index}"})
+
+    assert [event["msg"] for event in history.latest(50)] == ["new 3", "new 4", "new 5"]
+    assert [event["msg"] for event in history.since(0, max_items=50)] == ["new 3", "new 4", "new 5"]
+
+
+def test_stored_history_is_never_overwritten_when_the_load_was_missed(temp_db):
+    first = notification_history.NotificationHistory()
+    for index in range(2):
+        first.append({"timestamp": 1.0 + index, "msg": f"old {index}"})
+    users_db.flush_notification_records()
+
+    # A process whose startup load failed starts with an empty index.
+    restarted = notification_history.NotificationHistory()
+    event = {"timestamp": 5.0, "msg": "new"}
+    restarted.append(event)
+    assert event["seq"] is None
+    users_db.flush_notification_records()
+
+    assert event["seq"] == 3
+    assert [stored["msg"] for stored in users_db.list_notification_records()] == ["new", "old 1", "old 0"]
@@ -1,3 +1,7 @@
+import threading
+
+import pytest
+
 import pushover_client
 
 
@@ -26,16 +30,31 @@ ALL_NOTIFICATION_ENV_VARS = [
 
 
 class DummyResponse:
-    def __init__(self, status_code=200):
+    def __init__(self, status_code=200, headers=None):
         self.status_code = status_code
+        self.headers = headers or {}
 
     def raise_for_status(self):
+        if self.status_code >= 400:
+            raise pushover_client.requests.HTTPError(f"HTTP {self.status_code}", response=self)
         return None
 
 
+class FakeSession:
+    def __init__(self, post=None, request=None):
+        self.post = post
+        self.request = request
+
+
+def patch_sessions(monkeypatch, post=None, request=None):
+    session = FakeSession(post=post, request=request)
+    monkeypatch.setattr(pushover_client, "_channel_session", lambda channel_name: session)
+
+
 def clear_notification_env(monkeypatch):
     for env_var in ALL_NOTIFICATION_ENV_VARS:
         monkeypatch.delenv(env_var, raising=False)
+    monkeypatch.setattr(pushover_client, "_breakers", {})
 
 
 def test_send_reports_missing_configuration(monkeypatch):
@@ -69,7 +88,7 @@ def test_send_posts_to_configured_pushover(monkeypatch):
         captured["auth"] = auth
         return DummyResponse(status_code=200)
 
-    monkeypatch.setattr(pushover_client.requests, "post", fake_post)
+    patch_sessions(monkeypatch, post=fake_post)
 
     result = pushover_client.send("CPU high", title="Alert", priority=1)
 
@@ -101,7 +120,7 @@ def test_send_posts_to_configured_ntfy(monkeypatch):
         captured["auth"] = auth
         return DummyResponse(status_code=202)
 
-    monkeypatch.setattr(pushover_client.requests, "post", fake_post)
+    patch_sessions(monkeypatch, post=fake_post)
 
     result = pushover_client.send(
         "CPU high",
@@ -133,7 +152,7 @@ def test_send_posts_default_json_to_generic_webhook(monkeypatch):
         captured.update(kwargs)
         return DummyResponse(status_code=204)
 
-    monkeypatch.setattr(pushover_client.requests, "request", fake_request)
+    patch_sessions(monkeypatch, request=fake_request)
 
     result = pushover_client.send(
         "Status changed",
@@ -180,7 +199,7 @@ def test_send_supports_custom_generic_webhook_body_template(monkeypatch):
         captured.update(kwargs)
         return DummyResponse(status_code=200)
 
-    monkeypatch.setattr(pushover_client.requests, "request", fake_request)
+    patch_sessions(monkeypatch, request=fake_request)
 
     result = pushover_client.send(
         "Container restarted",
@@ -195,3 +214,157 @@ def test_send_supports_custom_generic_webhook_body_template(monkeypatch):
     assert captured["headers"]["Content-Type"] == "text/plain; charset=utf-8"
     assert captured["data"] == b"[status] worker: Container restarted"
     assert "json" not in captured
+
+
+def test_send_fans_out_to_channels_concurrently(monkeypatch):
+    clear_notification_env(monkeypatch)
+    monkeypatch.setenv("SLACK_WEBHOOK_URL", "https://hooks.slack.example/a")
+    monkeypatch.setenv("DISCORD_WEBHOOK_URL", "https://discord.example/b")
+
+    # Each post waits until both channels are in flight, which only happens
+    # if send() does not deliver them one after the other.
+    both_started = threading.Barrier(2, timeout=5)
+
+    def fake_post(url, timeout, data=None, json=None, headers=None, auth=None):
+        both_started.wait()
+        return DummyResponse(status_code=200)
+
+    patch_sessions(monkeypatch, post=fake_post)
+
+    result = pushover_client.send("Disk full", title="Alert")
+
+    assert result["ok"] is True
+    assert result["successful_channels"] == ["slack", "discord"]
+    assert list(result["channels"]) == list(pushover_client.CHANNEL_NAMES)
+    assert result["channels"]["pushover"]["skipped"] == "missing env vars"
+
+
+def test_channel_session_is_reused_per_channel(monkeypatch):
+    monkeypatch.setattr(pushover_client, "_sessions", {})
+
+    slack = pushover_client._channel_session("slack")
+
+    assert pushover_client._channel_session("slack") is slack
+    assert pushover_client._channel_session("discord") is not slack
+
+
+def test_send_channel_retries_retryable_errors_and_honours_retry_after(monkeypatch):
+    clear_notification_env(monkeypatch)
+    monkeypatch.setenv("SLACK_WEBHOOK_URL", "https://hooks.slack.example/a")
+    sleeps = []
+    monkeypatch.setattr(pushover_client, "_sleep", sleeps.append)
+    monkeypatch.setattr(pushover_client.random, "uniform", lambda low, high: high)
+    responses = [
+        DummyResponse(status_code=429, headers={"Retry-After": "2"}),
+        pushover_client.requests.ConnectionError("connection refused"),
+        DummyResponse(status_code=200),
+    ]
+
+    def fake_post(url, timeout, data=None, json=None, headers=None, auth=None):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        response.raise_for_status()
+        return response
+
+    patch_sessions(monkeypatch, post=fake_post)
+
+    result = pushover_client.send_channel("slack", "Disk full")
+
+    assert result["ok"] is True
+    assert result["attempts"] == 3
+    # Retry-After wins over backoff; the connection error backs off base * 2**1.
+    assert sleeps == [2.0, pushover_client.NOTIFICATION_RETRY_BASE_DELAY_MS / 1000.0 * 2]
+    assert pushover_client.get_channel_health()["slack"]["state"] == pushover_client.CIRCUIT_CLOSED
+
+
+def test_send_channel_does_not_retry_client_errors(monkeypatch):
+    clear_notification_env(monkeypatch)
+    monkeypatch.setenv("DISCORD_WEBHOOK_URL", "https://discord.example/b")
+    monkeypatch.setattr(pushover_client, "_sleep", lambda seconds: None)
+    calls = []
+
+    def fake_post(url, timeout, data=None, json=None, headers=None, auth=None):
+        calls.append(url)
+        response = DummyResponse(status_code=404)
+        response.raise_for_status()
+
+    patch_sessions(monkeypatch, post=fake_post)
+
+    result = pushover_client.send_channel("discord", "Disk full")
+
+    assert result["ok"] is False
+    assert result["attempts"] == 1
+    assert len(calls) == 1
+
+
+def test_circuit_breaker_opens_short_circuits_and_recovers_after_trial():
+    now = [1000.0]
+    breaker = pushover_client.ChannelCircuitBreaker(failure_threshold=2, cooldown_seconds=60, clock=lambda: now[0])
+
+    breaker.record_failure("timeout")
+    assert breaker.allow() is True
+    breaker.record_failure("timeout")
+
+    assert breaker.allow() is False
+    assert breaker.snapshot()["state"] == pushover_client.CIRCUIT_OPEN
+    assert breaker.snapshot()["retry_in_seconds"] == 60
+
+    now[0] += 61
+    assert breaker.allow() is True  # the single trial delivery
+    assert breaker.allow() is False
+    breaker.record_failure("still down")
+    assert breaker.snapshot()["state"] == pushover_client.CIRCUIT_OPEN
+
+    now[0] += 61
+    assert breaker.allow() is True
+    breaker.record_success()
+    snapshot = breaker.snapshot()
+    assert snapshot["state"] == pushover_client.CIRCUIT_CLOSED
+    assert snapshot["times_opened"] == 2
+    assert snapshot["short_circuited"] == 2
+
+
+def test_send_channel_short_circuits_when_retry_after_exceeds_budget(monkeypatch):
+    clear_notification_env(monkeypatch)
+    monkeypatch.setenv("DISCORD_WEBHOOK_URL", "https://discord.example/b")
+    monkeypatch.setattr(pushover_client, "_sleep", lambda seconds: None)
+    calls = []
+
+    def fake_post(url, timeout, data=None, json=None, headers=None, auth=None):
+        calls.append(url)
+        DummyResponse(status_code=429, headers={"Retry-After": "3600"}).raise_for_status()
+
+    patch_sessions(monkeypatch, post=fake_post)
+
+    first = pushover_client.send_channel("discord", "Disk full")
+    second = pushover_client.send_channel("discord", "Disk full again")
+
+    assert first["ok"] is False
+    assert first["attempts"] == 1
+    assert second["circuit_open"] is True
+    assert len(calls) == 1
+    health = pushover_client.get_channel_health()["discord"]
+    assert health["configured"] is True
+    assert health["state"] == pushover_client.CIRCUIT_OPEN
+    assert health["retry_in_seconds"] > 3000
+
+
+def test_send_channel_releases_trial_slot_when_building_the_request_fails(monkeypatch):
+    clear_notification_env(monkeypatch)
+    monkeypatch.setenv("DISCORD_WEBHOOK_URL", "https://discord.example/b")
+    now = [1000.0]
+    breaker = pushover_client.ChannelCircuitBreaker(failure_threshold=1, cooldown_seconds=60, clock=lambda: now[0])
+    monkeypatch.setattr(pushover_client, "_breakers", {"discord": breaker})
+    breaker.record_failure("timeout")
+    now[0] += 61
+
+    def broken_sender(*args, **kwargs):
+        raise RuntimeError("template exploded")
+
+    monkeypatch.setattr(pushover_client, "_channel_sender", broken_sender)
+    with pytest.raises(RuntimeError):
+        pushover_client.send_channel("discord", "Disk full")
+
+    assert breaker.snapshot()["state"] == pushover_client.CIRCUIT_HALF_OPEN
+    assert breaker.allow() is True
@@ -0,0 +1,164 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import registry_client
+import registry_digests
+
+DIGEST = "sha256:" + "a" * 64
+
+
+class StandInRegistry:
+    """Minimal registry + token service speaking the distribution auth flow over HTTP."""
+
+    def __init__(self):
+        self.requests = []
+        self.token_requests = []
+        self.client_ports = set()
+        self.rate_limit_remaining = "100;w=3600"
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *_args):
+                pass
+
+            def _reply(self, status, headers=None, body=b""):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if body and self.command != "HEAD":
+                    self.wfile.write(body)
+
+            def do_GET(self):
+                registry.token_requests.append(self.path)
+                self._reply(200, {"Content-Type": "application/json"}, json.dumps({"token": "t0k", "expires_in": 300}).encode())
+
+            def do_HEAD(self):
+                registry.requests.append(dict(self.headers))
+                registry.client_ports.add(self.client_address[1])
+                if self.headers.get("Authorization") != "Bearer t0k":
+                    realm = f"http://{registry.host}/token"
+                    self._reply(401, {
+                        "WWW-Authenticate": f'Bearer realm="{realm}",service="stand-in",scope="repository:library/redis:pull"',
+                    })
+                    return
+                headers = {"RateLimit-Remaining": registry.rate_limit_remaining}
+                if self.headers.get("If-None-Match") == f'"{DIGEST}"':
+                    self._reply(304, headers)
+                    return
+                headers["Docker-Content-Digest"] = DIGEST
+                self._reply(200, headers)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.host = f"127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *_exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def test_split_image_ref_maps_docker_hub_to_registry_api_host():
+    assert registry_client.split_image_ref("redis:7") == ("registry-1.docker.io", "library/redis", "7")
+    assert registry_client.split_image_ref("ghcr.io/org/app") == ("ghcr.io", "org/app", "latest")
+    assert registry_client.parse_rate_limit_remaining("76;w=21600") == (76, 21600)
+
+
+def test_head_digest_authenticates_once_and_reuses_connections():
+    with StandInRegistry() as registry:
+        client = registry_client.RegistryClient(insecure_hosts=[registry.host])
+        ref = f"{registry.host}/library/redis:7"
+
+        assert client.head_digest(ref) == DIGEST
+        assert client.head_digest(ref) == DIGEST
+        assert client.head_digest(ref) == DIGEST
+
+    assert len(registry.token_requests) == 1
+    assert "scope=repository" in registry.token_requests[0]
+    assert "application/vnd.oci.image.index.v1+json" in registry.requests[0]["Accept"]
+    assert registry.requests[-1]["If-None-Match"] == f'"{DIGEST}"'
+    assert len(registry.client_ports) == 1
+
+
+def test_head_digest_pauses_registry_when_rate_limit_is_exhausted():
+    with StandInRegistry() as registry:
+        registry.rate_limit_remaining = "0;w=600"
+        client = registry_client.RegistryClient(insecure_hosts=[registry.host])
+        ref = f"{registry.host}/library/redis:7"
+
+        assert client.head_digest(ref) == DIGEST
+        request_count = len(registry.requests)
+        with pytest.raises(registry_client.RegistryRateLimited):
+            client.head_digest(ref)
+
+    assert len(registry.requests) == request_count
+
+
+def test_digest_cache_falls_back_to_dockerd_when_direct_check_fails():
+    class FailingDirect:
+        def head_digest(self, image_ref):
+            raise registry_client.RegistryError("unreachable")
+
+    class Images:
+        def get_registry_data(self, image_ref):
+            return type("RegistryData", (), {"id": "sha256:from-dockerd"})()
+
+    cache = registry_digests.RegistryDigestCache(direct_client=FailingDirect())
+    client = type("Client", (), {"images": Images()})()
+
+    assert cache.get_digest(client, "redis:7") == "sha256:from-dockerd"
+    assert cache.stats()["direct_fallbacks"] == 1
+
+
+def test_digest_cache_does_not_fall_back_to_dockerd_when_rate_limited():
+    class RateLimitedDirect:
+        def head_digest(self, image_ref):
+            raise registry_client.RegistryRateLimited("registry-1.docker.io", 0)
+
+    class Images:
+        calls = 0
+
+        def get_registry_data(self, image_ref):
+            Images.calls += 1
+            return type("RegistryData", (), {"id": "sha256:from-dockerd"})()
+
+    cache = registry_digests.RegistryDigestCache(direct_client=RateLimitedDirect())
+    client = type("Client", (), {"images": Images()})()
+
+    for _ in range(2):
+        with pytest.raises(registry_client.RegistryRateLimited):
+            cache.get_digest(client, "redis:7")
+
+    assert Images.calls == 0
+    assert cache.stats()["rate_limited"] == 1
+    assert cache.stats()["negative_hits"] == 1
+
+
+def test_fetch_token_wraps_non_json_responses_in_registry_error():
+    class HtmlResponse:
+        status_code = 200
+
+        def json(self):
+            raise ValueError("Expecting value")
+
+    class Session:
+        def mount(self, prefix, adapter):
+            pass
+
+        def get(self, url, params=None, timeout=None):
+            return HtmlResponse()
+
+    client = registry_client.RegistryClient(session=Session())
+
+    with pytest.raises(registry_client.RegistryError, match="not JSON"):
+        client._fetch_token("registry.example", "org/app", 'Bearer realm="https://auth.example/token"')
@@ -0,0 +1,121 @@
+import threading
+import time
+
+import pytest
+
+import registry_digests
+
+
+class FakeRegistryData:
+    def __init__(self, digest):
+        self.id = digest
+
+
+class FakeImages:
+    def __init__(self, responses=None, gate=None):
+        self.calls = []
+        self.responses = responses or {}
+        self.gate = gate
+
+    def get_registry_data(self, image_ref):
+        self.calls.append(image_ref)
+        if self.gate is not None:
+            self.gate.wait(5)
+        response = self.responses.get(image_ref, f'sha256:{image_ref}')
+        if isinstance(response, Exception):
+            raise response
+        return FakeRegistryData(response)
+
+
+class FakeClient:
+    def __init__(self, images):
+        self.images = images
+
+
+def test_normalize_image_ref_expands_docker_hub_shorthand():
+    assert registry_digests.normalize_image_ref('redis:7') == 'docker.io/library/redis:7'
+    assert registry_digests.normalize_image_ref('redis') == 'docker.io/library/redis:latest'
+    assert registry_digests.normalize_image_ref('docker.io/library/redis:7') == 'docker.io/library/redis:7'
+    assert registry_digests.normalize_image_ref('Grafana/grafana') == 'docker.io/grafana/grafana:latest'
+    assert registry_digests.normalize_image_ref('ghcr.io/org/app:1.2') == 'ghcr.io/org/app:1.2'
+    assert registry_digests.normalize_image_ref('localhost:5000/app') == 'localhost:5000/app:latest'
+
+
+def test_digest_cache_reuses_results_across_equivalent_refs_until_ttl():
+    now = [0.0]
+    images = FakeImages()
+    cache = registry_digests.RegistryDigestCache(ttl_seconds=60, negative_ttl_seconds=10, clock=lambda: now[0])
+    client = FakeClient(images)
+
+    assert cache.get_digest(client, 'redis:7') == 'sha256:redis:7'
+    assert cache.get_digest(client, 'docker.io/library/redis:7') == 'sha256:redis:7'
+    assert cache.get_digest(client, 'redis:7', max_age=0) == 'sha256:redis:7'
+    now[0] = 61.0
+    cache.get_digest(client, 'redis:7')
+
+    assert images.calls == ['redis:7', 'redis:7', 'redis:7']
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 3
+
+
+def test_digest_cache_remembers_failures_for_negative_ttl():
+    now = [0.0]
+    images = FakeImages(responses={'private/app:1': RuntimeError('denied')})
+    cache = registry_digests.RegistryDigestCache(ttl_seconds=60, negative_ttl_seconds=10, clock=lambda: now[0])
+    client = FakeClient(images)
+
+    for _ in range(3):
+        with pytest.raises(RuntimeError, match='denied'):
+            cache.get_digest(client, 'private/app:1')
+    now[0] = 11.0
+    with pytest.raises(RuntimeError):
+        cache.get_digest(client, 'private/app:1')
+
+    assert len(images.calls) == 2
+    assert cache.stats()['negative_hits'] == 2
+    assert cache.stats()['errors'] == 2
+
+
+def test_digest_cache_raises_a_fresh_exception_for_each_negative_hit():
+    limited = registry_digests.RegistryRateLimited('registry-1.docker.io', 1234.0)
+    images = FakeImages(responses={'private/app:1': RuntimeError('denied'), 'redis:7': limited})
+    cache = registry_digests.RegistryDigestCache(ttl_seconds=60, negative_ttl_seconds=10, clock=lambda: 0.0)
+    client = FakeClient(images)
+
+    raised = []
+    for _ in range(3):
+        with pytest.raises(RuntimeError, match='denied') as excinfo:
+            cache.get_digest(client, 'private/app:1')
+        raised.append(excinfo.value)
+    with pytest.raises(registry_digests.RegistryRateLimited):
+        cache.get_digest(client, 'redis:7')
+    with pytest.raises(registry_digests.RegistryRateLimited) as excinfo:
+        cache.get_digest(client, 'redis:7')
+
+    assert len({id(error) for error in raised}) == 3
+    assert excinfo.value is not limited
+    assert (excinfo.value.host, excinfo.value.retry_at) == ('registry-1.docker.io', 1234.0)
+
+
+def test_digest_cache_coalesces_concurrent_lookups():
+    gate = threading.Event()
+    images = FakeImages(gate=gate)
+    cache = registry_digests.RegistryDigestCache(ttl_seconds=60, negative_ttl_seconds=10)
+    client = FakeClient(images)
+    results = []
+
+    workers = [
+        threading.Thread(target=lambda: results.append(cache.get_digest(client, 'nginx:1.25')))
+        for _ in range(8)
+    ]
+    for worker in workers:
+        worker.start()
+    while cache.stats()['coalesced'] < 7:
+        time.sleep(0.01)
+    gate.set()
+    for worker in workers:
+        worker.join()
+
+    assert images.calls == ['nginx:1.25']
+    assert results == ['sha256:nginx:1.25'] * 8
@@ -0,0 +1,141 @@
+import os
+
+import docker.errors
+
+import rollback_artifacts
+
+
+class FakeImage:
+    def __init__(self, image_id, tags, size, created='2024-01-01T00:00:00Z'):
+        self.id = image_id
+        self.tags = list(tags)
+        self.attrs = {'Size': size, 'Created': created}
+
+
+class FakeImages:
+    def __init__(self, images, in_use=()):
+        self.images = {image.id: image for image in images}
+        self.in_use = set(in_use)
+        self.removed = []
+
+    def list(self, name=None):
+        return [image for image in self.images.values() if image.tags]
+
+    def remove(self, ref, noprune=False):
+        for image in list(self.images.values()):
+            if ref in image.tags:
+                image.tags.remove(ref)
+                self.removed.append(ref)
+                if not image.tags and image.id not in self.in_use:
+                    del self.images[image.id]
+                return
+        raise docker.errors.ImageNotFound(ref)
+
+    def get(self, image_id):
+        if image_id not in self.images:
+            raise docker.errors.ImageNotFound(image_id)
+        return self.images[image_id]
+
+
+class FakeClient:
+    def __init__(self, images):
+        self.images = images
+
+
+def patch_history(monkeypatch, entries_by_image=None, latest=()):
+    disabled = []
+    monkeypatch.setattr(rollback_artifacts, 'rollback_image_targets', lambda: (dict(entries_by_image or {}), set(latest)))
+    monkeypatch.setattr(
+        rollback_artifacts, 'disable_update_history_rollback',
+        lambda entry_ids, reason: disabled.extend(entry_ids),
+    )
+    return disabled
+
+
+def write_override(directory, name, mtime):
+    path = os.path.join(directory, name)
+    with open(path, 'w', encoding='utf-8') as handle:
+        handle.write('services: {}\n')
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_prune_removes_oldest_tags_and_orphaned_overrides_within_budget(monkeypatch, tmp_path):
+    monkeypatch.setattr(rollback_artifacts, 'rollback_dir', lambda: str(tmp_path))
+    patch_history(monkeypatch, latest={'sha256:three', 'sha256:blog'})
+    write_override(tmp_path, 'shop-history-1.override.yml', 100)
+    write_override(tmp_path, 'shop-history-2.override.yml', 200)
+    write_override(tmp_path, 'shop-history-3.override.yml', 300)
+    write_override(tmp_path, 'blog-history-4.override.yml', 150)
+    images = FakeImages([
+        FakeImage('sha256:one', ['statainer-rollback/shop-web:history-1'], 400),
+        FakeImage('sha256:two', ['statainer-rollback/shop-web:history-2'], 300),
+        FakeImage('sha256:three', ['statainer-rollback/shop-web:history-3'], 200),
+        FakeImage('sha256:blog', ['statainer-rollback/blog-app:history-4'], 100),
+    ], in_use={'sha256:two'})
+    manager = rollback_artifacts.RollbackArtifactManager(max_images=2, max_bytes=10_000)
+
+    result = manager.prune(FakeClient(images))
+
+    assert result['removed_images'] == ['statainer-rollback/shop-web:history-1', 'statainer-rollback/shop-web:history-2']
+    assert result['reclaimed_bytes'] == 400
+    assert sorted(result['removed_override_files']) == ['shop-history-1.override.yml', 'shop-history-2.override.yml']
+    stats = manager.stats(FakeClient(images))
+    assert stats['images'] == 2
+    assert stats['bytes'] == 300
+    assert stats['total_reclaimed_bytes'] == 400
+
+
+def test_prune_enforces_disk_budget_but_keeps_the_latest_rollback_target(monkeypatch, tmp_path):
+    monkeypatch.setattr(rollback_artifacts, 'rollback_dir', lambda: str(tmp_path))
+    patch_history(monkeypatch, latest={'sha256:new'})
+    images = FakeImages([
+        FakeImage('sha256:old', ['statainer-rollback/api-app:history-5'], 900, created='2024-01-01T00:00:00Z'),
+        FakeImage('sha256:new', ['statainer-rollback/api-app:history-9'], 900, created='2024-06-01T00:00:00Z'),
+    ])
+    manager = rollback_artifacts.RollbackArtifactManager(max_images=10, max_bytes=500)
+
+    result = manager.prune(FakeClient(images))
+
+    assert result['removed_images'] == ['statainer-rollback/api-app:history-5']
+    assert [item['ref'] for item in manager.list_artifacts(FakeClient(images))] == ['statainer-rollback/api-app:history-9']
+
+
+def test_prune_scopes_override_files_to_their_project(monkeypatch, tmp_path):
+    monkeypatch.setattr(rollback_artifacts, 'rollback_dir', lambda: str(tmp_path))
+    patch_history(monkeypatch, latest={'sha256:shop-new', 'sha256:blog'})
+    write_override(tmp_path, 'shop-history-7.override.yml', 100)
+    write_override(tmp_path, 'blog-history-7.override.yml', 200)
+    images = FakeImages([
+        FakeImage('sha256:shop-old', ['statainer-rollback/shop-web:history-7'], 100),
+        FakeImage('sha256:shop-new', ['statainer-rollback/shop-web:history-8'], 100),
+        FakeImage('sha256:blog', ['statainer-rollback/blog-app:history-7'], 100),
+    ])
+    manager = rollback_artifacts.RollbackArtifactManager(max_images=2, max_bytes=10_000)
+
+    result = manager.prune(FakeClient(images))
+
+    assert result['removed_images'] == ['statainer-rollback/shop-web:history-7']
+    assert result['removed_override_files'] == ['shop-history-7.override.yml']
+    assert os.path.exists(os.path.join(tmp_path, 'blog-history-7.override.yml'))
+
+
+def test_prune_enforces_budget_over_rollback_ready_images_and_disables_their_rollbacks(monkeypatch, tmp_path):
+    monkeypatch.setattr(rollback_artifacts, 'rollback_dir', lambda: str(tmp_path))
+    disabled = patch_history(
+        monkeypatch,
+        entries_by_image={'sha256:one': [11], 'sha256:two': [12, 14], 'sha256:three': [13]},
+        latest={'sha256:three'},
+    )
+    images = FakeImages([
+        FakeImage('sha256:one', ['statainer-rollback/shop-web:history-1'], 100, created='2024-01-01T00:00:00Z'),
+        FakeImage('sha256:two', ['statainer-rollback/shop-web:history-2'], 100, created='2024-02-01T00:00:00Z'),
+        FakeImage('sha256:three', ['statainer-rollback/shop-web:history-3'], 100, created='2024-03-01T00:00:00Z'),
+    ])
+    manager = rollback_artifacts.RollbackArtifactManager(max_images=1, max_bytes=10_000)
+
+    result = manager.prune(FakeClient(images))
+
+    assert result['removed_images'] == ['statainer-rollback/shop-web:history-1', 'statainer-rollback/shop-web:history-2']
+    assert manager.stats(FakeClient(images))['images'] == 1
+    assert sorted(disabled) == result['disabled_rollbacks'] == [11, 12, 14]
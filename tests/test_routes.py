@@ -1,4 +1,8 @@
 import base64
+import gzip
+import json
+import threading
+import time
 
 import app as app_module
 import pytest
@@ -278,6 +282,21 @@ def test_notification_test_reports_missing_configuration(client, monkeypatch):
     assert payload["configured_any"] is False
 
 
+def test_notification_status_reports_channel_circuits(client, monkeypatch):
+    set_auth_mode(client, "page")
+    set_page_session(client)
+    monkeypatch.setattr(routes, "get_channel_health", lambda: {
+        "discord": {"configured": True, "state": "open", "retry_in_seconds": 42.0},
+    })
+
+    response = client.get("/api/notification-status")
+
+    assert response.status_code == 200
+    payload = response.get_json()
+    assert payload["channels"]["discord"]["state"] == "open"
+    assert "pending" in payload["dispatch"]
+
+
 def test_update_manager_list_endpoint_returns_inventory_for_admin(client, monkeypatch):
     set_auth_mode(client, "page")
     set_page_session(client)
@@ -303,6 +322,7 @@ def test_update_manager_list_endpoint_returns_inventory_for_admin(client, monkey
 def test_update_manager_update_endpoint_executes_target(client, monkeypatch):
     set_auth_mode(client, "page")
     csrf_token = set_page_session(client)
+    use_fake_update_container(monkeypatch)
 
     monkeypatch.setattr(routes.update_manager, "update_target", lambda target_type, target_id, actor_username=None: {
         "ok": True,
@@ -325,6 +345,7 @@ def test_update_manager_update_endpoint_executes_target(client, monkeypatch):
 def test_update_manager_update_endpoint_emits_success_notification(client, monkeypatch):
     set_auth_mode(client, "page")
     csrf_token = set_page_session(client)
+    use_fake_update_container(monkeypatch)
     emitted = []
 
     monkeypatch.setattr(routes.update_manager, "update_target", lambda target_type, target_id, actor_username=None: {
@@ -366,6 +387,7 @@ def test_update_manager_update_endpoint_emits_success_notification(client, monke
 def test_update_manager_update_endpoint_emits_failure_notification(client, monkeypatch):
     set_auth_mode(client, "page")
     csrf_token = set_page_session(client)
+    use_fake_update_container(monkeypatch, container_id="cache-standalone")
     emitted = []
 
     monkeypatch.setattr(routes.update_manager, "update_target", lambda target_type, target_id, actor_username=None: {
@@ -587,6 +609,40 @@ def test_notifications_endpoint_supports_since_and_limit(client, monkeypatch):
     assert response.get_json() == [{"timestamp": 12.5, "msg": "worker restarted", "type": "status"}]
 
 
+def test_notifications_endpoint_pages_stored_history_with_filters(client, monkeypatch):
+    set_auth_mode(client, "page")
+    set_page_session(client)
+    calls = []
+
+    def fake_list_notification_records(limit, before_seq, event_type, project, since):
+        calls.append((limit, before_seq, event_type, project, since))
+        return [{"seq": 9, "type": "cpu", "project": "shop"}, {"seq": 4, "type": "cpu", "project": "shop"}]
+
+    monkeypatch.setattr(routes, "list_notification_records", fake_list_notification_records)
+
+    response = client.get("/api/notifications?type=cpu&project=shop&limit=2&before=12")
+
+    assert response.status_code == 200
+    assert [event["seq"] for event in response.get_json()] == [9, 4]
+    assert response.headers["X-Next-Before"] == "4"
+    assert calls == [(2, 12, "cpu", "shop", None)]
+
+    first_page = client.get("/api/notifications?history=1&limit=2")
+    assert first_page.headers["X-Next-Before"] == "4"
+    assert calls[-1] == (2, None, None, None, None)
+
+
+def test_notifications_endpoint_keeps_in_memory_order_for_since_and_limit(client, monkeypatch):
+    set_auth_mode(client, "page")
+    set_page_session(client)
+    monkeypatch.setattr(sampler, "get_notifications", lambda since_ts=None, max_items=50: [{"timestamp": 11.0}, {"timestamp": 12.0}])
+    monkeypatch.setattr(routes, "list_notification_records", lambda **_kwargs: pytest.fail("stored history was queried"))
+
+    response = client.get("/api/notifications?since=10&limit=5")
+
+    assert response.get_json() == [{"timestamp": 11.0}, {"timestamp": 12.0}]
+
+
 def test_audit_log_records_password_and_user_management_actions(client):
     set_auth_mode(client, "page")
     csrf_token = set_page_session(client)
@@ -612,6 +668,23 @@ def test_audit_log_records_password_and_user_management_actions(client):
     assert any(event["action"] == "user.create" and event["target_id"] == "bob" for event in events)
 
 
+def test_audit_log_supports_filters_and_cursor_pagination(client):
+    set_auth_mode(client, "page")
+    set_page_session(client)
+    for index in range(3):
+        users_db.enqueue_audit_event("container.restart", "container", "success", actor_username="admin", target_id=f"c{index}")
+    users_db.enqueue_audit_event("login", "session", "success", actor_username="admin")
+
+    first = client.get("/api/audit?limit=2&action=container.restart")
+    second = client.get(f"/api/audit?limit=2&action=container.restart&before={first.headers['X-Next-Before']}")
+    invalid = client.get("/api/audit?since=not-a-date")
+
+    assert [event["target_id"] for event in first.get_json()] == ["c2", "c1"]
+    assert [event["target_id"] for event in second.get_json()] == ["c0"]
+    assert "X-Next-Before" not in second.headers
+    assert invalid.status_code == 400
+
+
 def test_container_actions_are_audited(client, monkeypatch):
     set_auth_mode(client, "page")
     csrf_token = set_page_session(client)
@@ -718,10 +791,12 @@ def test_logs_snapshot_returns_downloadable_text_file(client, monkeypatch):
     class DummyContainer:
         name = "db primary"
 
-        def logs(self, tail=100, timestamps=True):
+        def logs(self, tail=100, timestamps=True, stream=False, follow=False):
             assert tail == 2
             assert timestamps is True
-            return b"log line 1\nlog line 2\n"
+            assert stream is True
+            assert follow is False
+            return iter([b"log line 1\n", b"log line 2\n"])
 
     class DummyContainers:
         def get(self, container_id):
@@ -741,6 +816,48 @@ def test_logs_snapshot_returns_downloadable_text_file(client, monkeypatch):
     assert response.headers["Content-Disposition"] == 'attachment; filename="db-primary-abc123-logs.txt"'
 
 
+def test_logs_download_streams_gzip_with_time_bounds(client, monkeypatch):
+    set_auth_mode(client, "page")
+    set_page_session(client)
+    captured = {}
+
+    class DummyContainer:
+        name = "web"
+
+        def logs(self, **kwargs):
+            captured.update(kwargs)
+            return iter([b"2026-01-01T10:00:00Z first\n", b"2026-01-01T10:00:01Z second\n"])
+
+    class DummyContainers:
+        def get(self, container_id):
+            return DummyContainer()
+
+    class DummyClient:
+        containers = DummyContainers()
+
+    monkeypatch.setattr(routes, "get_docker_client", lambda: DummyClient())
+
+    response = client.get("/api/logs/abc123?download=1&tail=all&gzip=1&since=1767261600&until=2026-01-01T12:00:00Z")
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/gzip"
+    assert response.headers["Content-Disposition"] == 'attachment; filename="web-abc123-logs.txt.gz"'
+    assert gzip.decompress(response.get_data()) == b"2026-01-01T10:00:00Z first\n2026-01-01T10:00:01Z second\n"
+    assert captured["tail"] == "all"
+    assert captured["since"] == 1767261600
+    assert captured["until"] == 1767268800
+
+
+def test_logs_download_rejects_invalid_time_bounds(client, monkeypatch):
+    set_auth_mode(client, "page")
+    set_page_session(client)
+
+    response = client.get("/api/logs/abc123?download=1&since=yesterday-ish")
+
+    assert response.status_code == 400
+    assert "since" in response.get_json()["error"]
+
+
 def test_logs_stream_emits_connected_snapshot_and_live_lines(client, monkeypatch):
     set_auth_mode(client, "page")
     set_page_session(client)
@@ -783,6 +900,104 @@ def test_logs_stream_emits_connected_snapshot_and_live_lines(client, monkeypatch
     assert "live line 2" in body
 
 
+def test_logs_search_streams_matches_with_context(client, monkeypatch):
+    set_auth_mode(client, "page")
+    set_page_session(client)
+
+    class DummyContainer:
+        name = "api"
+
+        def logs(self, **kwargs):
+            assert kwargs["stream"] is True
+            assert kwargs["follow"] is False
+            assert kwargs["tail"] == "all"
+            return iter([
+                b"2026-01-01T10:00:00.000000000Z starting\n",
+                b"2026-01-01T10:00:01.000000000Z ERROR db timeout\n",
+                b"2026-01-01T10:00:02.000000000Z retrying\n",
+            ])
+
+    class DummyContainers:
+        def get(self, container_id):
+            assert container_id == "abc123"
+            return DummyContainer()
+
+    class DummyClient:
+        containers = DummyContainers()
+
+    monkeypatch.setattr(routes, "get_docker_client", lambda: DummyClient())
+
+    response = client.get("/api/logs/abc123/search?q=error%5Cs%2Bdb&regex=1&context=1")
+    body = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    assert "event: match" in body
+    assert '"text": "ERROR db timeout"' in body
+    assert '"timestamp": "2026-01-01T10:00:01.000000000Z"' in body
+    assert '"text": "retrying"' in body
+    assert "event: summary" in body
+
+
+def test_project_log_stream_merges_services_in_timestamp_order(client, monkeypatch):
+    set_auth_mode(client, "page")
+    set_page_session(client)
+
+    class DummyContainer:
+        def __init__(self, container_id, service, lines):
+            self.id = container_id
+            self.name = f"demo-{service}-1"
+            self.labels = {
+                "com.docker.compose.project": "demo",
+                "com.docker.compose.service": service,
+            }
+            self.lines = lines
+
+        def logs(self, **kwargs):
+            assert kwargs["tail"] == 2
+            return iter(self.lines)
+
+    class DummyContainers:
+        def list(self, filters=None):
+            assert filters == {"label": "com.docker.compose.project=demo"}
+            return [
+                DummyContainer("c-web", "web", [
+                    b"2026-01-01T10:00:00.000000000Z web boot\n",
+                    b"2026-01-01T10:00:02.000000000Z web ready\n",
+                ]),
+                DummyContainer("c-db", "db", [
+                    b"2026-01-01T10:00:01.000000000Z db boot\n",
+                ]),
+            ]
+
+    class DummyClient:
+        containers = DummyContainers()
+
+    monkeypatch.setattr(routes, "get_docker_client", lambda: DummyClient())
+
+    response = client.get("/api/logs/project/demo/stream?tail=2&once=1")
+    body = response.get_data(as_text=True)
+    snapshot = json.loads(body.split("event: snapshot\ndata: ", 1)[1].split("\n", 1)[0])
+
+    assert response.status_code == 200
+    assert '"services": ["db", "web"]' in body
+    assert [(line["service"], line["text"]) for line in snapshot["lines"]] == [
+        ("web", "web boot"),
+        ("db", "db boot"),
+        ("web", "web ready"),
+    ]
+
+
+def test_logs_search_rejects_invalid_regex(client):
+    set_auth_mode(client, "page")
+    set_page_session(client)
+
+    response = client.get("/api/logs/abc123/search?q=(&regex=1")
+
+    assert response.status_code == 400
+    assert "Invalid regular expression" in response.get_json()["error"]
+
+
 def test_export_csv_returns_downloadable_csv(client):
     set_auth_mode(client, "page")
     csrf_token = set_page_session(client)
@@ -932,3 +1147,211 @@ def test_rate_limit_disabled_when_max_attempts_zero(tmp_path, monkeypatch):
         resp = client.get("/api/system-status", headers=basic_auth_header("admin", "wrong"))
         assert resp.status_code == 401
     _clear_rate_limiter()
+
+
+def test_update_manager_jobs_endpoint_and_stream_report_persisted_jobs(client):
+    set_auth_mode(client, "page")
+    set_page_session(client)
+    users_db.save_update_job({
+        "id": "job-1", "target_type": "project", "target_id": "demo", "target_name": "demo",
+        "registry": "docker.io", "priority": 60, "source": "auto", "state": "succeeded",
+        "message": "done", "history_entry_id": None, "created_at": 1.0, "started_at": 2.0, "finished_at": 3.0,
+    })
+
+    response = client.get("/api/update-manager/jobs")
+    stream = client.get("/api/update-manager/jobs/stream?once=1")
+
+    payload = response.get_json()
+    assert response.status_code == 200
+    assert payload["jobs"][0]["id"] == "job-1"
+    assert payload["max_concurrent"] >= 1
+    assert stream.mimetype == "text/event-stream"
+    assert '"id": "job-1"' in stream.get_data(as_text=True)
+
+
+def use_fake_update_container(monkeypatch, container_id="cache-full-id", name="cache", image="redis:7"):
+    class FakeContainer:
+        id = container_id
+        attrs = {"Config": {"Image": image, "Labels": {}}}
+
+    FakeContainer.name = name
+
+    class FakeContainers:
+        def get(self, requested):
+            if requested not in (container_id, name):
+                raise routes.errors.NotFound("missing")
+            return FakeContainer()
+
+        def list(self, all=True):
+            return [FakeContainer()]
+
+    class FakeClient:
+        containers = FakeContainers()
+
+    monkeypatch.setattr(routes.update_manager, "get_docker_client", lambda: FakeClient())
+
+
+def test_update_manager_update_endpoint_queues_background_job_with_progress(client, monkeypatch):
+    set_auth_mode(client, "page")
+    csrf_token = set_page_session(client)
+    executor = routes.job_executor.__class__(max_concurrent=1, per_registry_limit=1)
+    release = threading.Event()
+    monkeypatch.setattr(routes, "job_executor", executor)
+    use_fake_update_container(monkeypatch)
+    monkeypatch.setattr(routes.sampler, "emit_notification", lambda event: None)
+
+    def fake_update_target(target_type, target_id, actor_username=None, progress=None):
+        progress({"image_ref": "redis:7", "percent": 40.0, "final": False})
+        release.wait(5)
+        return {"ok": True, "message": "updated", "history_entry": None}
+
+    monkeypatch.setattr(routes.update_manager, "update_target", fake_update_target)
+
+    response = client.post(
+        "/api/update-manager/update",
+        json={"target_type": "container", "target_id": "cache", "background": True},
+        headers={"X-CSRFToken": csrf_token},
+    )
+    job_id = response.get_json()["job"]["id"]
+    deadline = time.time() + 5
+    while time.time() < deadline and not (executor.get_job(job_id) or {}).get("progress"):
+        time.sleep(0.01)
+    running = client.get(f"/api/update-manager/jobs/{job_id}/stream?once=1").get_data(as_text=True)
+    release.set()
+    while time.time() < deadline and executor.get_job(job_id)["state"] == "running":
+        time.sleep(0.01)
+    finished = client.get(f"/api/update-manager/jobs/{job_id}/stream").get_data(as_text=True)
+
+    assert response.status_code == 202
+    assert '"percent": 40.0' in running
+    assert '"state": "succeeded"' in finished
+    assert client.get("/api/update-manager/jobs/missing/stream").status_code == 404
+
+
+def test_manual_background_update_is_deduped_against_queued_auto_update(client, monkeypatch):
+    set_auth_mode(client, "page")
+    csrf_token = set_page_session(client)
+    executor = routes.job_executor.__class__(max_concurrent=1, per_registry_limit=1)
+    release = threading.Event()
+    monkeypatch.setattr(routes, "job_executor", executor)
+    monkeypatch.setattr(sampler, "job_executor", executor)
+    monkeypatch.setattr(sampler, "emit_notification", lambda event: None)
+    monkeypatch.setattr(routes.update_manager, "update_target", lambda *args, **kwargs: {"ok": True, "message": "updated"})
+    use_fake_update_container(monkeypatch)
+
+    executor.submit("container", "busy", "busy", lambda job: release.wait(5) and {"ok": True}, registry="other")
+    assert sampler.queue_auto_update("container", "cache-full-id", "cache", image_ref="redis:7") is True
+
+    response = client.post(
+        "/api/update-manager/update",
+        json={"target_type": "container", "target_id": "cache", "background": True},
+        headers={"X-CSRFToken": csrf_token},
+    )
+    missing = client.post(
+        "/api/update-manager/update",
+        json={"target_type": "container", "target_id": "ghost", "background": True},
+        headers={"X-CSRFToken": csrf_token},
+    )
+    queued = [job for job in executor.active_jobs() if job["target_name"] == "cache"]
+    release.set()
+    deadline = time.time() + 5
+    while time.time() < deadline and executor.active_jobs():
+        time.sleep(0.01)
+
+    assert response.status_code == 409
+    assert missing.status_code == 404
+    assert len(queued) == 1
+    assert queued[0]["source"] == "auto"
+    assert queued[0]["registry"] == "registry-1.docker.io"
+
+
+def test_synchronous_update_claims_the_executor_key(client, monkeypatch):
+    set_auth_mode(client, "page")
+    csrf_token = set_page_session(client)
+    executor = routes.job_executor.__class__(max_concurrent=1, per_registry_limit=1)
+    monkeypatch.setattr(routes, "job_executor", executor)
+    monkeypatch.setattr(routes.sampler, "emit_notification", lambda event: None)
+    use_fake_update_container(monkeypatch)
+    calls = []
+
+    def fake_update_target(target_type, target_id, actor_username=None):
+        calls.append(executor.claim_target("container", "cache"))
+        return {"ok": True, "message": "updated", "history_entry": None}
+
+    monkeypatch.setattr(routes.update_manager, "update_target", fake_update_target)
+
+    assert executor.claim_target("container", "cache") is True
+    blocked = client.post(
+        "/api/update-manager/update",
+        json={"target_type": "container", "target_id": "cache"},
+        headers={"X-CSRFToken": csrf_token},
+    )
+    executor.release_target("container", "cache")
+    updated = client.post(
+        "/api/update-manager/update",
+        json={"target_type": "container", "target_id": "cache-full-id"},
+        headers={"X-CSRFToken": csrf_token},
+    )
+
+    assert blocked.status_code == 409
+    assert "already queued or running" in blocked.get_json()["message"]
+    assert updated.status_code == 200
+    assert calls == [False]
+    assert executor.claim_target("container", "cache") is True
+
+
+def test_update_manager_update_batch_streams_per_target_results(client, monkeypatch):
+    set_auth_mode(client, "page")
+    csrf_token = set_page_session(client)
+    emitted = []
+    monkeypatch.setattr(routes.sampler, "emit_notification", lambda event: emitted.append(event))
+
+    def fake_run_update_batch(targets, actor_username=None, max_parallel=1, on_result=None):
+        for target_type, target_id in targets:
+            on_result(target_type, target_id, {"ok": target_id != "broken", "message": f"{target_id} done", "history_entry": None})
+
+    monkeypatch.setattr(routes.update_manager, "run_update_batch", fake_run_update_batch)
+
+    response = client.post(
+        "/api/update-manager/update-batch",
+        json={"targets": [
+            {"target_type": "project", "target_id": "demo"},
+            {"target_type": "container", "target_id": "broken"},
+        ]},
+        headers={"X-CSRFToken": csrf_token},
+    )
+    body = response.get_data(as_text=True)
+    invalid = client.post(
+        "/api/update-manager/update-batch",
+        json={"targets": [{"target_type": "volume", "target_id": "x"}]},
+        headers={"X-CSRFToken": csrf_token},
+    )
+
+    assert response.mimetype == "text/event-stream"
+    assert body.count("event: result") == 2
+    assert '"succeeded": 1, "failed": 1' in body
+    assert len(emitted) == 2
+    assert invalid.status_code == 400
+
+
+def test_update_manager_list_endpoint_serves_inventory_with_etag(client, monkeypatch):
+    set_auth_mode(client, "page")
+    set_page_session(client)
+
+    class FakeInventory:
+        def version(self):
+            return 4
+
+        def payload(self, history_limit=20):
+            return {"projects": [], "containers": [], "history": [], "version": 4}
+
+    monkeypatch.setattr(routes.update_manager, "update_inventory", FakeInventory())
+
+    response = client.get("/api/update-manager")
+    cached = client.get("/api/update-manager", headers={"If-None-Match": response.headers["ETag"]})
+    version = client.get("/api/update-manager/version")
+
+    assert response.status_code == 200
+    assert response.get_json()["version"] == 4
+    assert cached.status_code == 304
+    assert version.get_json() == {"version": 4}
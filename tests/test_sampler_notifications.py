@@ -6,6 +6,7 @@ import sampler
 def reset_notification_runtime():
     sampler.recent_notification_cooldowns.clear()
     sampler.recent_notification_dedupes.clear()
+    sampler.notification_expiry_heap.clear()
     sampler.previous_security_findings.clear()
 
 
@@ -43,6 +44,18 @@ def test_normalize_notification_settings_includes_advanced_defaults():
     assert settings["silence_end"] == "07:00"
     assert settings["dedupe_enabled"] is True
     assert settings["dedupe_window_seconds"] == 120
+    assert settings["digest_channels"] == []
+    assert settings["digest_window_seconds"] == 300
+
+
+def test_normalize_notification_settings_keeps_known_digest_channels_in_order():
+    settings = sampler.normalize_notification_settings({
+        "digest_channels": "webhook, Slack,unknown",
+        "digest_window_seconds": 2,
+    })
+
+    assert settings["digest_channels"] == ["slack", "webhook"]
+    assert settings["digest_window_seconds"] == 10
 
 
 def test_should_emit_notification_applies_project_and_container_rules():
@@ -105,6 +118,46 @@ def test_should_emit_notification_enforces_cooldown_and_deduplication():
     assert sampler.should_emit_notification({**event, "timestamp": 1070, "msg": "CPU recovered then high again"}, settings=settings) is True
 
 
+def test_notification_runtime_entries_expire_in_time_order():
+    reset_notification_runtime()
+    settings = sampler.normalize_notification_settings({
+        "cooldown_seconds": 60,
+        "dedupe_enabled": True,
+        "dedupe_window_seconds": 300,
+    })
+    event = {"type": "cpu", "cid": "web123", "container": "web", "msg": "CPU high"}
+
+    assert sampler.should_emit_notification({**event, "timestamp": 1000}, settings=settings) is True
+    assert len(sampler.recent_notification_cooldowns) == 1
+    assert len(sampler.recent_notification_dedupes) == 1
+
+    # Past the cooldown plus grace, but still inside the dedupe window.
+    assert sampler.should_emit_notification({**event, "cid": "db123", "timestamp": 1000 + 60 + 61}, settings=settings) is True
+    assert "cpu:web123:" not in sampler.recent_notification_cooldowns
+    assert "cpu:web123::CPU high" in sampler.recent_notification_dedupes
+
+    assert sampler.should_emit_notification({**event, "cid": "api123", "timestamp": 1000 + 300 + 61}, settings=settings) is True
+    assert "cpu:web123::CPU high" not in sampler.recent_notification_dedupes
+    assert "cpu:db123::CPU high" in sampler.recent_notification_dedupes
+
+
+def test_apply_notification_settings_recompiles_the_policy(temp_db):
+    reset_notification_runtime()
+    previous_settings = dict(sampler.notification_settings)
+    sampler.apply_notification_settings({
+        **previous_settings,
+        "container_rule_mode": "exclude",
+        "container_rules": "Worker-*",
+        "dedupe_enabled": False,
+    })
+    try:
+        assert sampler.notification_policy.container_regex.match("worker-7")
+        assert sampler.should_emit_notification({"type": "status", "container": "worker-7", "msg": "down", "timestamp": 5}) is False
+        assert sampler.should_emit_notification({"type": "status", "container": "web", "msg": "down", "timestamp": 5}) is True
+    finally:
+        sampler.apply_notification_settings(previous_settings)
+
+
 def test_should_emit_notification_respects_silence_window(monkeypatch):
     reset_notification_runtime()
     settings = sampler.normalize_notification_settings({
@@ -246,3 +299,71 @@ def test_resolve_auto_update_target_prefers_project_over_container_setting():
         "projects": {},
         "containers": {"cache": True},
     }) == ("container", "cache123", "cache")
+
+
+def test_update_checks_are_spread_by_image_and_steady_at_one_interval():
+    interval = sampler.UPDATE_CHECK_MIN_INTERVAL
+    phases = [sampler.update_check_phase(f"app-{index}:1", interval) for index in range(50)]
+
+    first_due = sampler.next_update_check_due("redis:7", 1_000_000.0)
+    second_due = sampler.next_update_check_due("redis:7", first_due)
+
+    assert all(0 <= phase < interval for phase in phases)
+    assert max(phases) - min(phases) > interval * 0.8
+    assert interval <= first_due - 1_000_000.0 < interval * 2
+    assert second_due - first_due == interval
+
+
+def test_update_check_due_time_never_undercuts_the_minimum_interval():
+    interval = sampler.UPDATE_CHECK_MIN_INTERVAL
+    for index in range(200):
+        last_check = 1_000_000.0 + index * 3607.3
+        due = sampler.next_update_check_due(f"app-{index % 17}:1", last_check)
+        assert due >= last_check + interval
+
+
+def test_update_check_sequence_only_moves_when_checks_change(temp_db, monkeypatch):
+    import update_manager
+
+    monkeypatch.setattr(sampler, "update_check_cache", {})
+    monkeypatch.setattr(sampler, "update_check_time", {})
+    monkeypatch.setattr(sampler, "update_check_details_cache", {})
+    monkeypatch.setattr(sampler, "update_check_sequence", 10)
+    dirty = []
+    monkeypatch.setattr(update_manager.update_inventory, "mark_dirty", lambda: dirty.append(True))
+
+    sampler.forget_update_checks([])
+    sampler.forget_update_checks(["cid-unknown"])
+    assert sampler.update_check_sequence == 10
+    assert dirty == []
+
+    sampler.record_update_check("cid-redis", False, details={"image_ref": "redis:7"}, checked_at=1.0)
+    assert sampler.update_check_sequence == 11
+    sampler.forget_update_checks(["cid-redis", "cid-unknown"])
+    assert sampler.update_check_sequence == 12
+    assert dirty == [True, True]
+
+
+def test_update_checks_persist_and_reload_after_restart(temp_db, monkeypatch):
+    monkeypatch.setattr(sampler, "update_check_cache", {})
+    monkeypatch.setattr(sampler, "update_check_time", {})
+    monkeypatch.setattr(sampler, "update_check_details_cache", {})
+    details = {"image_ref": "redis:7", "current_image_id": "sha256:old", "latest_token": "sha256:new"}
+
+    sampler.record_update_check("cid-redis", True, details=details, checked_at=1234.5)
+    monkeypatch.setattr(sampler, "update_check_cache", {})
+    monkeypatch.setattr(sampler, "update_check_time", {})
+    monkeypatch.setattr(sampler, "update_check_details_cache", {})
+
+    assert sampler.load_persisted_update_checks() == 1
+    assert sampler.update_check_cache == {"cid-redis": True}
+    assert sampler.update_check_time == {"cid-redis": 1234.5}
+    assert sampler.update_check_details_cache["cid-redis"]["latest_token"] == "sha256:new"
+
+    same_image = DummyContainer({"Image": "sha256:old", "Config": {"Image": "redis:7"}}, cid="cid-redis")
+    recreated = DummyContainer({"Image": "sha256:other", "Config": {"Image": "redis:7"}}, cid="cid-redis")
+    assert sampler.is_update_check_due(same_image, 1300.0) is False
+    assert sampler.is_update_check_due(recreated, 1300.0) is True
+
+    sampler.forget_update_checks(["cid-redis"])
+    assert sampler.load_persisted_update_checks() == 0
@@ -0,0 +1,129 @@
+import threading
+import time
+
+import update_jobs
+import users_db
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class BlockingRunner:
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = []
+        self.lock = threading.Lock()
+
+    def __call__(self, job):
+        with self.lock:
+            self.started.append(job["target_name"])
+        self.release.wait(5)
+        return {"ok": True, "message": "updated"}
+
+
+def test_executor_limits_concurrency_and_registry_fan_out(temp_db):
+    executor = update_jobs.UpdateJobExecutor(max_concurrent=2, per_registry_limit=1)
+    runner = BlockingRunner()
+
+    executor.submit("project", "a", "a", runner, registry="docker.io")
+    executor.submit("project", "b", "b", runner, registry="docker.io")
+    executor.submit("project", "c", "c", runner, registry="ghcr.io")
+    executor.submit("project", "d", "d", runner, registry="quay.io")
+
+    assert wait_until(lambda: executor.stats()["running"] == 2)
+    time.sleep(0.05)
+    assert sorted(runner.started) == ["a", "c"]
+    assert executor.submit("project", "a", "a", runner) is None
+
+    runner.release.set()
+    assert wait_until(lambda: executor.stats()["running"] == 0 and executor.stats()["queued"] == 0)
+    states = {job["target_name"]: job["state"] for job in users_db.list_update_jobs()}
+    assert states == {"a": "succeeded", "b": "succeeded", "c": "succeeded", "d": "succeeded"}
+
+
+def test_executor_starts_queued_jobs_in_priority_order(temp_db):
+    executor = update_jobs.UpdateJobExecutor(max_concurrent=1, per_registry_limit=1)
+    runner = BlockingRunner()
+
+    executor.submit("container", "first", "first", runner, registry="r")
+    assert wait_until(lambda: runner.started == ["first"])
+    executor.submit("project", "later", "later", runner, priority=update_jobs.PRIORITY_PROJECT, registry="r")
+    executor.submit("container", "sooner", "sooner", runner, priority=update_jobs.PRIORITY_CONTAINER, registry="r")
+    runner.release.set()
+
+    assert wait_until(lambda: len(runner.started) == 3)
+    assert runner.started == ["first", "sooner", "later"]
+
+
+def test_executor_restores_queued_jobs_and_marks_running_ones_interrupted(temp_db):
+    now = time.time()
+    base = {"target_type": "container", "registry": "docker.io", "priority": 50, "source": "auto",
+            "message": None, "history_entry_id": None, "started_at": None, "finished_at": None}
+    users_db.save_update_job({**base, "id": "job-queued", "target_id": "q", "target_name": "q", "state": "queued", "created_at": now})
+    users_db.save_update_job({**base, "id": "job-running", "target_id": "r", "target_name": "r", "state": "running", "created_at": now})
+    users_db.save_update_job({**base, "id": "job-manual", "target_id": "m", "target_name": "m", "state": "queued",
+                              "created_at": now + 1, "source": "manual", "actor_username": "alice",
+                              "actor_role": "admin", "remote_addr": "10.0.0.5"})
+    users_db.save_update_job({**base, "id": "job-other", "target_id": "o", "target_name": "o", "state": "queued",
+                              "created_at": now + 2, "source": "plugin"})
+    ran = []
+
+    executor = update_jobs.UpdateJobExecutor(max_concurrent=1)
+    executor.register_runner("auto", lambda job: ran.append(("auto", job["id"])) or {"ok": False, "message": "boom"})
+    executor.register_runner("manual", lambda job: ran.append(("manual", job["id"], job["actor_username"])) or {"ok": True})
+    restored = executor.restore()
+
+    assert restored == 2
+    assert wait_until(lambda: len(ran) == 2 and executor.stats()["running"] == 0)
+    assert ran == [("auto", "job-queued"), ("manual", "job-manual", "alice")]
+    assert wait_until(lambda: {job["id"]: job["state"] for job in users_db.list_update_jobs()} == {
+        "job-queued": "failed",
+        "job-running": "interrupted",
+        "job-manual": "succeeded",
+        "job-other": "interrupted",
+    })
+    assert users_db.get_update_job("job-manual")["remote_addr"] == "10.0.0.5"
+
+
+def test_executor_attaches_progress_to_running_jobs_and_throttles_wakeups(temp_db):
+    executor = update_jobs.UpdateJobExecutor(max_concurrent=1, per_registry_limit=1)
+    runner = BlockingRunner()
+    job = executor.submit("container", "cache", "cache", runner, registry="docker.io")
+    assert wait_until(lambda: executor.get_job(job["id"])["state"] == "running")
+
+    sequence = executor.stats()["sequence"]
+    executor.report_progress(job["id"], {"percent": 10.0})
+    executor.report_progress(job["id"], {"percent": 20.0})
+    assert executor.get_job(job["id"])["progress"] == {"percent": 20.0}
+    assert executor.stats()["sequence"] == sequence + 1
+    executor.report_progress(job["id"], {"percent": 100.0, "final": True})
+    assert executor.stats()["sequence"] == sequence + 2
+
+    runner.release.set()
+    assert wait_until(lambda: executor.get_job(job["id"])["state"] == "succeeded")
+    assert "progress" not in executor.get_job(job["id"])
+
+
+def test_executor_persists_job_states_in_order(temp_db, monkeypatch):
+    written = []
+    persist = update_jobs._persist
+
+    def slow_persist(job):
+        if job["state"] == "queued":
+            time.sleep(0.05)
+        written.append(job["state"])
+        persist(job)
+
+    monkeypatch.setattr(update_jobs, "_persist", slow_persist)
+    executor = update_jobs.UpdateJobExecutor(max_concurrent=1)
+    job = executor.submit("container", "web", "web", lambda job: {"ok": True}, registry="docker.io")
+
+    assert wait_until(lambda: len(written) == 3)
+    assert written == ["queued", "running", "succeeded"]
+    assert users_db.get_update_job(job["id"])["state"] == "succeeded"
@@ -1,6 +1,9 @@
+import sys
+import threading
 from types import SimpleNamespace
 
 import sampler
+import update_jobs
 import update_manager
 import users_db
 
@@ -251,7 +254,7 @@ def test_list_update_targets_reuses_candidate_inventory_for_auto_updates(temp_db
     monkeypatch.setattr(update_manager, '_build_candidate_collections', fake_build)
     monkeypatch.setattr(update_manager, 'get_auto_update_settings', lambda: {'containers': {}, 'projects': {}})
     monkeypatch.setattr(update_manager, 'list_latest_successful_update_timestamps', lambda: {})
-    monkeypatch.setattr(update_manager, 'list_update_history', lambda limit=100: [])
+    monkeypatch.setattr(update_manager, 'list_update_history_with_rollback_state', lambda limit=100: [])
 
     payload = update_manager.list_update_targets(history_limit=5)
 
@@ -261,6 +264,66 @@ def test_list_update_targets_reuses_candidate_inventory_for_auto_updates(temp_db
     assert [item['name'] for item in payload['auto_updates']] == ['demo', 'cache', 'monitor']
 
 
+def test_assemble_update_payload_strips_rolled_back_from_every_history_entry(temp_db, monkeypatch):
+    update_id = users_db.record_update_history(
+        action='update', target_type='container', target_id='web', target_name='web',
+        metadata={'rollback_ready': True},
+    )
+    failed_id = users_db.record_update_history(
+        action='update', target_type='container', target_id='db', target_name='db', result='failed',
+    )
+    rollback_id = users_db.record_update_history(
+        action='rollback', target_type='container', target_id='web', target_name='web', rollback_of=update_id,
+    )
+    monkeypatch.setattr(update_manager, 'get_auto_update_settings', lambda: {'containers': {}, 'projects': {}})
+
+    payload = update_manager._assemble_update_payload([], [], history_limit=10)
+
+    history = {entry['id']: entry for entry in payload['history']}
+    assert set(history) == {update_id, failed_id, rollback_id}
+    assert all('rolled_back' not in entry for entry in history.values())
+    assert history[update_id]['can_rollback'] is False
+
+
+def test_rollback_image_targets_groups_rollbackable_updates_and_finds_the_latest(temp_db):
+    older_web_id = users_db.record_update_history(
+        action='update', target_type='container', target_id='web', target_name='web',
+        metadata={'rollback_ready': True, 'previous_image_id': 'sha256:web-older'},
+    )
+    web_id = users_db.record_update_history(
+        action='update', target_type='container', target_id='web', target_name='web',
+        metadata={'rollback_ready': True, 'previous_image_id': 'sha256:web-old'},
+    )
+    shop_id = users_db.record_update_history(
+        action='update', target_type='project', target_id='shop', target_name='shop',
+        metadata={'rollback_ready': True, 'services': [
+            {'service': 'api', 'previous_image_id': 'sha256:api-old'},
+            {'service': 'worker', 'previous_image_id': None},
+        ]},
+    )
+    rolled_back_id = users_db.record_update_history(
+        action='update', target_type='container', target_id='db', target_name='db',
+        metadata={'rollback_ready': True, 'previous_image_id': 'sha256:db-old'},
+    )
+    users_db.record_update_history(
+        action='rollback', target_type='container', target_id='db', target_name='db', rollback_of=rolled_back_id,
+    )
+    users_db.record_update_history(
+        action='update', target_type='container', target_id='cache', target_name='cache', result='failure',
+        metadata={'rollback_ready': False, 'previous_image_id': 'sha256:cache-old'},
+    )
+
+    entries_by_image, latest = update_manager.rollback_image_targets()
+    assert entries_by_image == {'sha256:web-older': [older_web_id], 'sha256:web-old': [web_id], 'sha256:api-old': [shop_id]}
+    assert latest == {'sha256:web-old', 'sha256:api-old'}
+
+    assert users_db.disable_update_history_rollback([older_web_id], 'Rollback image was pruned.') == 1
+    entry = users_db.get_update_history_entry(older_web_id)
+    assert entry['metadata']['rollback_ready'] is False
+    assert entry['metadata']['rollback_unavailable_reason'] == 'Rollback image was pruned.'
+    assert update_manager.rollback_image_targets()[0].keys() == {'sha256:web-old', 'sha256:api-old'}
+
+
 def test_list_update_targets_marks_portainer_managed_projects_as_ready_for_external_safe_recreate(temp_db, monkeypatch):
     labels = {
         'com.docker.compose.project': 'portainer-demo',
@@ -398,6 +461,73 @@ def test_update_container_target_records_previous_version_and_history(temp_db, m
     assert result['history_entry']['new_version'] == 'redis:7 @ cache-new'
     assert result['history_entry']['metadata']['rollback_ready'] is True
     assert result['history_entry']['metadata']['image_ref'] == 'redis:7'
+    assert result['history_entry']['pull_seconds'] >= 0
+    assert result['history_entry']['downtime_seconds'] is None
+
+
+def test_update_container_target_pulls_before_recreate_and_records_durations(temp_db, monkeypatch):
+    container = FakeContainer('cid-cache', 'cache', 'redis:7', image_id='sha256:cache-old')
+    images = FakeImagesManager(get_map={'redis:7': FakeImage('sha256:cache-new', ['redis:7'])})
+    client = FakeDockerClient(FakeContainersManager(lookup_map={'cid-cache': container}), images)
+    recreate_calls = []
+
+    def fake_recreate(container_obj, target_image, **_kwargs):
+        recreate_calls.append((list(images.pulled), target_image))
+        return {
+            'ok': True,
+            'target_name': 'cache',
+            'previous_version': 'redis:7 @ cache-old',
+            'new_version': 'redis:7 @ cache-new',
+            'result': 'success',
+            'notes': None,
+            'metadata': {'strategy': 'safe_container_recreate'},
+            'downtime_seconds': 1.25,
+        }
+
+    monkeypatch.setattr(update_manager, 'get_docker_client', lambda: client)
+    monkeypatch.setattr(update_manager, '_container_version_info', lambda *_args: {
+        'image_ref': 'redis:7',
+        'current_token': 'cache-old',
+        'latest_token': 'cache-new',
+        'current_version': 'redis:7 @ cache-old',
+        'latest_version': 'redis:7 @ cache-new',
+        'current_image_id': 'sha256:cache-old',
+    })
+    monkeypatch.setattr(update_manager, '_recreate_single_container', fake_recreate)
+
+    result = update_manager.update_container_target('cid-cache', actor_username='admin')
+
+    assert recreate_calls == [(['redis:7'], 'sha256:cache-new')]
+    assert result['history_entry']['downtime_seconds'] == 1.25
+    assert result['history_entry']['pull_seconds'] is not None
+
+
+def test_recreate_single_container_leaves_container_running_when_image_is_not_local(temp_db, monkeypatch):
+    container = FakeContainer('cid-cache', 'cache', 'redis:7', image_id='sha256:cache-old')
+    stopped = []
+    container.stop = lambda **_kwargs: stopped.append(True)
+    client = FakeDockerClient(FakeContainersManager(lookup_map={'cid-cache': container}))
+
+    monkeypatch.setattr(update_manager, 'get_docker_client', lambda: client)
+    monkeypatch.setattr(update_manager, 'get_api_client', lambda: None)
+    monkeypatch.setattr(update_manager, '_container_version_info', lambda *_args: {
+        'image_ref': 'redis:7',
+        'current_version': 'redis:7 @ cache-old',
+        'current_image_id': 'sha256:cache-old',
+    })
+    monkeypatch.setattr(update_manager, '_build_snapshot', lambda _container: {
+        'name': 'cache',
+        'was_running': True,
+        'image_ref': 'redis:7',
+        'config': {},
+    })
+
+    result = update_manager._recreate_single_container(container, 'sha256:missing')
+
+    assert result['ok'] is False
+    assert result['downtime_seconds'] == 0.0
+    assert 'not available locally' in result['notes']
+    assert stopped == []
 
 
 def test_update_project_target_success_records_previous_images_for_rollback(temp_db, monkeypatch, tmp_path):
@@ -454,9 +584,9 @@ def test_update_project_target_success_records_previous_images_for_rollback(temp
         }
         return mapping[container.id]
 
-    def fake_run_compose(metadata, project_name, extra_args, override_file=None):
+    def fake_run_compose(metadata, project_name, extra_args, override_file=None, **_kwargs):
         compose_calls.append((project_name, tuple(extra_args), override_file))
-        return SimpleNamespace(returncode=0, stdout='compose ok\n', stderr='')
+        return SimpleNamespace(returncode=0, stdout='compose ok\n', stderr='', duration_seconds=1.5)
 
     monkeypatch.setattr(update_manager, 'get_docker_client', lambda: client)
     monkeypatch.setattr(update_manager, '_container_version_info', fake_version_info)
@@ -469,6 +599,7 @@ def test_update_project_target_success_records_previous_images_for_rollback(temp
     assert compose_calls[0][1][0] == 'pull'
     assert compose_calls[1][1][:2] == ('up', '-d')
     assert result['history_entry']['result'] == 'success'
+    assert result['history_entry']['metadata']['phase_timings'] == {'pull': 1.5, 'up': 1.5}
     assert result['history_entry']['metadata']['rollback_ready'] is True
     assert {service['service'] for service in result['history_entry']['metadata']['services']} == {'db', 'web'}
     assert 'db=postgres:16 @ db-old' in result['history_entry']['previous_version']
@@ -500,13 +631,13 @@ def test_update_project_target_records_failure_on_compose_up_error(temp_db, monk
     monkeypatch.setattr(update_manager, '_tag_for_rollback', lambda *_args: 'rollback/demo-db:history-1')
     monkeypatch.setattr(update_manager, '_write_override_file', lambda *_args: str(tmp_path / 'rollback.override.yml'))
 
-    def fake_run_compose(metadata, project_name, extra_args, override_file=None):
+    def fake_run_compose(metadata, project_name, extra_args, override_file=None, **_kwargs):
         compose_calls.append((project_name, tuple(extra_args), override_file))
         if extra_args[0] == 'pull':
-            return SimpleNamespace(returncode=0, stdout='pulled\n', stderr='')
+            return SimpleNamespace(returncode=0, stdout='pulled\n', stderr='', duration_seconds=2.0)
         if override_file:
-            return SimpleNamespace(returncode=0, stdout='rollback ok\n', stderr='')
-        return SimpleNamespace(returncode=1, stdout='', stderr='compose up failed')
+            return SimpleNamespace(returncode=0, stdout='rollback ok\n', stderr='', duration_seconds=1.0)
+        return SimpleNamespace(returncode=1, stdout='', stderr='compose up failed', duration_seconds=0.5)
 
     monkeypatch.setattr(update_manager, '_run_compose', fake_run_compose)
 
@@ -521,6 +652,43 @@ def test_update_project_target_records_failure_on_compose_up_error(temp_db, monk
     assert 'Automatic rollback attempt' in result['history_entry']['notes']
 
 
+def test_update_project_target_skips_compose_pull_for_batch_prepulled_images(temp_db, monkeypatch, tmp_path):
+    compose_file = tmp_path / 'docker-compose.yml'
+    compose_file.write_text('services: {}\n', encoding='utf-8')
+    labels = {
+        'com.docker.compose.project': 'demo',
+        'com.docker.compose.project.working_dir': str(tmp_path),
+        'com.docker.compose.project.config_files': 'docker-compose.yml',
+        'com.docker.compose.service': 'db',
+    }
+    db_old = FakeContainer('cid-db-old', 'demo-db-1', 'postgres:16', labels=labels, image_id='sha256:db-old')
+    db_new = FakeContainer('cid-db-new', 'demo-db-1', 'postgres:16', labels=labels, image_id='sha256:db-new')
+    client = FakeDockerClient(FakeContainersManager(list_sequences=[[db_old], [db_new]]))
+    compose_calls = []
+
+    monkeypatch.setattr(update_manager, 'get_docker_client', lambda: client)
+    monkeypatch.setattr(update_manager, '_container_version_info', lambda container, _client: {
+        'image_ref': 'postgres:16',
+        'current_token': 'db-old',
+        'latest_token': 'db-new',
+        'current_version': 'postgres:16 @ db-old',
+        'latest_version': 'postgres:16 @ db-new',
+        'current_image_id': container.image.id,
+    })
+    monkeypatch.setattr(update_manager, '_run_compose', lambda metadata, project_name, extra_args, **_kwargs: (
+        compose_calls.append(tuple(extra_args)) or SimpleNamespace(returncode=0, stdout='up ok\n', stderr='', duration_seconds=3.0)
+    ))
+    monkeypatch.setattr(sampler, 'update_check_cache', {'cid-db-old': True})
+    pulled_images = {'postgres:16': ('sha256:db-new', 4.0)}
+
+    result = update_manager.update_project_target('demo', actor_username='admin', pulled_images=pulled_images)
+
+    assert result['ok'] is True
+    assert [call[0] for call in compose_calls] == ['up']
+    assert result['history_entry']['pull_seconds'] == 4.0
+    assert pulled_images == {'postgres:16': ('sha256:db-new', 0.0)}
+
+
 def test_update_project_target_uses_external_safe_recreate_when_compose_files_are_missing(temp_db, monkeypatch):
     labels = {
         'com.docker.compose.project': 'portainer-demo',
@@ -696,7 +864,7 @@ def test_rollback_update_for_project_uses_recorded_previous_images(temp_db, monk
     monkeypatch.setattr(update_manager, 'get_docker_client', lambda: client)
     monkeypatch.setattr(update_manager, '_tag_for_rollback', lambda _client, image_id, project_name, service_name, _history_id: rollback_tags.append((project_name, service_name, image_id)) or f'rollback/{project_name}-{service_name}:tag')
     monkeypatch.setattr(update_manager, '_write_override_file', lambda *_args: str(tmp_path / 'rollback.override.yml'))
-    monkeypatch.setattr(update_manager, '_run_compose', lambda metadata, project_name, extra_args, override_file=None: compose_calls.append((project_name, tuple(extra_args), override_file)) or SimpleNamespace(returncode=0, stdout='rollback ok\n', stderr=''))
+    monkeypatch.setattr(update_manager, '_run_compose', lambda metadata, project_name, extra_args, override_file=None: compose_calls.append((project_name, tuple(extra_args), override_file)) or SimpleNamespace(returncode=0, stdout='rollback ok\n', stderr='', duration_seconds=1.0))
 
     result = update_manager.rollback_update(history_id, actor_username='admin')
 
@@ -705,3 +873,208 @@ def test_rollback_update_for_project_uses_recorded_previous_images(temp_db, monk
     assert compose_calls[0][0] == 'demo'
     assert compose_calls[0][1][:2] == ('up', '-d')
     assert result['history_entry']['action'] == 'rollback'
+
+
+def test_pull_progress_aggregates_layer_bytes_and_throughput():
+    now = [0.0]
+    progress = update_manager.PullProgress('redis:7', clock=lambda: now[0])
+    progress.feed({'status': 'Pulling from library/redis', 'id': '7'})
+    progress.feed({'status': 'Pulling fs layer', 'id': 'a'})
+    progress.feed({'status': 'Already exists', 'id': 'b'})
+    progress.feed({'status': 'Downloading', 'id': 'a', 'progressDetail': {'current': 0, 'total': 4000}})
+    now[0] = 2.0
+    progress.feed({'status': 'Downloading', 'id': 'a', 'progressDetail': {'current': 2000, 'total': 4000}})
+    progress.feed({'status': 'Extracting', 'id': 'a', 'progressDetail': {'current': 4000, 'total': 4000}})
+
+    snapshot = progress.snapshot()
+    assert snapshot['layers_total'] == 2
+    assert snapshot['layers_done'] == 1
+    assert snapshot['bytes_done'] == 2000
+    assert snapshot['bytes_total'] == 4000
+    assert snapshot['percent'] == 50.0
+    assert snapshot['bytes_per_second'] == 1000.0
+
+    progress.feed({'status': 'Pull complete', 'id': 'a'})
+    assert progress.snapshot(final=True)['percent'] == 100.0
+
+
+def test_prepull_image_streams_progress_and_surfaces_daemon_errors():
+    events = [
+        {'status': 'Downloading', 'id': 'a', 'progressDetail': {'current': 10, 'total': 20}},
+        {'status': 'Pull complete', 'id': 'a'},
+    ]
+    client = SimpleNamespace(
+        api=SimpleNamespace(pull=lambda image_ref, stream, decode: iter(events)),
+        images=FakeImagesManager(get_map={'redis:7': FakeImage('sha256:new')}),
+    )
+    snapshots = []
+
+    image_id, pull_seconds = update_manager._prepull_image(client, 'redis:7', 'sha256:old', progress=snapshots.append)
+
+    assert image_id == 'sha256:new'
+    assert pull_seconds >= 0
+    assert [snapshot['bytes_done'] for snapshot in snapshots] == [10, 20, 20]
+    assert snapshots[-1]['final'] is True
+
+    events[:] = [{'error': 'manifest unknown'}]
+    try:
+        update_manager._prepull_image(client, 'redis:7', 'sha256:old', progress=snapshots.append)
+    except RuntimeError as exc:
+        assert 'manifest unknown' in str(exc)
+    else:
+        raise AssertionError('daemon pull errors must be raised')
+
+
+def test_plan_update_batch_groups_targets_that_share_images(temp_db, monkeypatch):
+    project_labels = {'com.docker.compose.project': 'shop', 'com.docker.compose.service': 'cache'}
+    shop_cache = FakeContainer('cid-shop-cache', 'shop-cache-1', 'redis:7', labels=project_labels)
+    shop_web = FakeContainer('cid-shop-web', 'shop-web-1', 'nginx:1.25', labels={**project_labels, 'com.docker.compose.service': 'web'})
+    cache = FakeContainer('cid-cache', 'cache', 'redis:7')
+    worker = FakeContainer('cid-worker', 'worker', 'python:3.12')
+    client = FakeDockerClient(FakeContainersManager(
+        list_sequences=[[shop_cache, shop_web, cache, worker]],
+        lookup_map={'cid-cache': cache, 'cid-worker': worker},
+    ))
+    monkeypatch.setattr(sampler, 'update_check_cache', {'cid-shop-cache': True, 'cid-shop-web': True})
+
+    groups = update_manager.plan_update_batch(
+        [('project', 'shop'), ('container', 'cid-cache'), ('container', 'cid-worker'), ('container', 'cid-cache')],
+        client,
+    )
+
+    assert groups == [
+        {'targets': [('project', 'shop'), ('container', 'cid-cache')], 'image_refs': ['nginx:1.25', 'redis:7']},
+        {'targets': [('container', 'cid-worker')], 'image_refs': ['python:3.12']},
+    ]
+
+
+def test_run_update_batch_pulls_shared_images_once(temp_db, monkeypatch):
+    cache_a = FakeContainer('cid-a', 'cache-a', 'redis:7')
+    cache_b = FakeContainer('cid-b', 'cache-b', 'redis:7')
+    worker = FakeContainer('cid-worker', 'worker', 'python:3.12')
+    images = FakeImagesManager(get_map={
+        'redis:7': FakeImage('sha256:redis-new'),
+        'python:3.12': FakeImage('sha256:python-new'),
+    })
+    client = FakeDockerClient(
+        FakeContainersManager(lookup_map={'cid-a': cache_a, 'cid-b': cache_b, 'cid-worker': worker}),
+        images,
+    )
+    calls = []
+
+    def fake_update_target(target_type, target_id, actor_username=None, pulled_images=None):
+        image_ref = client.containers.get(target_id).attrs['Config']['Image']
+        calls.append((target_id, update_manager._prepull_image(client, image_ref, 'sha256:old', pulled_images=pulled_images)[0]))
+        return {'ok': True, 'message': f'{target_id} updated', 'history_entry': None}
+
+    monkeypatch.setattr(update_manager, 'get_docker_client', lambda: client)
+    monkeypatch.setattr(update_manager, 'update_target', fake_update_target)
+    reported = []
+
+    results = update_manager.run_update_batch(
+        [('container', 'cid-a'), ('container', 'cid-worker'), ('container', 'cid-b')],
+        actor_username='admin',
+        max_parallel=2,
+        on_result=lambda target_type, target_id, result: reported.append(target_id),
+    )
+
+    assert sorted(images.pulled) == ['python:3.12', 'redis:7']
+    assert sorted(calls) == [('cid-a', 'sha256:redis-new'), ('cid-b', 'sha256:redis-new'), ('cid-worker', 'sha256:python-new')]
+    assert reported.index('cid-a') < reported.index('cid-b')
+    assert all(result['ok'] for result in results)
+
+
+def test_run_update_batch_skips_targets_held_by_executor_jobs(temp_db, monkeypatch):
+    cache_a = FakeContainer('cid-a', 'cache-a', 'redis:7')
+    cache_b = FakeContainer('cid-b', 'cache-b', 'redis:7')
+    images = FakeImagesManager(get_map={'redis:7': FakeImage('sha256:redis-new')})
+    client = FakeDockerClient(FakeContainersManager(lookup_map={'cid-a': cache_a, 'cid-b': cache_b}), images)
+    executor = update_jobs.UpdateJobExecutor(max_concurrent=1)
+    release = threading.Event()
+    updated = []
+
+    monkeypatch.setattr(update_manager, 'get_docker_client', lambda: client)
+    monkeypatch.setattr(update_manager, 'job_executor', executor)
+    monkeypatch.setattr(update_manager, 'update_target', lambda target_type, target_id, **_kwargs: (
+        updated.append(target_id) or {'ok': True, 'message': 'updated', 'history_entry': None}
+    ))
+    executor.submit('container', 'cid-b', 'cache-b', lambda job: release.wait(5) and {'ok': True})
+
+    try:
+        results = update_manager.run_update_batch([('container', 'cid-a'), ('container', 'cid-b')])
+        resubmitted = executor.submit('container', 'cid-a', 'cache-a', lambda job: {'ok': True})
+    finally:
+        release.set()
+
+    by_target = {result['target_id']: result for result in results}
+    assert updated == ['cid-a']
+    assert by_target['cid-b']['ok'] is False
+    assert 'already queued or running' in by_target['cid-b']['message']
+    assert resubmitted is not None
+
+
+def test_update_inventory_serves_cached_candidates_and_tracks_versions(temp_db, monkeypatch):
+    collect_calls = []
+    candidates = [([], [{'id': 'container:cid-cache', 'name': 'cache', 'update_available': True, 'update_state': 'ready'}])]
+
+    def fake_collect(force_refresh=False):
+        collect_calls.append(force_refresh)
+        return candidates[0]
+
+    monkeypatch.setattr(update_manager, '_collect_update_candidates', fake_collect)
+    monkeypatch.setattr(update_manager, '_attach_auto_update_metadata', lambda item, *_args: item)
+    monkeypatch.setattr(sampler, 'update_check_sequence', 5)
+    inventory = update_manager.UpdateInventory(debounce_seconds=0)
+    dirty = []
+    monkeypatch.setattr(inventory, 'mark_dirty', lambda: dirty.append(True))
+
+    first = inventory.payload(history_limit=5)
+    second = inventory.payload(history_limit=5)
+
+    assert collect_calls == [False]
+    assert [item['name'] for item in first['containers']] == ['cache']
+    assert first['version'] == second['version'] == 1
+
+    users_db.record_update_history(
+        action='update', target_type='container', target_id='cid-cache', target_name='cache', result='success',
+    )
+    assert inventory.version() == 2
+
+    monkeypatch.setattr(sampler, 'update_check_sequence', 6)
+    assert inventory.payload(history_limit=5)['version'] == 3
+    assert dirty == [True]
+
+    inventory.rebuild()
+    assert inventory.version() == 3
+    candidates[0] = ([], [])
+    inventory.rebuild()
+    assert inventory.version() == 4
+
+
+def test_run_compose_streams_lines_and_keeps_output(monkeypatch, tmp_path):
+    script = 'import sys; print("Pulling web"); print("warning", file=sys.stderr); print("Pulled")'
+    monkeypatch.setattr(update_manager, '_compose_command', lambda *_args, **_kwargs: [sys.executable, '-c', script])
+    lines = []
+
+    result = update_manager._run_compose(
+        {'working_dir': str(tmp_path)}, 'demo', ['pull'], on_line=lambda stream, line: lines.append((stream, line)),
+    )
+
+    assert result.returncode == 0
+    assert result.timed_out is False
+    assert result.stdout == 'Pulling web\nPulled\n'
+    assert result.stderr == 'warning\n'
+    assert sorted(lines) == [('stderr', 'warning'), ('stdout', 'Pulled'), ('stdout', 'Pulling web')]
+
+
+def test_run_compose_terminates_the_process_on_timeout(monkeypatch, tmp_path):
+    script = 'import time; print("starting", flush=True); time.sleep(30)'
+    monkeypatch.setattr(update_manager, '_compose_command', lambda *_args, **_kwargs: [sys.executable, '-c', script])
+
+    result = update_manager._run_compose({'working_dir': str(tmp_path)}, 'demo', ['up', '-d'], timeout=0.5)
+
+    assert result.timed_out is True
+    assert result.returncode != 0
+    assert result.duration_seconds < 10
+    assert result.stdout == 'starting\n'
+    assert 'timed out after 0.5s' in result.stderr
@@ -1,5 +1,9 @@
+import json
+import threading
 import time
 
+import pytest
+
 import users_db
 
 
@@ -135,3 +139,318 @@ def test_update_history_auto_cleanup_removes_entries_older_than_retention(temp_d
     assert [row["id"] for row in rows] == [fresh_entry_id]
     assert users_db.get_update_history_entry(stale_entry_id) is None
     assert users_db.get_update_history_entry(fresh_entry_id)["target_name"] == "fresh"
+
+
+def test_validate_user_cached_skips_hashing_until_password_changes(temp_db, monkeypatch):
+    calls = []
+    real_check = users_db.check_password_hash
+
+    def counting_check(password_hash, password):
+        calls.append(password)
+        return real_check(password_hash, password)
+
+    monkeypatch.setattr(users_db, "check_password_hash", counting_check)
+
+    assert users_db.validate_user_cached("admin", "adminpass") is True
+    assert users_db.validate_user_cached("admin", "adminpass") is True
+    assert users_db.validate_user_cached("admin", "wrong") is False
+    assert users_db.validate_user_cached("admin", "wrong") is False
+    assert calls == ["adminpass", "wrong", "wrong"]
+
+    users_db.change_password("admin", "rotated-pass")
+
+    assert users_db.validate_user_cached("admin", "adminpass") is False
+    assert users_db.validate_user_cached("admin", "rotated-pass") is True
+
+
+def test_validate_user_cached_drops_a_check_that_raced_with_change_password(temp_db, monkeypatch):
+    real_validate = users_db.validate_user
+
+    def validate_then_rotate(username, password):
+        # The old password verifies, then the password changes before the result is cached.
+        valid = real_validate(username, password)
+        users_db.change_password(username, "rotated-pass")
+        return valid
+
+    with monkeypatch.context() as patched:
+        patched.setattr(users_db, "validate_user", validate_then_rotate)
+        assert users_db.validate_user_cached("admin", "adminpass") is True
+
+    assert users_db.validate_user_cached("admin", "adminpass") is False
+    assert users_db.validate_user_cached("admin", "rotated-pass") is True
+
+
+def test_validate_user_cached_is_invalidated_by_delete_and_expiry(temp_db):
+    users_db.create_user_with_columns("alice", "alice-pass", ["cpu"])
+
+    assert users_db.validate_user_cached("alice", "alice-pass") is True
+    users_db.delete_user("alice")
+    assert users_db.validate_user_cached("alice", "alice-pass") is False
+
+    users_db.create_user_with_columns("bob", "bob-pass", ["cpu"])
+    assert users_db.validate_user_cached("bob", "bob-pass", ttl_seconds=0.01) is True
+    time.sleep(0.02)
+    conn = users_db.get_db()
+    conn.execute("DELETE FROM users WHERE username='bob'")
+    conn.commit()
+    conn.close()
+    assert users_db.validate_user_cached("bob", "bob-pass", ttl_seconds=0.01) is False
+
+
+def test_get_db_reuses_one_wal_connection_per_thread(temp_db):
+    first = users_db.get_db()
+    first.close()
+    second = users_db.get_db()
+
+    assert second is first
+    assert second.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    second.execute("INSERT INTO global_settings (key, value) VALUES ('pending', '1')")
+    second.close()
+    assert users_db.get_global_setting("pending") is None
+
+    other = []
+    worker = threading.Thread(target=lambda: other.append(users_db.get_db()))
+    worker.start()
+    worker.join()
+    assert other[0] is not first
+
+    users_db.close_db_connections()
+    reopened = users_db.get_db()
+    assert reopened is not first
+    assert users_db.count_users() == 1
+
+
+def test_nested_get_db_keeps_the_outer_callers_pending_writes(temp_db):
+    outer = users_db.get_db()
+    outer.execute("INSERT INTO global_settings (key, value) VALUES ('outer', '1')")
+
+    assert users_db.count_users() == 1
+    assert outer.in_transaction
+    outer.commit()
+    outer.close()
+    assert users_db.get_global_setting("outer") == 1
+
+    outer = users_db.get_db()
+    outer.execute("INSERT INTO global_settings (key, value) VALUES ('dropped', '1')")
+    users_db.count_users()
+    outer.close()
+    assert users_db.get_global_setting("dropped") is None
+
+
+def test_helper_that_raises_still_hands_back_the_pooled_connection(temp_db, monkeypatch):
+    users_db.record_update_history(action="update", target_type="container", target_id="web", target_name="web")
+
+    def broken_row(row, include_snapshot=False):
+        raise RuntimeError("bad row")
+
+    monkeypatch.setattr(users_db, "_update_history_entry_from_row", broken_row)
+    with pytest.raises(RuntimeError):
+        users_db.list_update_history(limit=5)
+    with pytest.raises(RuntimeError):
+        with users_db.db_connection() as conn:
+            conn.execute("INSERT INTO global_settings (key, value) VALUES ('half-written', '1')")
+            raise RuntimeError("interrupted write")
+
+    conn = users_db.get_db()
+    try:
+        assert conn.users == 1
+        assert not conn.in_transaction
+    finally:
+        conn.close()
+    assert users_db.get_global_setting("half-written") is None
+
+
+def test_concurrent_writers_do_not_hit_database_locked(temp_db):
+    errors = []
+
+    def write_events(worker_id):
+        try:
+            for index in range(25):
+                users_db.record_audit_event("bench.write", "test", "success", target_id=f"{worker_id}-{index}")
+                users_db.set_global_setting(f"worker-{worker_id}", str(index))
+        except Exception as exc:
+            errors.append(exc)
+
+    workers = [threading.Thread(target=write_events, args=(worker_id,)) for worker_id in range(8)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert errors == []
+    assert len(users_db.list_audit_events(limit=500)) == 200
+
+
+def test_user_profile_lookups_are_cached_until_the_user_changes(temp_db, monkeypatch):
+    users_db.create_user_with_columns("carol", "carol-pass", ["cpu"])
+    assert users_db.get_user_role("carol") == "user"
+
+    def no_db():
+        raise AssertionError("profile lookup should be served from cache")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(users_db, "get_db", no_db)
+        assert users_db.get_user_role("carol") == "user"
+        assert users_db.get_user_columns("carol") == ["cpu"]
+        assert users_db.user_exists("carol") is True
+
+    users_db.update_user_columns("carol", ["cpu", "ram"])
+    assert users_db.get_user_columns("carol") == ["cpu", "ram"]
+
+    users_db.delete_user("carol")
+    assert users_db.user_exists("carol") is False
+    assert users_db.get_user_columns("carol") == []
+
+
+def test_user_profile_cache_does_not_grow_for_unknown_usernames(temp_db):
+    users_db.invalidate_user_profile_cache()
+    for index in range(50):
+        assert users_db.user_exists(f"probe-{index}") is False
+
+    assert users_db._user_profile_cache == {}
+    users_db.create_user_with_columns("probe-1", "probe-pass", [])
+    assert users_db.user_exists("probe-1") is True
+
+
+def test_enqueued_audit_events_are_batched_and_flushed(temp_db, monkeypatch):
+    monkeypatch.setattr(users_db, "AUDIT_FLUSH_INTERVAL_SECONDS", 60)
+    users_db.flush_audit_events()
+
+    for index in range(5):
+        users_db.enqueue_audit_event("container.stop", "container", "success", actor_username="admin", target_id=f"c{index}")
+
+    assert users_db.audit_queue_depth() == 5
+    assert users_db.flush_audit_events() == 5
+    assert users_db.audit_queue_depth() == 0
+    assert [event["target_id"] for event in users_db.list_audit_events(limit=5)] == ["c4", "c3", "c2", "c1", "c0"]
+
+
+def test_audit_events_can_be_filtered_and_paginated(temp_db):
+    for index in range(6):
+        users_db.enqueue_audit_event(
+            "user.create" if index % 2 else "login",
+            "user",
+            "success",
+            actor_username="admin" if index < 4 else "alice",
+            target_id=str(index),
+        )
+
+    first_page = users_db.list_audit_events(limit=2, actor="admin")
+    second_page = users_db.list_audit_events(limit=2, actor="admin", before_id=first_page[-1]["id"])
+    creates = users_db.list_audit_events(action="user.create")
+    future = users_db.list_audit_events(since=time.time() + 60)
+
+    assert [event["target_id"] for event in first_page] == ["3", "2"]
+    assert [event["target_id"] for event in second_page] == ["1", "0"]
+    assert [event["target_id"] for event in creates] == ["5", "3", "1"]
+    assert future == []
+
+
+def test_update_history_reads_hide_expired_rows_until_maintenance_purges_them(temp_db):
+    entry_id = users_db.record_update_history(
+        action="update", target_type="container", target_id="old", target_name="old", actor_username="admin"
+    )
+    conn = users_db.get_db()
+    conn.execute(
+        "UPDATE update_history SET created_at=? WHERE id=?",
+        (time.time() - users_db.UPDATE_HISTORY_RETENTION_SECONDS - 60, entry_id),
+    )
+    conn.commit()
+    conn.close()
+
+    assert users_db.list_update_history(limit=5) == []
+    assert users_db.list_latest_successful_update_timestamps() == {}
+    conn = users_db.get_db()
+    assert conn.execute("SELECT COUNT(*) FROM update_history").fetchone()[0] == 1
+    conn.close()
+
+    assert users_db.purge_expired_update_history() == 1
+
+
+def test_update_history_view_query_flags_rolled_back_entries(temp_db):
+    update_id = users_db.record_update_history(
+        action="update", target_type="container", target_id="web", target_name="web", metadata={"rollback_ready": True}
+    )
+    other_id = users_db.record_update_history(
+        action="update", target_type="container", target_id="db", target_name="db"
+    )
+    users_db.record_update_history(
+        action="rollback", target_type="container", target_id="web", target_name="web", rollback_of=update_id
+    )
+
+    entries = {entry["id"]: entry for entry in users_db.list_update_history_with_rollback_state(limit=10)}
+
+    assert entries[update_id]["rolled_back"] is True
+    assert entries[other_id]["rolled_back"] is False
+
+    conn = users_db.get_db()
+    plan = " ".join(
+        str(row[3]) for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT MAX(created_at) FROM update_history "
+            "WHERE target_type='container' AND target_name='web' AND action='update' AND result='success'"
+        )
+    )
+    conn.close()
+    assert "idx_update_history_target" in plan
+
+
+def test_update_history_keeps_snapshot_compressed_and_out_of_list_reads(temp_db):
+    snapshot = {"name": "cache", "config": {"env": [f"VAR_{index}=value" for index in range(200)]}}
+    entry_id = users_db.record_update_history(
+        action="update", target_type="container", target_id="cid", target_name="cache", actor_username="admin",
+        metadata={"rollback_ready": True, "previous_image_id": "sha256:old", "snapshot": snapshot},
+    )
+
+    conn = users_db.get_db()
+    row = conn.execute("SELECT metadata, snapshot FROM update_history WHERE id=?", (entry_id,)).fetchone()
+    conn.close()
+    listed = users_db.list_update_history_with_rollback_state(limit=5)[0]
+    entry = users_db.get_update_history_entry(entry_id)
+
+    assert "snapshot" not in row["metadata"]
+    assert len(row["snapshot"]) < len(json.dumps(snapshot)) // 4
+    assert "snapshot" not in listed["metadata"]
+    assert listed["metadata"]["rollback_ready"] is True
+    assert entry["metadata"]["snapshot"] == snapshot
+
+
+def test_update_history_migration_moves_inline_snapshots_to_the_compressed_column(temp_db):
+    entry_id = users_db.record_update_history(
+        action="update", target_type="container", target_id="cid", target_name="cache", actor_username="admin",
+    )
+    conn = users_db.get_db()
+    conn.execute(
+        "UPDATE update_history SET metadata=?, snapshot=NULL WHERE id=?",
+        (json.dumps({"rollback_ready": True, "snapshot": {"name": "cache"}}), entry_id),
+    )
+    conn.commit()
+    conn.close()
+
+    users_db.migrate_add_columns_and_role_and_settings()
+
+    assert "snapshot" not in users_db.list_update_history(limit=5)[0]["metadata"]
+    assert users_db.get_update_history_entry(entry_id)["metadata"]["snapshot"] == {"name": "cache"}
+
+
+def test_notification_records_are_batched_filtered_paged_and_trimmed(temp_db):
+    for seq in range(1, 8):
+        users_db.enqueue_notification_record({
+            "type": "cpu" if seq % 2 else "status",
+            "project": "shop" if seq <= 4 else "blog",
+            "container": f"web-{seq}",
+            "msg": f"event {seq}",
+            "timestamp": 1000.0 + seq,
+        })
+
+    first_page = users_db.list_notification_records(limit=3)
+    assert [event["seq"] for event in first_page] == [7, 6, 5]
+    assert first_page[0]["msg"] == "event 7"
+    second_page = users_db.list_notification_records(limit=3, before_seq=first_page[-1]["seq"])
+    assert [event["seq"] for event in second_page] == [4, 3, 2]
+
+    assert [event["seq"] for event in users_db.list_notification_records(event_type="CPU", project="shop")] == [3, 1]
+    assert [event["seq"] for event in users_db.list_notification_records(since=1005.0)] == [7, 6]
+
+    assert users_db.trim_notification_records(keep=2) == 5
+    assert [event["seq"] for event in users_db.load_recent_notification_records(10)] == [6, 7]
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import heapq
+import itertools
+import logging
+import threading
+import time
+import uuid
+
+from config import AUTO_UPDATE_MAX_CONCURRENT, AUTO_UPDATE_PER_REGISTRY_LIMIT
+from users_db import get_update_job, list_update_jobs, save_update_job, trim_finished_update_jobs
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+JOB_INTERRUPTED = 'interrupted'
+ACTIVE_JOB_STATES = (JOB_QUEUED, JOB_RUNNING)
+FINISHED_JOBS_KEPT = 200
+# Docker emits several pull events per layer per second; SSE clients only
+# need to hear about progress this often.
+PROGRESS_NOTIFY_INTERVAL_SECONDS = 0.5
+
+# Lower numbers run first.
+PRIORITY_MANUAL = 10
+PRIORITY_CONTAINER = 50
+PRIORITY_PROJECT = 60
+
+
+def _persist(job):
+    try:
+        save_update_job(job)
+    except Exception as exc:
+        logging.warning("Could not persist update job %s: %s", job.get('id'), exc)
+
+
+class UpdateJobExecutor:
+    """Run update jobs on a fixed worker pool.
+
+    At most max_concurrent jobs run at once and at most per_registry_limit of
+    them pull from the same registry. Queued jobs start in priority order
+    (lower first, then FIFO), skipping jobs whose registry is saturated.
+    Every state change is persisted and bumps a sequence that SSE clients
+    wait on. Writes happen under the lock so a stale state can never land
+    after a newer one.
+    """
+
+    def __init__(self, max_concurrent=AUTO_UPDATE_MAX_CONCURRENT, per_registry_limit=AUTO_UPDATE_PER_REGISTRY_LIMIT):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.per_registry_limit = max(1, int(per_registry_limit))
+        self._condition = threading.Condition()
+        self._heap = []
+        self._order = itertools.count()
+        self._jobs = {}
+        self._runners = {}
+        self._active_keys = {}
+        self._running_by_registry = collections.Counter()
+        self._workers = []
+        self._sequence = 0
+        self._progress_notified_at = {}
+        self._source_runners = {}
+
+    def register_runner(self, source, runner):
+        """Set the runner restore() uses for persisted jobs from this source."""
+        self._source_runners[source] = runner
+
+    def submit(self, target_type, target_id, target_name, runner, priority=PRIORITY_CONTAINER,
+               registry=None, source='auto', job_id=None, actor_username=None, actor_role=None,
+               remote_addr=None):
+        """Queue a job; returns the job dict, or None if the target already has an active job."""
+        key = (target_type, target_name)
+        with self._condition:
+            if key in self._active_keys:
+                return None
+            job = {
+                'id': job_id or uuid.uuid4().hex[:12],
+                'target_type': target_type,
+                'target_id': target_id,
+                'target_name': target_name,
+                'registry': registry or 'unknown',
+                'priority': int(priority),
+                'source': source,
+                'state': JOB_QUEUED,
+                'message': None,
+                'history_entry_id': None,
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'progress': None,
+                'actor_username': actor_username,
+                'actor_role': actor_role,
+                'remote_addr': remote_addr,
+            }
+            self._jobs[job['id']] = job
+            self._runners[job['id']] = runner
+            self._active_keys[key] = job['id']
+            heapq.heappush(self._heap, (job['priority'], next(self._order), job['id']))
+            self._start_workers_locked()
+            self._changed_locked()
+            _persist(job)
+            return dict(job)
+
+    def claim_target(self, target_type, target_name):
+        """Hold a target for an update run outside the executor; False if a job already has it.
+
+        While claimed, submit() rejects jobs for the target the same way it
+        rejects a second job. Pair every successful claim with release_target().
+        """
+        key = (target_type, target_name)
+        with self._condition:
+            if key in self._active_keys:
+                return False
+            self._active_keys[key] = None
+            return True
+
+    def release_target(self, target_type, target_name):
+        key = (target_type, target_name)
+        with self._condition:
+            if key in self._active_keys and self._active_keys[key] is None:
+                del self._active_keys[key]
+
+    def restore(self):
+        """Re-queue jobs left queued by a previous process and mark interrupted ones.
+
+        Each queued job runs with the runner registered for its source; jobs
+        from a source nobody registered are marked interrupted instead.
+        """
+        restored = 0
+        for job in reversed(list_update_jobs(limit=1000, states=ACTIVE_JOB_STATES)):
+            runner = self._source_runners.get(job['source'])
+            if job['state'] == JOB_RUNNING or runner is None:
+                message = 'Interrupted by a restart.' if job['state'] == JOB_RUNNING else 'Abandoned at restart.'
+                job.update(state=JOB_INTERRUPTED, finished_at=time.time(), message=message)
+                _persist(job)
+                continue
+            if self.submit(job['target_type'], job['target_id'], job['target_name'], runner,
+                           priority=job['priority'], registry=job['registry'], source=job['source'],
+                           job_id=job['id'], actor_username=job['actor_username'],
+                           actor_role=job['actor_role'], remote_addr=job['remote_addr']) is not None:
+                restored += 1
+        return restored
+
+    def stats(self):
+        with self._condition:
+            running = sum(1 for job in self._jobs.values() if job['state'] == JOB_RUNNING)
+            return {
+                'queued': len(self._jobs) - running,
+                'running': running,
+                'max_concurrent': self.max_concurrent,
+                'per_registry_limit': self.per_registry_limit,
+                'sequence': self._sequence,
+            }
+
+    def report_progress(self, job_id, progress):
+        """Attach the latest progress snapshot to a running job.
+
+        Waiters are woken at most every PROGRESS_NOTIFY_INTERVAL_SECONDS per job
+        unless the snapshot is marked final.
+        """
+        now = time.monotonic()
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job['progress'] = dict(progress)
+            last_notified = self._progress_notified_at.get(job_id, 0)
+            if progress.get('final') or now - last_notified >= PROGRESS_NOTIFY_INTERVAL_SECONDS:
+                self._progress_notified_at[job_id] = now
+                self._changed_locked()
+
+    def get_job(self, job_id):
+        """An active job from memory (with progress), else the persisted record."""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+        return get_update_job(job_id)
+
+    def active_jobs(self):
+        with self._condition:
+            return [dict(job) for job in self._jobs.values()]
+
+    def wait_for_change(self, last_sequence, timeout=15):
+        with self._condition:
+            self._condition.wait_for(lambda: self._sequence != last_sequence, timeout=timeout)
+            return self._sequence
+
+    def _changed_locked(self):
+        self._sequence += 1
+        self._condition.notify_all()
+
+    def _start_workers_locked(self):
+        while len(self._workers) < self.max_concurrent:
+            worker = threading.Thread(target=self._worker_loop, name=f'update-job-{len(self._workers)}', daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _next_job_locked(self):
+        skipped = []
+        chosen = None
+        while self._heap:
+            item = heapq.heappop(self._heap)
+            job = self._jobs[item[2]]
+            if self._running_by_registry[job['registry']] < self.per_registry_limit:
+                chosen = job
+                break
+            skipped.append(item)
+        for item in skipped:
+            heapq.heappush(self._heap, item)
+        return chosen
+
+    def _worker_loop(self):
+        while True:
+            with self._condition:
+                job = self._next_job_locked()
+                while job is None:
+                    self._condition.wait()
+                    job = self._next_job_locked()
+                job.update(state=JOB_RUNNING, started_at=time.time())
+                self._running_by_registry[job['registry']] += 1
+                runner = self._runners[job['id']]
+                self._changed_locked()
+                _persist(job)
+                snapshot = dict(job)
+
+            try:
+                result = runner(snapshot) or {}
+            except Exception as exc:
+                logging.exception("Update job %s failed", snapshot['id'])
+                result = {'ok': False, 'message': str(exc)}
+
+            with self._condition:
+                job.update(
+                    state=JOB_SUCCEEDED if result.get('ok') else JOB_FAILED,
+                    finished_at=time.time(),
+                    message=result.get('message'),
+                    history_entry_id=result.get('history_entry_id'),
+                )
+                self._running_by_registry[job['registry']] -= 1
+                self._jobs.pop(job['id'], None)
+                self._runners.pop(job['id'], None)
+                self._active_keys.pop((job['target_type'], job['target_name']), None)
+                self._progress_notified_at.pop(job['id'], None)
+                self._changed_locked()
+                _persist(job)
+            try:
+                trim_finished_update_jobs(keep=FINISHED_JOBS_KEPT)
+            except Exception as exc:
+                logging.warning("Could not trim finished update jobs: %s", exc)
+
+
+job_executor = UpdateJobExecutor()
@@ -3,22 +3,30 @@
 import json
 import logging
 import os
+import signal
 import subprocess
 import tempfile
+import threading
 import time
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import docker.errors
 from docker.types import DeviceRequest, LogConfig, Mount, Ulimit
 
 import sampler
+from config import COMPOSE_PULL_TIMEOUT_SECONDS, COMPOSE_UP_TIMEOUT_SECONDS, UPDATE_BATCH_MAX_PARALLEL
 from docker_client import get_api_client, get_docker_client
+from registry_client import RegistryError, split_image_ref
+from registry_digests import digest_cache
+from update_jobs import job_executor
 from users_db import (
     UPDATE_HISTORY_RETENTION_DAYS,
     get_auto_update_settings,
     get_update_history_entry,
+    latest_update_history_id,
     list_latest_successful_update_timestamps,
-    list_update_history,
+    list_update_history_with_rollback_state,
     record_update_history,
     set_auto_update_target,
 )
@@ -34,6 +42,17 @@ UPDATE_HISTORY_NOTICE = (
     "after they are recorded."
 )
 UPDATE_REFRESH_MAX_WORKERS = 8
+ROLLBACK_REPOSITORY_PREFIX = 'statainer-rollback'
+PULL_THROUGHPUT_WINDOW_SECONDS = 5
+INVENTORY_REFRESH_DEBOUNCE_SECONDS = 1.0
+COMPOSE_OUTPUT_MAX_LINES = 500
+COMPOSE_TERMINATE_GRACE_SECONDS = 10
+INVENTORY_EVENTS_RETRY_SECONDS = 5
+# Container lifecycle events that can change what the update inventory shows.
+INVENTORY_EVENT_ACTIONS = frozenset({
+    'create', 'destroy', 'start', 'stop', 'die', 'rename', 'update', 'pause', 'unpause',
+})
+_LAYER_DONE_STATUSES = ('Download complete', 'Pull complete', 'Already exists')
 COMPOSE_RECONSTRUCTION_LIMITATION = (
     "statainer does not reconstruct Compose projects from running "
     "containers alone because Docker metadata does not preserve override "
@@ -87,7 +106,7 @@ def _data_dir():
     return path
 
 
-def _rollback_dir():
+def rollback_dir():
     path = os.path.join(_data_dir(), 'rollback_overrides')
     os.makedirs(path, exist_ok=True)
     return path
@@ -143,8 +162,7 @@ def _remote_digest_for_image(client, image_ref):
     if not image_ref or '@sha256:' in image_ref:
         return None
     try:
-        registry_data = client.images.get_registry_data(image_ref)
-        return registry_data.id
+        return digest_cache.get_digest(client, image_ref)
     except Exception as exc:
         logging.warning("Unable to resolve registry digest for %s: %s", image_ref, exc)
         return None
@@ -527,6 +545,124 @@ def _safe_remove_container(container):
         logging.warning("Unable to remove backup container %s: %s", getattr(container, 'name', 'unknown'), exc)
 
 
+class PullProgress:
+    """Fold Docker's per-layer pull events into overall bytes and throughput.
+
+    Only download bytes are counted; extraction progress reuses the layer
+    size and would double the total. Throughput is measured over the last
+    PULL_THROUGHPUT_WINDOW_SECONDS of samples.
+    """
+
+    def __init__(self, image_ref, clock=time.monotonic, window_seconds=PULL_THROUGHPUT_WINDOW_SECONDS):
+        self.image_ref = image_ref
+        self.window_seconds = window_seconds
+        self._clock = clock
+        self._started_at = clock()
+        self._layers = {}
+        self._samples = deque()
+        self.status = 'starting'
+
+    def feed(self, event):
+        """Apply one decoded pull event; raises RuntimeError for daemon-reported errors."""
+        if event.get('error'):
+            raise RuntimeError(f"Pull of {self.image_ref} failed: {event['error']}")
+        status = event.get('status') or ''
+        layer_id = event.get('id')
+        self.status = status or self.status
+        if not layer_id or status.startswith('Pulling from'):
+            return
+        layer = self._layers.setdefault(layer_id, {'current': 0, 'total': 0, 'done': False})
+        detail = event.get('progressDetail') or {}
+        if status == 'Downloading':
+            layer['current'] = int(detail.get('current') or layer['current'])
+            layer['total'] = int(detail.get('total') or layer['total'])
+        elif status in _LAYER_DONE_STATUSES:
+            layer['done'] = True
+            layer['current'] = layer['total']
+        self._sample()
+
+    def _sample(self):
+        now = self._clock()
+        self._samples.append((now, self.bytes_done()))
+        while len(self._samples) > 2 and now - self._samples[0][0] > self.window_seconds:
+            self._samples.popleft()
+
+    def bytes_done(self):
+        return sum(layer['current'] for layer in self._layers.values())
+
+    def snapshot(self, final=False):
+        bytes_done = self.bytes_done()
+        bytes_total = sum(layer['total'] for layer in self._layers.values())
+        bytes_per_second = 0.0
+        if len(self._samples) >= 2:
+            (first_at, first_bytes), (last_at, last_bytes) = self._samples[0], self._samples[-1]
+            if last_at > first_at:
+                bytes_per_second = (last_bytes - first_bytes) / (last_at - first_at)
+        layers_done = sum(1 for layer in self._layers.values() if layer['done'])
+        if final:
+            percent = 100.0
+        elif bytes_total:
+            percent = round(min(100.0, bytes_done * 100.0 / bytes_total), 1)
+        else:
+            percent = None
+        return {
+            'image_ref': self.image_ref,
+            'status': self.status,
+            'layers_total': len(self._layers),
+            'layers_done': layers_done,
+            'bytes_done': bytes_done,
+            'bytes_total': bytes_total,
+            'percent': percent,
+            'bytes_per_second': round(max(0.0, bytes_per_second), 1),
+            'elapsed_seconds': round(self._clock() - self._started_at, 3),
+            'final': bool(final),
+        }
+
+
+def _take_pulled_image(pulled_images, image_ref):
+    """Return a batch pre-pull as (image_id, pull_seconds).
+
+    Only the first target that uses the image is charged the pull time, so
+    the group's pull is counted once across its history entries.
+    """
+    image_id, pull_seconds = pulled_images[image_ref]
+    pulled_images[image_ref] = (image_id, 0.0)
+    return image_id, pull_seconds
+
+
+def _prepull_image(client, image_ref, previous_image_id=None, progress=None, pulled_images=None):
+    """Pull image_ref and confirm Docker has a new local image for it.
+
+    Runs before any container is touched so registry time never counts as
+    downtime. When progress is given it is called with PullProgress
+    snapshots while the daemon streams the pull. pulled_images maps image
+    refs a batch already pulled to (image_id, pull_seconds) and skips the
+    pull for them. Returns (image_id, pull_seconds) and raises RuntimeError
+    when the pull leaves the old image in place.
+    """
+    if pulled_images is not None and image_ref in pulled_images:
+        new_image_id, pull_seconds = _take_pulled_image(pulled_images, image_ref)
+        if not new_image_id or new_image_id == previous_image_id:
+            raise RuntimeError('The image pull completed, but Docker is still reporting the same local image.')
+        return new_image_id, pull_seconds
+
+    started = time.monotonic()
+    if progress is None:
+        client.images.pull(image_ref)
+    else:
+        tracker = PullProgress(image_ref)
+        for event in client.api.pull(image_ref, stream=True, decode=True):
+            tracker.feed(event)
+            progress(tracker.snapshot())
+        progress(tracker.snapshot(final=True))
+    pulled_image = client.images.get(image_ref)
+    pull_seconds = time.monotonic() - started
+    new_image_id = getattr(pulled_image, 'id', None)
+    if not new_image_id or new_image_id == previous_image_id:
+        raise RuntimeError('The image pull completed, but Docker is still reporting the same local image.')
+    return new_image_id, pull_seconds
+
+
 def _recreate_single_container(container, target_image, actor_username=None, history_action='update', rollback_of=None):
     client = get_docker_client()
     api_client = get_api_client()
@@ -539,6 +675,29 @@ def _recreate_single_container(container, target_image, actor_username=None, his
     new_container_id = None
     notes = []
 
+    try:
+        client.images.get(target_image)
+    except Exception as exc:
+        # Never stop a container for an image that still has to be fetched.
+        return {
+            'ok': False,
+            'target_name': original_name,
+            'previous_version': version_info['current_version'],
+            'new_version': _format_version(snapshot['image_ref'], target_image),
+            'result': 'failure',
+            'notes': f'Target image {target_image} is not available locally; the container was left running: {exc}',
+            'metadata': {
+                'strategy': 'safe_container_recreate',
+                'snapshot': snapshot,
+                'container_name': original_name,
+                'previous_image_id': version_info['current_image_id'],
+                'attempted_image_id': target_image,
+            },
+            'rollback_of': rollback_of,
+            'downtime_seconds': 0.0,
+        }
+
+    downtime_started = time.monotonic()
     try:
         stop_timeout = snapshot.get('config', {}).get('stop_timeout')
         if original_running_state:
@@ -551,6 +710,7 @@ def _recreate_single_container(container, target_image, actor_username=None, his
             target_image,
             start_container=original_running_state,
         )
+        downtime_seconds = time.monotonic() - downtime_started
         _safe_remove_container(backup_container)
         client.containers.get(new_container_id)
         _refresh_update_checks([new_container_id])
@@ -570,6 +730,7 @@ def _recreate_single_container(container, target_image, actor_username=None, his
                 'current_container_id': new_container_id,
             },
             'rollback_of': rollback_of,
+            'downtime_seconds': downtime_seconds,
         }
     except Exception as exc:
         logging.error("Container recreate failed for %s: %s", original_name, exc)
@@ -586,6 +747,7 @@ def _recreate_single_container(container, target_image, actor_username=None, his
                 restored.start()
         except Exception as restore_exc:
             notes.append(f'Automatic restore also failed: {restore_exc}')
+        downtime_seconds = time.monotonic() - downtime_started
         return {
             'ok': False,
             'target_name': original_name,
@@ -601,6 +763,7 @@ def _recreate_single_container(container, target_image, actor_username=None, his
                 'attempted_image_id': target_image,
             },
             'rollback_of': rollback_of,
+            'downtime_seconds': downtime_seconds,
         }
 
 
@@ -680,6 +843,9 @@ def _refresh_candidate_checks(containers):
     remote_digests = {}
 
     if image_refs:
+        # An explicit refresh must not be answered from the shared cache.
+        for image_ref in image_refs:
+            digest_cache.invalidate(image_ref)
         max_workers = min(UPDATE_REFRESH_MAX_WORKERS, len(image_refs))
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
             future_map = {
@@ -699,9 +865,7 @@ def _refresh_candidate_checks(containers):
     for container in containers:
         details = _build_refresh_details(container, remote_digests)
         result = details.get('update_available')
-        sampler.update_check_details_cache[container.id] = details
-        sampler.update_check_cache[container.id] = result
-        sampler.update_check_time[container.id] = now
+        sampler.record_update_check(container.id, result, details=details, checked_at=now)
         refreshed.append((container, result))
     return refreshed
 
@@ -950,7 +1114,7 @@ def _sanitize_repo_fragment(value):
 
 
 def _tag_for_rollback(client, image_id, project_name, service_name, history_id):
-    repository = f"statainer-rollback/{_sanitize_repo_fragment(project_name)}-{_sanitize_repo_fragment(service_name)}"
+    repository = f"{ROLLBACK_REPOSITORY_PREFIX}/{_sanitize_repo_fragment(project_name)}-{_sanitize_repo_fragment(service_name)}"
     tag = f'history-{history_id}'
     image = client.images.get(image_id)
     image.tag(repository, tag=tag)
@@ -959,7 +1123,7 @@ def _tag_for_rollback(client, image_id, project_name, service_name, history_id):
 
 def _write_override_file(project_name, service_tags, history_id):
     override_path = os.path.join(
-        _rollback_dir(),
+        rollback_dir(),
         f'{_sanitize_repo_fragment(project_name)}-history-{history_id}.override.yml',
     )
     lines = ['services:']
@@ -990,17 +1154,129 @@ def _compose_command(metadata, project_name, extra_args, override_file=None):
     return command
 
 
-def _run_compose(metadata, project_name, extra_args, override_file=None):
+class ComposeRun:
+    """Outcome of one compose invocation; mirrors the CompletedProcess fields callers read."""
+
+    def __init__(self, command, returncode, stdout, stderr, duration_seconds, timed_out=False):
+        self.args = command
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.duration_seconds = duration_seconds
+        self.timed_out = timed_out
+
+
+def _pump_compose_stream(stream, stream_name, lines, on_line):
+    for line in iter(stream.readline, ''):
+        lines.append(line)
+        if on_line is not None:
+            try:
+                on_line(stream_name, line.rstrip('\n'))
+            except Exception as exc:
+                logging.debug("Compose output callback failed: %s", exc)
+    stream.close()
+
+
+def _terminate_compose(process):
+    """SIGTERM the compose process group, then SIGKILL it after a grace period."""
+    for sig, grace in ((signal.SIGTERM, COMPOSE_TERMINATE_GRACE_SECONDS), (signal.SIGKILL, None)):
+        try:
+            if hasattr(os, 'killpg'):
+                os.killpg(process.pid, sig)
+            else:
+                process.send_signal(sig)
+        except (ProcessLookupError, PermissionError):
+            return
+        if grace is None:
+            process.wait()
+            return
+        try:
+            process.wait(timeout=grace)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+
+
+def _run_compose(metadata, project_name, extra_args, override_file=None, timeout=None, on_line=None):
+    """Run docker compose, streaming output lines to on_line(stream, line).
+
+    The phase (pull vs everything else) picks the default timeout. On
+    timeout the whole process group is terminated and a non-zero result is
+    returned with the reason appended to stderr. Only the last
+    COMPOSE_OUTPUT_MAX_LINES lines of each stream are kept.
+    """
     command = _compose_command(metadata, project_name, extra_args, override_file=override_file)
-    return subprocess.run(
+    if timeout is None:
+        timeout = COMPOSE_PULL_TIMEOUT_SECONDS if extra_args and extra_args[0] == 'pull' else COMPOSE_UP_TIMEOUT_SECONDS
+    started = time.monotonic()
+    process = subprocess.Popen(
         command,
         cwd=metadata['working_dir'],
-        capture_output=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
         text=True,
-        check=False,
+        bufsize=1,
+        start_new_session=True,
+    )
+    outputs = {'stdout': deque(maxlen=COMPOSE_OUTPUT_MAX_LINES), 'stderr': deque(maxlen=COMPOSE_OUTPUT_MAX_LINES)}
+    readers = [
+        threading.Thread(
+            target=_pump_compose_stream,
+            args=(getattr(process, name), name, outputs[name], on_line),
+            name=f'compose-{name}',
+            daemon=True,
+        )
+        for name in ('stdout', 'stderr')
+    ]
+    for reader in readers:
+        reader.start()
+
+    timed_out = False
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        logging.warning("docker compose %s for %s timed out after %ss", ' '.join(extra_args[:1]), project_name, timeout)
+        _terminate_compose(process)
+    for reader in readers:
+        reader.join(timeout=COMPOSE_TERMINATE_GRACE_SECONDS)
+
+    returncode = process.returncode
+    stderr = ''.join(outputs['stderr'])
+    if timed_out:
+        returncode = returncode or -1
+        stderr += f"docker compose {' '.join(extra_args[:1])} timed out after {timeout}s and was terminated.\n"
+    return ComposeRun(
+        command,
+        returncode,
+        ''.join(outputs['stdout']),
+        stderr,
+        time.monotonic() - started,
+        timed_out=timed_out,
     )
 
 
+def _compose_line_reporter(progress, phase):
+    """Adapt an update progress callback to _run_compose's on_line hook."""
+    if progress is None:
+        return None
+    started = time.monotonic()
+    counter = {'lines': 0}
+
+    def report(stream_name, line):
+        counter['lines'] += 1
+        progress({
+            'phase': phase,
+            'stream': stream_name,
+            'status': line,
+            'lines': counter['lines'],
+            'elapsed_seconds': round(time.monotonic() - started, 3),
+            'final': False,
+        })
+
+    return report
+
+
 def _build_candidate_collections(containers, client, only_update_available=False):
     project_groups = {}
     container_items = []
@@ -1054,19 +1330,57 @@ def _list_auto_update_targets(containers, client):
     )
 
 
-def list_update_targets(history_limit=20, force_refresh=False):
+def _collect_update_candidates(force_refresh=False):
+    """All project and container candidates, optionally re-checking the registry first."""
     client = get_docker_client()
     containers = client.containers.list(all=True)
 
     if force_refresh:
         refreshed = _refresh_candidate_checks(containers)
-    else:
-        refreshed = [(container, sampler.update_check_cache.get(container.id)) for container in containers]
-
-    if force_refresh:
         containers = [container for container, _update_available in refreshed]
 
-    all_project_items, all_container_items = _build_candidate_collections(containers, client, only_update_available=False)
+    return _build_candidate_collections(containers, client, only_update_available=False)
+
+
+def _history_entry_can_rollback(entry, rolled_back):
+    metadata = entry.get('metadata') or {}
+    return bool(
+        entry.get('action') == 'update'
+        and entry.get('result') == 'success'
+        and metadata.get('rollback_ready', False)
+        and not rolled_back
+    )
+
+
+def rollback_image_targets():
+    """Rollback-ready history grouped by the image each entry would roll back to.
+
+    Returns (entries_by_image, latest_image_ids): entries_by_image maps a
+    previous image id to the retained entries that still offer a rollback to
+    it, and latest_image_ids holds the images behind the newest such entry
+    of every container or project.
+    """
+    entries_by_image = {}
+    latest_image_ids = set()
+    seen_targets = set()
+    # Newest first, so the first entry per target is its latest rollback.
+    for entry in list_update_history_with_rollback_state(limit=None):
+        if not _history_entry_can_rollback(entry, entry.get('rolled_back')):
+            continue
+        metadata = entry.get('metadata') or {}
+        image_ids = {metadata.get('previous_image_id')}
+        image_ids.update(service.get('previous_image_id') for service in metadata.get('services') or [])
+        image_ids.discard(None)
+        target = (entry.get('target_type'), entry.get('target_id'))
+        if target not in seen_targets:
+            seen_targets.add(target)
+            latest_image_ids.update(image_ids)
+        for image_id in image_ids:
+            entries_by_image.setdefault(image_id, []).append(entry['id'])
+    return entries_by_image, latest_image_ids
+
+
+def _assemble_update_payload(all_project_items, all_container_items, history_limit):
     project_items = [item for item in all_project_items if item.get('update_available')]
     container_items = [item for item in all_container_items if item.get('update_available')]
     auto_update_settings = get_auto_update_settings()
@@ -1079,16 +1393,10 @@ def list_update_targets(history_limit=20, force_refresh=False):
         if str(item.get('update_state') or '').lower() == 'ready'
     ]
 
-    rollback_sources = {entry['rollback_of'] for entry in list_update_history(limit=history_limit * 3) if entry.get('rollback_of')}
     history_entries = []
-    for entry in list_update_history(limit=history_limit):
-        metadata = entry.get('metadata') or {}
-        entry['can_rollback'] = (
-            entry.get('action') == 'update'
-            and entry.get('result') == 'success'
-            and metadata.get('rollback_ready', False)
-            and entry['id'] not in rollback_sources
-        )
+    for entry in list_update_history_with_rollback_state(limit=history_limit):
+        rolled_back = entry.pop('rolled_back', False)
+        entry['can_rollback'] = _history_entry_can_rollback(entry, rolled_back)
         history_entries.append(entry)
 
     return {
@@ -1102,6 +1410,123 @@ def list_update_targets(history_limit=20, force_refresh=False):
     }
 
 
+def list_update_targets(history_limit=20, force_refresh=False):
+    all_project_items, all_container_items = _collect_update_candidates(force_refresh=force_refresh)
+    return _assemble_update_payload(all_project_items, all_container_items, history_limit)
+
+
+class UpdateInventory:
+    """Precomputed update candidates kept current in the background.
+
+    The candidate lists are rebuilt on a refresher thread when a container
+    event arrives or the sampler records new update checks, so serving the
+    update manager no longer inspects every container. version changes
+    whenever the candidates, the recorded update checks, the update history
+    or the auto-update settings change and doubles as the endpoint's ETag.
+    """
+
+    def __init__(self, debounce_seconds=INVENTORY_REFRESH_DEBOUNCE_SECONDS):
+        self.debounce_seconds = debounce_seconds
+        self._lock = threading.Lock()
+        self._refresh_requested = threading.Event()
+        self._candidates = None
+        self._check_sequence = None
+        self._markers = None
+        self._version = 0
+        self._built_at = None
+        self._refresher = None
+        self._watcher = None
+
+    def rebuild(self, force_refresh=False):
+        check_sequence = sampler.update_check_sequence
+        candidates = _collect_update_candidates(force_refresh=force_refresh)
+        with self._lock:
+            if candidates != self._candidates:
+                self._version += 1
+            self._candidates = candidates
+            self._check_sequence = check_sequence
+            self._built_at = time.time()
+        return candidates
+
+    def mark_dirty(self):
+        with self._lock:
+            if self._candidates is None:
+                # Nothing cached yet; the first payload() builds from scratch.
+                return
+        self._refresh_requested.set()
+        self._start_refresher()
+
+    def _current_candidates(self):
+        with self._lock:
+            candidates = self._candidates
+            stale = self._check_sequence != sampler.update_check_sequence
+        if candidates is None:
+            return self.rebuild()
+        if stale:
+            self.mark_dirty()
+        return candidates
+
+    def version(self):
+        """Current version token; cheap enough for clients to poll."""
+        markers = (
+            sampler.update_check_sequence,
+            latest_update_history_id(),
+            json.dumps(get_auto_update_settings(), sort_keys=True, default=str),
+        )
+        with self._lock:
+            if self._markers is not None and markers != self._markers:
+                self._version += 1
+            self._markers = markers
+            return self._version
+
+    def payload(self, history_limit=20):
+        all_project_items, all_container_items = self._current_candidates()
+        payload = _assemble_update_payload(all_project_items, all_container_items, history_limit)
+        payload['version'] = self.version()
+        payload['built_at'] = self._built_at
+        return payload
+
+    def _start_refresher(self):
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            self._refresher = threading.Thread(target=self._refresh_loop, name='update-inventory', daemon=True)
+            self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            self._refresh_requested.wait()
+            # Collapse bursts (compose up -d, a sampler pass) into one rebuild.
+            time.sleep(self.debounce_seconds)
+            self._refresh_requested.clear()
+            try:
+                self.rebuild()
+            except Exception as exc:
+                logging.warning("Update inventory refresh failed: %s", exc)
+
+    def watch_container_events(self):
+        """Start a daemon thread that marks the inventory dirty on container lifecycle events."""
+        if self._watcher is not None and self._watcher.is_alive():
+            return self._watcher
+        self._watcher = threading.Thread(target=self._events_loop, name='update-inventory-events', daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+    def _events_loop(self):
+        while True:
+            try:
+                for event in get_docker_client().events(decode=True, filters={'type': 'container'}):
+                    if event.get('Action') in INVENTORY_EVENT_ACTIONS:
+                        self.mark_dirty()
+            except Exception as exc:
+                logging.warning("Container event stream for the update inventory ended: %s", exc)
+            self.mark_dirty()
+            time.sleep(INVENTORY_EVENTS_RETRY_SECONDS)
+
+
+update_inventory = UpdateInventory()
+
+
 def configure_auto_update_target(target_type, target_name, enabled):
     normalized_type = 'project' if str(target_type or '').strip().lower() == 'project' else 'container'
     normalized_name = str(target_name or '').strip()
@@ -1140,7 +1565,7 @@ def _container_support_check(container):
     return True, None
 
 
-def update_container_target(container_id, actor_username=None):
+def update_container_target(container_id, actor_username=None, progress=None, pulled_images=None):
     client = get_docker_client()
     container = client.containers.get(container_id)
     supported, reason = _container_support_check(container)
@@ -1177,11 +1602,13 @@ def update_container_target(container_id, actor_username=None):
         )
         return {'ok': False, 'message': message, 'history_entry': get_update_history_entry(history_id)}
 
-    client.images.pull(version_info['image_ref'])
-    pulled_image = client.images.get(version_info['image_ref'])
-    new_image_id = getattr(pulled_image, 'id', None)
-    if not new_image_id or new_image_id == version_info['current_image_id']:
-        message = 'The image pull completed, but Docker is still reporting the same local image.'
+    try:
+        new_image_id, pull_seconds = _prepull_image(
+            client, version_info['image_ref'], version_info['current_image_id'], progress=progress,
+            pulled_images=pulled_images,
+        )
+    except Exception as exc:
+        message = str(exc)
         history_id = record_update_history(
             action='update',
             target_type='container',
@@ -1210,6 +1637,8 @@ def update_container_target(container_id, actor_username=None):
         notes=result.get('notes'),
         metadata=result['metadata'],
         actor_username=actor_username,
+        pull_seconds=pull_seconds,
+        downtime_seconds=result.get('downtime_seconds'),
     )
     return {
         'ok': result['ok'],
@@ -1218,7 +1647,8 @@ def update_container_target(container_id, actor_username=None):
     }
 
 
-def _update_external_project_target(project_name, project_containers, candidate, actor_username=None):
+def _update_external_project_target(project_name, project_containers, candidate, actor_username=None, progress=None,
+                                     pulled_images=None):
     client = get_docker_client()
     services = []
     target_images = {}
@@ -1258,15 +1688,17 @@ def _update_external_project_target(project_name, project_containers, candidate,
             'previous_image_id': version_info['current_image_id'],
         })
 
+    pull_seconds = 0.0
     try:
         for service in services:
-            client.images.pull(service['image_ref'])
-            pulled_image = client.images.get(service['image_ref'])
-            new_image_id = getattr(pulled_image, 'id', None)
-            if not new_image_id or new_image_id == service['previous_image_id']:
-                raise RuntimeError(
-                    f"The image pull for service {service['service']} completed, but Docker is still reporting the same local image."
+            try:
+                new_image_id, service_pull_seconds = _prepull_image(
+                    client, service['image_ref'], service['previous_image_id'], progress=progress,
+                    pulled_images=pulled_images,
                 )
+            except RuntimeError as exc:
+                raise RuntimeError(f"Service {service['service']}: {exc}") from exc
+            pull_seconds += service_pull_seconds
             target_images[service['service']] = new_image_id
     except Exception as exc:
         history_id = record_update_history(
@@ -1280,16 +1712,19 @@ def _update_external_project_target(project_name, project_containers, candidate,
             notes=str(exc),
             metadata={'rollback_ready': False, 'strategy': 'external_project_safe_recreate', 'services': services},
             actor_username=actor_username,
+            pull_seconds=pull_seconds,
         )
         return {'ok': False, 'message': str(exc), 'history_entry': get_update_history_entry(history_id)}
 
     updated_services = []
     touched_container_ids = []
     failure_notes = []
+    downtime_seconds = 0.0
 
     for service in services:
         container = client.containers.get(service['container_id'])
         result = _recreate_single_container(container, target_images[service['service']], actor_username=actor_username)
+        downtime_seconds += result.get('downtime_seconds') or 0.0
         if not result['ok']:
             failure_notes.append(result.get('notes') or f"Service {service['service']} failed to update.")
             for updated in reversed(updated_services):
@@ -1322,6 +1757,8 @@ def _update_external_project_target(project_name, project_containers, candidate,
                 notes='\n'.join(note for note in failure_notes if note),
                 metadata={'rollback_ready': False, 'strategy': 'external_project_safe_recreate', 'services': services},
                 actor_username=actor_username,
+                pull_seconds=pull_seconds,
+                downtime_seconds=downtime_seconds,
             )
             return {
                 'ok': False,
@@ -1334,6 +1771,7 @@ def _update_external_project_target(project_name, project_containers, candidate,
             'new_image_id': target_images[service['service']],
             'new_container_id': result['metadata'].get('current_container_id'),
             'new_version': result['new_version'],
+            'downtime_seconds': result.get('downtime_seconds'),
         })
         if result['metadata'].get('current_container_id'):
             touched_container_ids.append(result['metadata']['current_container_id'])
@@ -1377,6 +1815,8 @@ def _update_external_project_target(project_name, project_containers, candidate,
             'services': updated_services,
         },
         actor_username=actor_username,
+        pull_seconds=pull_seconds,
+        downtime_seconds=downtime_seconds,
     )
     return {
         'ok': True,
@@ -1388,7 +1828,7 @@ def _update_external_project_target(project_name, project_containers, candidate,
     }
 
 
-def update_project_target(project_name, actor_username=None):
+def update_project_target(project_name, actor_username=None, progress=None, pulled_images=None):
     client = get_docker_client()
     all_containers = client.containers.list(all=True)
     project_containers = []
@@ -1408,6 +1848,8 @@ def update_project_target(project_name, actor_username=None):
             project_containers,
             candidate,
             actor_username=actor_username,
+            progress=progress,
+            pulled_images=pulled_images,
         )
     if not metadata.get('ready'):
         history_id = record_update_history(
@@ -1436,8 +1878,25 @@ def update_project_target(project_name, actor_username=None):
             'previous_image_id': entry['current_image_id'],
         })
 
-    pull_result = _run_compose(metadata, project_name, ['pull', *services])
-    if pull_result.returncode != 0:
+    # Images a batch already pulled are local; only the rest go through `compose pull`.
+    pull_seconds = 0.0
+    services_to_pull = []
+    for entry in previous_services:
+        if pulled_images is not None and entry['image_ref'] in pulled_images:
+            pull_seconds += _take_pulled_image(pulled_images, entry['image_ref'])[1]
+        else:
+            services_to_pull.append(entry['service'])
+
+    phase_timings = {}
+    pull_output = ''
+    if services_to_pull:
+        pull_result = _run_compose(
+            metadata, project_name, ['pull', *services_to_pull], on_line=_compose_line_reporter(progress, 'pull'),
+        )
+        phase_timings['pull'] = round(pull_result.duration_seconds, 3)
+        pull_seconds += phase_timings['pull']
+        pull_output = pull_result.stdout or ''
+    if services_to_pull and pull_result.returncode != 0:
         notes = (pull_result.stderr or pull_result.stdout or 'Compose pull failed.').strip()
         history_id = record_update_history(
             action='update',
@@ -1448,12 +1907,22 @@ def update_project_target(project_name, actor_username=None):
             new_version=candidate['latest_version'],
             result='failure',
             notes=notes,
-            metadata={'rollback_ready': False, 'strategy': 'compose_project_update', 'services': previous_services},
+            metadata={
+                'rollback_ready': False,
+                'strategy': 'compose_project_update',
+                'services': previous_services,
+                'phase_timings': phase_timings,
+            },
             actor_username=actor_username,
+            pull_seconds=pull_seconds,
         )
         return {'ok': False, 'message': notes, 'history_entry': get_update_history_entry(history_id)}
 
-    up_result = _run_compose(metadata, project_name, ['up', '-d', *services])
+    # Images are local now, so `up -d` only spends time replacing containers.
+    up_result = _run_compose(
+        metadata, project_name, ['up', '-d', *services], on_line=_compose_line_reporter(progress, 'up'),
+    )
+    downtime_seconds = phase_timings['up'] = round(up_result.duration_seconds, 3)
     if up_result.returncode != 0:
         service_tags = {}
         for service in previous_services:
@@ -1462,7 +1931,11 @@ def update_project_target(project_name, actor_username=None):
         override_file = _write_override_file(project_name, service_tags, int(time.time())) if service_tags else None
         rollback_notes = ''
         if override_file:
-            rollback_result = _run_compose(metadata, project_name, ['up', '-d', *service_tags.keys()], override_file=override_file)
+            rollback_result = _run_compose(
+                metadata, project_name, ['up', '-d', *service_tags.keys()], override_file=override_file,
+                on_line=_compose_line_reporter(progress, 'rollback'),
+            )
+            phase_timings['rollback'] = round(rollback_result.duration_seconds, 3)
             rollback_notes = (rollback_result.stderr or rollback_result.stdout or '').strip()
         notes = (up_result.stderr or up_result.stdout or 'Compose up failed.').strip()
         if rollback_notes:
@@ -1476,8 +1949,15 @@ def update_project_target(project_name, actor_username=None):
             new_version=candidate['latest_version'],
             result='failure',
             notes=notes,
-            metadata={'rollback_ready': False, 'strategy': 'compose_project_update', 'services': previous_services},
+            metadata={
+                'rollback_ready': False,
+                'strategy': 'compose_project_update',
+                'services': previous_services,
+                'phase_timings': phase_timings,
+            },
             actor_username=actor_username,
+            pull_seconds=pull_seconds,
+            downtime_seconds=downtime_seconds,
         )
         return {'ok': False, 'message': notes, 'history_entry': get_update_history_entry(history_id)}
 
@@ -1509,15 +1989,18 @@ def update_project_target(project_name, actor_username=None):
         previous_version=previous_version,
         new_version=new_version,
         result='success',
-        notes=(pull_result.stdout or '') + (up_result.stdout or ''),
+        notes=pull_output + (up_result.stdout or ''),
         metadata={
             'rollback_ready': True,
             'strategy': 'compose_project_update',
             'working_dir': metadata['working_dir'],
             'config_files': metadata['config_files'],
             'services': previous_services,
+            'phase_timings': phase_timings,
         },
         actor_username=actor_username,
+        pull_seconds=pull_seconds,
+        downtime_seconds=downtime_seconds,
     )
     return {
         'ok': True,
@@ -1526,14 +2009,158 @@ def update_project_target(project_name, actor_username=None):
     }
 
 
-def update_target(target_type, target_id, actor_username=None):
+def update_target(target_type, target_id, actor_username=None, progress=None, pulled_images=None):
+    """Update a container or project; progress receives pull snapshots where Docker streams them."""
     if target_type == 'container':
-        return update_container_target(target_id, actor_username=actor_username)
+        return update_container_target(
+            target_id, actor_username=actor_username, progress=progress, pulled_images=pulled_images,
+        )
     if target_type == 'project':
-        return update_project_target(target_id, actor_username=actor_username)
+        return update_project_target(
+            target_id, actor_username=actor_username, progress=progress, pulled_images=pulled_images,
+        )
     return {'ok': False, 'message': 'Unknown update target type.', 'history_entry': None}
 
 
+def _batch_target_images(client, target_type, target_id, all_containers):
+    if target_type == 'container':
+        try:
+            return {_container_image_ref(client.containers.get(target_id))} - {''}
+        except Exception:
+            return set()
+    image_refs = set()
+    for container in all_containers:
+        labels = container.attrs.get('Config', {}).get('Labels', {}) or {}
+        if labels.get('com.docker.compose.project') == target_id and sampler.update_check_cache.get(container.id) is True:
+            image_ref = _container_image_ref(container)
+            if image_ref:
+                image_refs.add(image_ref)
+    return image_refs
+
+
+def resolve_update_job_target(target_type, target_id, client=None):
+    """Return (target_id, target_name, registry) keyed the way auto-update jobs are.
+
+    Containers resolve to their full id and name so a manual job and an
+    auto-update job for the same container share one executor key. Raises
+    docker.errors.NotFound for a missing container.
+    """
+    client = client or get_docker_client()
+    if target_type == 'container':
+        container = client.containers.get(target_id)
+        target_id, target_name = container.id, container.name
+        image_refs = [_container_image_ref(container)]
+    else:
+        target_name = target_id
+        image_refs = sorted(_batch_target_images(client, target_type, target_id, client.containers.list(all=True)))
+    for image_ref in image_refs:
+        try:
+            return target_id, target_name, split_image_ref(image_ref)[0]
+        except RegistryError:
+            continue
+    return target_id, target_name, None
+
+
+def plan_update_batch(targets, client=None):
+    """Group batch targets that share an image so the image is pulled once.
+
+    Targets in one group run one after another; separate groups share no
+    images and can run in parallel. Duplicate targets are dropped. Returns a
+    list of {'targets': [(type, id), ...], 'image_refs': [...]} groups in
+    request order.
+    """
+    client = client or get_docker_client()
+    all_containers = client.containers.list(all=True)
+    ordered = []
+    for target_type, target_id in targets:
+        if (target_type, target_id) not in ordered:
+            ordered.append((target_type, target_id))
+
+    parent = list(range(len(ordered)))
+
+    def find(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    target_images = []
+    owner_by_image = {}
+    for index, (target_type, target_id) in enumerate(ordered):
+        image_refs = _batch_target_images(client, target_type, target_id, all_containers)
+        target_images.append(image_refs)
+        for image_ref in image_refs:
+            if image_ref in owner_by_image:
+                parent[find(index)] = find(owner_by_image[image_ref])
+            else:
+                owner_by_image[image_ref] = index
+
+    groups = {}
+    for index, target in enumerate(ordered):
+        group = groups.setdefault(find(index), {'targets': [], 'image_refs': []})
+        group['targets'].append(target)
+        for image_ref in sorted(target_images[index]):
+            if image_ref not in group['image_refs']:
+                group['image_refs'].append(image_ref)
+    return list(groups.values())
+
+
+def _run_update_batch_target(client, target_type, target_id, actor_username, pulled_images):
+    try:
+        target_name = resolve_update_job_target(target_type, target_id, client)[1]
+    except Exception as exc:
+        return {'ok': False, 'message': f'Unable to resolve {target_type} {target_id}: {exc}', 'history_entry': None}
+    # Holding the executor key keeps queued or running jobs and the batch off the same target.
+    if not job_executor.claim_target(target_type, target_name):
+        return {'ok': False, 'message': f'An update for {target_name} is already queued or running.', 'history_entry': None}
+    try:
+        return update_target(target_type, target_id, actor_username=actor_username, pulled_images=pulled_images)
+    except Exception as exc:
+        logging.exception("Batch update failed for %s %s", target_type, target_id)
+        return {'ok': False, 'message': str(exc), 'history_entry': None}
+    finally:
+        job_executor.release_target(target_type, target_name)
+
+
+def _run_update_batch_group(client, group, actor_username, on_result):
+    pulled_images = {}
+    for image_ref in group['image_refs']:
+        if '@sha256:' in image_ref:
+            continue
+        try:
+            pulled_images[image_ref] = _prepull_image(client, image_ref)
+        except Exception as exc:
+            # Each target pulls again on its own and records the failure in its history.
+            logging.warning("Batch pre-pull of %s failed: %s", image_ref, exc)
+    for target_type, target_id in group['targets']:
+        result = _run_update_batch_target(client, target_type, target_id, actor_username, pulled_images)
+        on_result(target_type, target_id, result)
+
+
+def run_update_batch(targets, actor_username=None, max_parallel=UPDATE_BATCH_MAX_PARALLEL, on_result=None):
+    """Update many targets, pulling each shared image once and running independent groups in parallel.
+
+    on_result(target_type, target_id, result) is called as each target
+    finishes, from a worker thread. Returns the list of per-target results.
+    """
+    client = get_docker_client()
+    groups = plan_update_batch(targets, client)
+    results = []
+
+    def record(target_type, target_id, result):
+        results.append({'target_type': target_type, 'target_id': target_id, **result})
+        if on_result is not None:
+            on_result(target_type, target_id, result)
+
+    if not groups:
+        return results
+    with ThreadPoolExecutor(max_workers=max(1, min(int(max_parallel), len(groups)))) as executor:
+        futures = [executor.submit(_run_update_batch_group, client, group, actor_username, record) for group in groups]
+        for future in as_completed(futures):
+            future.result()
+    return results
+
+
 def rollback_update(history_id, actor_username=None):
     client = get_docker_client()
     entry = get_update_history_entry(history_id)
@@ -1544,7 +2171,8 @@ def rollback_update(history_id, actor_username=None):
 
     metadata = entry.get('metadata') or {}
     if not metadata.get('rollback_ready'):
-        return {'ok': False, 'message': 'Rollback data is not available for this entry.', 'history_entry': None}
+        message = metadata.get('rollback_unavailable_reason') or 'Rollback data is not available for this entry.'
+        return {'ok': False, 'message': message, 'history_entry': None}
 
     if entry['target_type'] == 'container':
         snapshot = metadata.get('snapshot')
@@ -1566,6 +2194,7 @@ def rollback_update(history_id, actor_username=None):
             metadata={'rollback_ready': False, 'strategy': 'safe_container_recreate'},
             rollback_of=entry['id'],
             actor_username=actor_username,
+            downtime_seconds=result.get('downtime_seconds'),
         )
         return {
             'ok': result['ok'],
@@ -1645,6 +2274,7 @@ def rollback_update(history_id, actor_username=None):
 
         override_file = _write_override_file(entry['target_name'], service_tags, entry['id'])
         rollback_result = _run_compose(compose_metadata, entry['target_name'], ['up', '-d', *service_tags.keys()], override_file=override_file)
+        rollback_seconds = round(rollback_result.duration_seconds, 3)
         success = rollback_result.returncode == 0
         notes = (rollback_result.stderr or rollback_result.stdout or '').strip()
         rollback_entry_id = record_update_history(
@@ -1656,9 +2286,14 @@ def rollback_update(history_id, actor_username=None):
             new_version=entry['previous_version'],
             result='success' if success else 'failure',
             notes=notes or ('Rollback completed.' if success else 'Rollback failed.'),
-            metadata={'rollback_ready': False, 'strategy': 'compose_project_update'},
+            metadata={
+                'rollback_ready': False,
+                'strategy': 'compose_project_update',
+                'phase_timings': {'up': rollback_seconds},
+            },
             rollback_of=entry['id'],
             actor_username=actor_username,
+            downtime_seconds=rollback_seconds,
         )
         return {
             'ok': success,
@@ -1,8 +1,17 @@
+import atexit
+import collections
+import contextlib
+import hashlib
+import hmac
 import json
 import logging
 import os
+import secrets
 import sqlite3
+import threading
 import time
+import weakref
+import zlib
 from werkzeug.security import check_password_hash, generate_password_hash
 
 APP_DIR = os.path.dirname(__file__)
@@ -11,6 +20,30 @@ LEGACY_DB_PATH = os.path.join(APP_DIR, 'users.db')
 UPDATE_HISTORY_RETENTION_DAYS = 15
 UPDATE_HISTORY_RETENTION_SECONDS = UPDATE_HISTORY_RETENTION_DAYS * 24 * 60 * 60
 AUTO_UPDATE_SETTINGS_KEY = 'auto_update_settings'
+CREDENTIAL_CACHE_MAX_ENTRIES = 256
+DB_BUSY_TIMEOUT_SECONDS = 10.0
+DB_CACHED_STATEMENTS = 256
+AUDIT_FLUSH_INTERVAL_SECONDS = 1.0
+AUDIT_FLUSH_BATCH_SIZE = 500
+AUDIT_QUEUE_MAX_PENDING = 10000
+NOTIFICATION_FLUSH_INTERVAL_SECONDS = 1.0
+NOTIFICATION_FLUSH_BATCH_SIZE = 500
+
+# Verified Basic-auth credentials, keyed by an HMAC of db path + username +
+# password under a per-process random key so plaintext never sits in memory.
+_credential_cache_key = secrets.token_bytes(32)
+_credential_cache_lock = threading.Lock()
+_credential_cache = collections.OrderedDict()
+# Bumped on every invalidation so a check that raced with a password change
+# or delete drops its result instead of caching the old password.
+_credential_generations = collections.Counter()
+_credential_epoch = 0
+
+# Role/column profile per (db path, username). The version counter lets a
+# lookup that raced with a write drop its now-stale result instead of caching it.
+_user_profile_lock = threading.Lock()
+_user_profile_cache = {}
+_user_profile_version = 0
 
 
 def _normalize_db_path(path):
@@ -30,273 +63,775 @@ def get_db_path():
     return DEFAULT_DB_PATH
 
 
+class PooledConnection(sqlite3.Connection):
+    """Per-thread connection whose close() hands it back instead of closing it.
+
+    Helpers borrow it through db_connection(), which closes it even when the
+    body raises. get_db() calls nest: only when the outermost user closes is
+    an uncommitted transaction rolled back, exactly as a real close would, so
+    a nested helper never throws away its caller's pending writes. check_same_thread is off only so
+    close_db_connections() can shut every thread's connection down; each
+    connection is still used by one thread.
+    """
+
+    discarded = False
+    users = 0
+
+    def close(self):
+        self.users = max(0, self.users - 1)
+        if not self.discarded and not self.users and self.in_transaction:
+            self.rollback()
+
+    def close_for_real(self):
+        self.discarded = True
+        super().close()
+
+
+_db_local = threading.local()
+_db_connections = weakref.WeakSet()
+_db_connections_lock = threading.Lock()
+
+
+def _open_pooled_connection(db_path):
+    conn = sqlite3.connect(
+        db_path,
+        timeout=DB_BUSY_TIMEOUT_SECONDS,
+        cached_statements=DB_CACHED_STATEMENTS,
+        check_same_thread=False,
+        factory=PooledConnection,
+    )
+    conn.row_factory = sqlite3.Row
+    try:
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+    except sqlite3.DatabaseError as exc:
+        logging.warning("Could not enable WAL mode for %s: %s", db_path, exc)
+    with _db_connections_lock:
+        _db_connections.add(conn)
+    return conn
+
+
 def get_db():
     db_path = get_db_path()
+    pooled = getattr(_db_local, 'connection', None)
+    if pooled is not None and pooled[0] == db_path and not pooled[1].discarded:
+        conn = pooled[1]
+        # Left open by a caller that never closed; nobody else is using it.
+        if not conn.users and conn.in_transaction:
+            conn.rollback()
+        conn.users += 1
+        return conn
+    if pooled is not None and not pooled[1].discarded:
+        pooled[1].close_for_real()
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
+    conn = _open_pooled_connection(db_path)
+    conn.users = 1
+    _db_local.connection = (db_path, conn)
     return conn
 
-def migrate_add_columns_and_role_and_settings():
-    conn = get_db()
-    c = conn.cursor()
-    c.execute(
-        '''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            columns TEXT,
-            role TEXT
-        )
-        '''
-    )
-    # Add columns field if not exists
-    try:
-        c.execute('ALTER TABLE users ADD COLUMN columns TEXT')
-    except sqlite3.OperationalError:
-        pass  # Already exists
-    # Add role field if not exists
-    try:
-        c.execute('ALTER TABLE users ADD COLUMN role TEXT')
-    except sqlite3.OperationalError:
-        pass  # Already exists
 
-    # Create global settings table if missing
+@contextlib.contextmanager
+def db_connection(db_path=None):
+    """Borrow a connection for a with block and always hand it back.
+
+    A db_path other than the configured one gets a plain connection of its
+    own, closed on exit; that is how the writer threads flush rows queued
+    before the database moved.
+    """
+    if db_path is None or db_path == get_db_path():
+        conn = get_db()
+    else:
+        conn = sqlite3.connect(db_path, timeout=DB_BUSY_TIMEOUT_SECONDS)
     try:
-        c.execute('CREATE TABLE IF NOT EXISTS global_settings (key TEXT PRIMARY KEY, value TEXT)')
-    except sqlite3.OperationalError:
-        pass
+        yield conn
+    finally:
+        conn.close()
+
+
+def close_db_connections():
+    """Close every pooled connection; threads reopen lazily on next use."""
+    with _db_connections_lock:
+        connections = list(_db_connections)
+        _db_connections.clear()
+    for conn in connections:
+        try:
+            conn.close_for_real()
+        except sqlite3.Error:
+            pass
+
+
+atexit.register(close_db_connections)
+
+UPDATE_SNAPSHOT_COMPRESSION_LEVEL = 6
+
+
+def _encode_update_snapshot(snapshot):
+    if not snapshot:
+        return None
+    payload = json.dumps(snapshot, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return zlib.compress(payload, UPDATE_SNAPSHOT_COMPRESSION_LEVEL)
+
+
+def _decode_update_snapshot(blob):
+    if not blob:
+        return None
     try:
+        return json.loads(zlib.decompress(blob).decode('utf-8'))
+    except (zlib.error, ValueError) as exc:
+        logging.warning("Could not decode update history snapshot: %s", exc)
+        return None
+
+
+def _move_inline_update_snapshots(cursor):
+    """Move container snapshots stored inside legacy metadata JSON into the compressed column."""
+    cursor.execute(
+        "SELECT id, metadata FROM update_history WHERE snapshot IS NULL AND metadata LIKE '%\"snapshot\"%'"
+    )
+    for row in cursor.fetchall():
+        try:
+            metadata = json.loads(row[1])
+        except (TypeError, ValueError):
+            continue
+        snapshot = metadata.pop('snapshot', None)
+        if snapshot is None:
+            continue
+        cursor.execute(
+            'UPDATE update_history SET metadata=?, snapshot=? WHERE id=?',
+            (json.dumps(metadata, sort_keys=True), _encode_update_snapshot(snapshot), row[0]),
+        )
+
+
+def migrate_add_columns_and_role_and_settings():
+    with db_connection() as conn:
+        c = conn.cursor()
         c.execute(
             '''
-            CREATE TABLE IF NOT EXISTS audit_log (
+            CREATE TABLE IF NOT EXISTS users (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT UNIQUE NOT NULL,
+                password_hash TEXT NOT NULL,
+                columns TEXT,
+                role TEXT
+            )
+            '''
+        )
+        # Add columns field if not exists
+        try:
+            c.execute('ALTER TABLE users ADD COLUMN columns TEXT')
+        except sqlite3.OperationalError:
+            pass  # Already exists
+        # Add role field if not exists
+        try:
+            c.execute('ALTER TABLE users ADD COLUMN role TEXT')
+        except sqlite3.OperationalError:
+            pass  # Already exists
+
+        # Create global settings table if missing
+        try:
+            c.execute('CREATE TABLE IF NOT EXISTS global_settings (key TEXT PRIMARY KEY, value TEXT)')
+        except sqlite3.OperationalError:
+            pass
+        try:
+            c.execute(
+                '''
+                CREATE TABLE IF NOT EXISTS audit_log (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at REAL NOT NULL,
+                    actor_username TEXT,
+                    actor_role TEXT,
+                    action TEXT NOT NULL,
+                    target_type TEXT NOT NULL,
+                    target_id TEXT,
+                    status TEXT NOT NULL,
+                    remote_addr TEXT,
+                    details TEXT
+                )
+                '''
+            )
+        except sqlite3.OperationalError:
+            pass
+        try:
+            c.execute(
+                '''
+                CREATE TABLE IF NOT EXISTS update_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at REAL NOT NULL,
+                    actor_username TEXT,
+                    action TEXT NOT NULL,
+                    target_type TEXT NOT NULL,
+                    target_id TEXT NOT NULL,
+                    target_name TEXT NOT NULL,
+                    previous_version TEXT,
+                    new_version TEXT,
+                    result TEXT NOT NULL,
+                    notes TEXT,
+                    metadata TEXT,
+                    rollback_of INTEGER,
+                    pull_seconds REAL,
+                    downtime_seconds REAL,
+                    snapshot BLOB
+                )
+                '''
+            )
+        except sqlite3.OperationalError:
+            pass
+        # Pull and downtime durations were added after the table shipped
+        for column in ('pull_seconds', 'downtime_seconds'):
+            try:
+                c.execute(f'ALTER TABLE update_history ADD COLUMN {column} REAL')
+            except sqlite3.OperationalError:
+                pass  # Already exists
+        try:
+            c.execute('ALTER TABLE update_history ADD COLUMN snapshot BLOB')
+        except sqlite3.OperationalError:
+            pass  # Already exists
+        _move_inline_update_snapshots(c)
+        c.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS update_checks (
+                container_id TEXT PRIMARY KEY,
+                image_ref TEXT,
+                update_available INTEGER,
+                details TEXT,
+                checked_at REAL NOT NULL
+            )
+            '''
+        )
+        c.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS update_jobs (
+                id TEXT PRIMARY KEY,
+                target_type TEXT NOT NULL,
+                target_id TEXT NOT NULL,
+                target_name TEXT NOT NULL,
+                registry TEXT,
+                priority INTEGER NOT NULL,
+                source TEXT,
+                state TEXT NOT NULL,
+                message TEXT,
+                history_entry_id INTEGER,
                 created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
                 actor_username TEXT,
                 actor_role TEXT,
-                action TEXT NOT NULL,
-                target_type TEXT NOT NULL,
-                target_id TEXT,
-                status TEXT NOT NULL,
-                remote_addr TEXT,
-                details TEXT
+                remote_addr TEXT
             )
             '''
         )
-    except sqlite3.OperationalError:
-        pass
-    try:
+        # Manual jobs keep who queued them so a restart can finish their audit trail
+        for column in ('actor_username', 'actor_role', 'remote_addr'):
+            try:
+                c.execute(f'ALTER TABLE update_jobs ADD COLUMN {column} TEXT')
+            except sqlite3.OperationalError:
+                pass  # Already exists
         c.execute(
             '''
-            CREATE TABLE IF NOT EXISTS update_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
+            CREATE TABLE IF NOT EXISTS notification_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
                 created_at REAL NOT NULL,
-                actor_username TEXT,
-                action TEXT NOT NULL,
-                target_type TEXT NOT NULL,
-                target_id TEXT NOT NULL,
-                target_name TEXT NOT NULL,
-                previous_version TEXT,
-                new_version TEXT,
-                result TEXT NOT NULL,
-                notes TEXT,
-                metadata TEXT,
-                rollback_of INTEGER
+                type TEXT,
+                project TEXT,
+                container TEXT,
+                payload TEXT NOT NULL
             )
             '''
         )
-    except sqlite3.OperationalError:
-        pass
-    conn.commit()
-    conn.close()
+        c.execute('CREATE INDEX IF NOT EXISTS idx_notification_log_created_at ON notification_log (created_at)')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_notification_log_type ON notification_log (type, seq)')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_notification_log_project ON notification_log (project, seq)')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_update_jobs_created_at ON update_jobs (created_at)')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_update_jobs_state ON update_jobs (state)')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_audit_log_created_at ON audit_log (created_at)')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_audit_log_actor ON audit_log (actor_username, id)')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_audit_log_action ON audit_log (action, id)')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_update_history_created_at ON update_history (created_at)')
+        c.execute(
+            'CREATE INDEX IF NOT EXISTS idx_update_history_target '
+            'ON update_history (target_type, target_name, action, result, created_at)'
+        )
+        c.execute('CREATE INDEX IF NOT EXISTS idx_update_history_rollback_of ON update_history (rollback_of)')
+        conn.commit()
 
 # Call migration at import
 migrate_add_columns_and_role_and_settings()
 
 def init_db(default_user, default_password):
-    conn = get_db()
-    c = conn.cursor()
-    c.execute('SELECT id FROM users WHERE username=?', (default_user,))
-    if default_user and default_password and not c.fetchone():
-        c.execute('INSERT INTO users (username, password_hash, role, columns) VALUES (?, ?, ?, ?)',
-                  (default_user, generate_password_hash(default_password), 'admin', None))
-        conn.commit()
-    conn.close()
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute('SELECT id FROM users WHERE username=?', (default_user,))
+        if default_user and default_password and not c.fetchone():
+            c.execute('INSERT INTO users (username, password_hash, role, columns) VALUES (?, ?, ?, ?)',
+                      (default_user, generate_password_hash(default_password), 'admin', None))
+            conn.commit()
+            invalidate_user_profile_cache(default_user)
 
 def count_users():
-    conn = get_db()
-    c = conn.cursor()
-    c.execute('SELECT COUNT(*) AS count FROM users')
-    row = c.fetchone()
-    conn.close()
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute('SELECT COUNT(*) AS count FROM users')
+        row = c.fetchone()
     return int(row['count'] or 0)
 
 def validate_user(username, password):
-    conn = get_db()
-    c = conn.cursor()
-    c.execute('SELECT password_hash FROM users WHERE username=?', (username,))
-    row = c.fetchone()
-    conn.close()
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute('SELECT password_hash FROM users WHERE username=?', (username,))
+        row = c.fetchone()
     if row and check_password_hash(row['password_hash'], password):
         return True
     return False
 
+def _credential_cache_digest(username, password):
+    message = '\0'.join((get_db_path(), str(username or ''), str(password or ''))).encode('utf-8')
+    return hmac.new(_credential_cache_key, message, hashlib.sha256).digest()
+
+def validate_user_cached(username, password, ttl_seconds=60):
+    """validate_user with a short-lived cache of successful checks.
+
+    Only successes are cached, so wrong passwords still pay the full hash
+    cost. A ttl_seconds of 0 disables the cache.
+    """
+    if ttl_seconds <= 0 or not username or not password:
+        return validate_user(username, password)
+    digest = _credential_cache_digest(username, password)
+    now = time.monotonic()
+    with _credential_cache_lock:
+        entry = _credential_cache.get(digest)
+        if entry is not None:
+            if entry[1] > now:
+                _credential_cache.move_to_end(digest)
+                return True
+            del _credential_cache[digest]
+        generation = (_credential_epoch, _credential_generations[username])
+    if not validate_user(username, password):
+        return False
+    with _credential_cache_lock:
+        if generation != (_credential_epoch, _credential_generations[username]):
+            return True
+        _credential_cache[digest] = (username, now + ttl_seconds)
+        _credential_cache.move_to_end(digest)
+        while len(_credential_cache) > CREDENTIAL_CACHE_MAX_ENTRIES:
+            _credential_cache.popitem(last=False)
+    return True
+
+def invalidate_credential_cache(username=None):
+    global _credential_epoch
+    with _credential_cache_lock:
+        if username is None:
+            _credential_epoch += 1
+            _credential_cache.clear()
+            return
+        _credential_generations[username] += 1
+        for digest in [key for key, entry in _credential_cache.items() if entry[0] == username]:
+            del _credential_cache[digest]
+
 def change_password(username, new_password):
-    conn = get_db()
-    c = conn.cursor()
-    c.execute('UPDATE users SET password_hash=? WHERE username=?',
-              (generate_password_hash(new_password), username))
-    conn.commit()
-    changed = c.rowcount > 0
-    conn.close()
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute('UPDATE users SET password_hash=? WHERE username=?',
+                  (generate_password_hash(new_password), username))
+        conn.commit()
+        changed = c.rowcount > 0
+    invalidate_credential_cache(username)
+    invalidate_user_profile_cache(username)
     return changed
 
 def user_exists(username):
-    conn = get_db()
-    c = conn.cursor()
-    c.execute('SELECT 1 FROM users WHERE username=?', (username,))
-    exists = c.fetchone() is not None
-    conn.close()
-    return exists
+    return get_user_profile(username)['exists']
 
 def create_user_with_columns(username, password, columns, role="user"):
-    conn = get_db()
-    c = conn.cursor()
     columns_json = json.dumps(list(columns))
     try:
-        c.execute('INSERT INTO users (username, password_hash, columns, role) VALUES (?, ?, ?, ?)',
-                  (username, generate_password_hash(password), columns_json, role))
-        conn.commit()
+        with db_connection() as conn:
+            c = conn.cursor()
+            c.execute('INSERT INTO users (username, password_hash, columns, role) VALUES (?, ?, ?, ?)',
+                      (username, generate_password_hash(password), columns_json, role))
+            conn.commit()
         return True
     except sqlite3.IntegrityError:
         return False
     finally:
-        conn.close()
+        invalidate_user_profile_cache(username)
 
 def list_users_with_columns():
-    conn = get_db()
-    c = conn.cursor()
-    c.execute('SELECT username, columns, role FROM users')
-    users = []
-    for row in c.fetchall():
-        try:
-            cols = json.loads(row['columns']) if row['columns'] else []
-        except Exception:
-            cols = []
-        users.append({
-            'username': row['username'],
-            'columns': cols,
-            'role': row['role'] or ('admin' if row['username'] == 'admin' else 'user')
-        })
-    conn.close()
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute('SELECT username, columns, role FROM users')
+        users = []
+        for row in c.fetchall():
+            try:
+                cols = json.loads(row['columns']) if row['columns'] else []
+            except Exception:
+                cols = []
+            users.append({
+                'username': row['username'],
+                'columns': cols,
+                'role': row['role'] or ('admin' if row['username'] == 'admin' else 'user')
+            })
     return users
 
 def update_user_columns(username, columns):
-    conn = get_db()
-    c = conn.cursor()
-    columns_json = json.dumps(list(columns))
-    c.execute('UPDATE users SET columns=? WHERE username=?', (columns_json, username))
-    conn.commit()
-    conn.close()
+    with db_connection() as conn:
+        c = conn.cursor()
+        columns_json = json.dumps(list(columns))
+        c.execute('UPDATE users SET columns=? WHERE username=?', (columns_json, username))
+        conn.commit()
+    invalidate_user_profile_cache(username)
 
 def delete_user(username):
-    conn = get_db()
-    c = conn.cursor()
-    c.execute('DELETE FROM users WHERE username=?', (username,))
-    conn.commit()
-    conn.close()
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute('DELETE FROM users WHERE username=?', (username,))
+        conn.commit()
+    invalidate_credential_cache(username)
+    invalidate_user_profile_cache(username)
 
-def get_user_columns(username):
-    conn = get_db()
-    c = conn.cursor()
-    c.execute('SELECT columns FROM users WHERE username=?', (username,))
-    row = c.fetchone()
-    conn.close()
+def _load_user_profile(username):
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute('SELECT role, columns FROM users WHERE username=?', (username,))
+        row = c.fetchone()
+    columns = []
     if row and row['columns']:
         try:
-            return json.loads(row['columns'])
+            columns = json.loads(row['columns'])
         except Exception:
-            return []
-    return []
+            columns = []
+    if row and row['role']:
+        role = row['role']
+    else:
+        role = 'admin' if username == 'admin' else 'user'
+    return {'exists': row is not None, 'role': role, 'columns': tuple(columns)}
+
+def get_user_profile(username):
+    """Return {'exists', 'role', 'columns'} for a user, cached until the user changes.
+
+    Unknown usernames are not cached; login attempts can submit any name.
+    """
+    key = (get_db_path(), username)
+    with _user_profile_lock:
+        profile = _user_profile_cache.get(key)
+        version = _user_profile_version
+    if profile is not None:
+        return profile
+    profile = _load_user_profile(username)
+    if not profile['exists']:
+        return profile
+    with _user_profile_lock:
+        if version == _user_profile_version:
+            _user_profile_cache[key] = profile
+    return profile
+
+def invalidate_user_profile_cache(username=None):
+    global _user_profile_version
+    with _user_profile_lock:
+        _user_profile_version += 1
+        if username is None:
+            _user_profile_cache.clear()
+            return
+        for key in [key for key in _user_profile_cache if key[1] == username]:
+            del _user_profile_cache[key]
+
+def get_user_columns(username):
+    return list(get_user_profile(username)['columns'])
 
 def get_user_role(username):
-    conn = get_db()
-    c = conn.cursor()
-    c.execute('SELECT role FROM users WHERE username=?', (username,))
-    row = c.fetchone()
-    conn.close()
-    if row and row['role']:
-        return row['role']
-    return 'admin' if username == 'admin' else 'user'
+    return get_user_profile(username)['role']
 
 
-def record_audit_event(action, target_type, status, actor_username=None, actor_role=None, target_id=None, remote_addr=None, details=None):
-    conn = get_db()
-    c = conn.cursor()
+_AUDIT_INSERT_SQL = '''
+    INSERT INTO audit_log (
+        created_at, actor_username, actor_role, action, target_type, target_id, status, remote_addr, details
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+_AUDIT_COLUMNS = 'id, created_at, actor_username, actor_role, action, target_type, target_id, status, remote_addr, details'
+
+# Pending audit rows as (db_path, row) tuples, written by a background flusher.
+_audit_queue = collections.deque()
+_audit_lock = threading.Lock()
+_audit_flush_lock = threading.Lock()
+_audit_wakeup = threading.Event()
+_audit_writer_thread = None
+
+
+def _audit_row(action, target_type, status, actor_username, actor_role, target_id, remote_addr, details):
     details_json = json.dumps(details or {}, sort_keys=True)
-    c.execute(
-        '''
-        INSERT INTO audit_log (
-            created_at, actor_username, actor_role, action, target_type, target_id, status, remote_addr, details
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''',
-        (time.time(), actor_username, actor_role, action, target_type, target_id, status, remote_addr, details_json),
-    )
-    conn.commit()
-    event_id = c.lastrowid
-    conn.close()
+    return (time.time(), actor_username, actor_role, action, target_type, target_id, status, remote_addr, details_json)
+
+
+def record_audit_event(action, target_type, status, actor_username=None, actor_role=None, target_id=None, remote_addr=None, details=None):
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute(
+            _AUDIT_INSERT_SQL,
+            _audit_row(action, target_type, status, actor_username, actor_role, target_id, remote_addr, details),
+        )
+        conn.commit()
+        event_id = c.lastrowid
     return event_id
 
 
-def list_audit_events(limit=100):
-    conn = get_db()
-    c = conn.cursor()
-    c.execute(
-        '''
-        SELECT id, created_at, actor_username, actor_role, action, target_type, target_id, status, remote_addr, details
-        FROM audit_log
-        ORDER BY created_at DESC, id DESC
-        LIMIT ?
-        ''',
-        (int(limit),),
+def enqueue_audit_event(action, target_type, status, actor_username=None, actor_role=None, target_id=None, remote_addr=None, details=None):
+    """Queue an audit row for the background writer instead of committing inline.
+
+    If the writer falls AUDIT_QUEUE_MAX_PENDING rows behind, the caller
+    flushes synchronously rather than dropping audit data.
+    """
+    global _audit_writer_thread
+    row = _audit_row(action, target_type, status, actor_username, actor_role, target_id, remote_addr, details)
+    with _audit_lock:
+        _audit_queue.append((get_db_path(), row))
+        depth = len(_audit_queue)
+        if _audit_writer_thread is None or not _audit_writer_thread.is_alive():
+            _audit_writer_thread = threading.Thread(target=_audit_writer_loop, name='audit-writer', daemon=True)
+            _audit_writer_thread.start()
+    if depth >= AUDIT_QUEUE_MAX_PENDING:
+        flush_audit_events()
+    elif depth >= AUDIT_FLUSH_BATCH_SIZE:
+        _audit_wakeup.set()
+
+
+def audit_queue_depth():
+    with _audit_lock:
+        return len(_audit_queue)
+
+
+def flush_audit_events():
+    """Write every queued audit row, one transaction per database. Returns rows written."""
+    written = 0
+    with _audit_flush_lock:
+        while True:
+            with _audit_lock:
+                if not _audit_queue:
+                    return written
+                batch = [_audit_queue.popleft() for _ in range(min(AUDIT_FLUSH_BATCH_SIZE, len(_audit_queue)))]
+            rows_by_path = collections.OrderedDict()
+            for db_path, row in batch:
+                rows_by_path.setdefault(db_path, []).append(row)
+            for db_path, rows in rows_by_path.items():
+                try:
+                    with db_connection(db_path) as conn:
+                        with conn:
+                            conn.executemany(_AUDIT_INSERT_SQL, rows)
+                    written += len(rows)
+                except sqlite3.Error as exc:
+                    logging.error("Failed to write %d audit events to %s: %s", len(rows), db_path, exc)
+
+
+# Registered after close_db_connections so it runs first at exit.
+atexit.register(flush_audit_events)
+
+
+def _audit_writer_loop():
+    while True:
+        _audit_wakeup.wait(AUDIT_FLUSH_INTERVAL_SECONDS)
+        _audit_wakeup.clear()
+        try:
+            flush_audit_events()
+        except Exception as exc:
+            logging.error("Audit writer flush failed: %s", exc)
+
+
+_NOTIFICATION_INSERT_SQL = '''
+    INSERT INTO notification_log (created_at, type, project, container, payload)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+# Pending notifications as (db_path, row, event) tuples, written like audit rows.
+_notification_queue = collections.deque()
+_notification_lock = threading.Lock()
+_notification_flush_lock = threading.Lock()
+_notification_wakeup = threading.Event()
+_notification_writer_thread = None
+
+
+def enqueue_notification_record(event):
+    """Queue a published notification for the background writer.
+
+    SQLite assigns the seq; the writer stores it in event['seq'] once the
+    row is written, so callers should put a 'seq' key in the event first.
+    """
+    global _notification_writer_thread
+    row = (
+        float(event.get('timestamp') or time.time()),
+        str(event.get('type') or '').lower() or None,
+        event.get('project') or None,
+        event.get('container') or None,
+        json.dumps({key: value for key, value in event.items() if key != 'seq'}, sort_keys=True, default=str),
     )
-    rows = []
-    for row in c.fetchall():
+    with _notification_lock:
+        _notification_queue.append((get_db_path(), row, event))
+        depth = len(_notification_queue)
+        if _notification_writer_thread is None or not _notification_writer_thread.is_alive():
+            _notification_writer_thread = threading.Thread(
+                target=_notification_writer_loop, name='notification-writer', daemon=True,
+            )
+            _notification_writer_thread.start()
+    if depth >= NOTIFICATION_FLUSH_BATCH_SIZE:
+        _notification_wakeup.set()
+
+
+def flush_notification_records():
+    """Write every queued notification, one transaction per database. Returns rows written."""
+    written = 0
+    with _notification_flush_lock:
+        while True:
+            with _notification_lock:
+                if not _notification_queue:
+                    return written
+                batch = [
+                    _notification_queue.popleft()
+                    for _ in range(min(NOTIFICATION_FLUSH_BATCH_SIZE, len(_notification_queue)))
+                ]
+            items_by_path = collections.OrderedDict()
+            for db_path, row, event in batch:
+                items_by_path.setdefault(db_path, []).append((row, event))
+            for db_path, items in items_by_path.items():
+                try:
+                    seqs = []
+                    with db_connection(db_path) as conn:
+                        with conn:
+                            c = conn.cursor()
+                            for row, _event in items:
+                                c.execute(_NOTIFICATION_INSERT_SQL, row)
+                                seqs.append(c.lastrowid)
+                    for (_row, event), seq in zip(items, seqs):
+                        event['seq'] = seq
+                    written += len(items)
+                except sqlite3.Error as exc:
+                    logging.error("Failed to write %d notifications to %s: %s", len(items), db_path, exc)
+
+
+# Registered after close_db_connections so it runs first at exit.
+atexit.register(flush_notification_records)
+
+
+def _notification_writer_loop():
+    while True:
+        _notification_wakeup.wait(NOTIFICATION_FLUSH_INTERVAL_SECONDS)
+        _notification_wakeup.clear()
         try:
-            details = json.loads(row['details']) if row['details'] else {}
-        except Exception:
-            details = {}
-        rows.append({
-            'id': row['id'],
-            'created_at': row['created_at'],
-            'actor_username': row['actor_username'],
-            'actor_role': row['actor_role'],
-            'action': row['action'],
-            'target_type': row['target_type'],
-            'target_id': row['target_id'],
-            'status': row['status'],
-            'remote_addr': row['remote_addr'],
-            'details': details,
-        })
-    conn.close()
+            flush_notification_records()
+        except Exception as exc:
+            logging.error("Notification writer flush failed: %s", exc)
+
+
+def _notification_from_row(row):
+    try:
+        event = json.loads(row['payload'])
+    except Exception:
+        event = {'timestamp': row['created_at'], 'type': row['type']}
+    event['seq'] = row['seq']
+    return event
+
+
+def list_notification_records(limit=50, before_seq=None, event_type=None, project=None, since=None):
+    """Newest-first stored notifications; page with before_seq set to the last seq of the previous page."""
+    flush_notification_records()
+    clauses = []
+    params = []
+    if before_seq is not None:
+        clauses.append('seq < ?')
+        params.append(int(before_seq))
+    if event_type:
+        clauses.append('type = ?')
+        params.append(str(event_type).lower())
+    if project:
+        clauses.append('project = ?')
+        params.append(project)
+    if since is not None:
+        clauses.append('created_at > ?')
+        params.append(float(since))
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    params.append(int(limit))
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute(f'SELECT seq, created_at, type, payload FROM notification_log {where} ORDER BY seq DESC LIMIT ?', params)
+        rows = [_notification_from_row(row) for row in c.fetchall()]
+    return rows
+
+
+def load_recent_notification_records(limit):
+    """The newest stored notifications, oldest first, for warming the in-memory index."""
+    return list(reversed(list_notification_records(limit=limit)))
+
+
+def trim_notification_records(keep):
+    """Delete all but the newest keep notifications. Returns rows deleted."""
+    flush_notification_records()
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute(
+            'DELETE FROM notification_log WHERE seq <= '
+            '(SELECT seq FROM notification_log ORDER BY seq DESC LIMIT 1 OFFSET ?)',
+            (int(keep),),
+        )
+        conn.commit()
+        deleted = c.rowcount
+    return deleted
+
+
+def _audit_event_from_row(row):
+    try:
+        details = json.loads(row['details']) if row['details'] else {}
+    except Exception:
+        details = {}
+    return {
+        'id': row['id'],
+        'created_at': row['created_at'],
+        'actor_username': row['actor_username'],
+        'actor_role': row['actor_role'],
+        'action': row['action'],
+        'target_type': row['target_type'],
+        'target_id': row['target_id'],
+        'status': row['status'],
+        'remote_addr': row['remote_addr'],
+        'details': details,
+    }
+
+
+def list_audit_events(limit=100, before_id=None, actor=None, action=None, since=None, until=None):
+    """Newest-first audit events; page with before_id set to the last id of the previous page."""
+    flush_audit_events()
+    clauses = []
+    params = []
+    if before_id is not None:
+        clauses.append('id < ?')
+        params.append(int(before_id))
+    if actor:
+        clauses.append('actor_username = ?')
+        params.append(actor)
+    if action:
+        clauses.append('action = ?')
+        params.append(action)
+    if since is not None:
+        clauses.append('created_at >= ?')
+        params.append(float(since))
+    if until is not None:
+        clauses.append('created_at <= ?')
+        params.append(float(until))
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    params.append(int(limit))
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute(f'SELECT {_AUDIT_COLUMNS} FROM audit_log {where} ORDER BY id DESC LIMIT ?', params)
+        rows = [_audit_event_from_row(row) for row in c.fetchall()]
     return rows
 
 # --- Global Settings Helpers ---
 def set_global_setting(key, value):
-    conn = get_db()
-    c = conn.cursor()
-    c.execute('INSERT OR REPLACE INTO global_settings (key, value) VALUES (?, ?)',
-              (key, json.dumps(value)))
-    conn.commit()
-    conn.close()
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute('INSERT OR REPLACE INTO global_settings (key, value) VALUES (?, ?)',
+                  (key, json.dumps(value)))
+        conn.commit()
 
 def get_global_setting(key, default=None):
-    conn = get_db()
-    c = conn.cursor()
-    c.execute('SELECT value FROM global_settings WHERE key=?', (key,))
-    row = c.fetchone()
-    conn.close()
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute('SELECT value FROM global_settings WHERE key=?', (key,))
+        row = c.fetchone()
     if row:
         try:
             return json.loads(row['value'])
@@ -360,15 +895,18 @@ def set_auto_update_target(target_type, target_name, enabled):
     return set_auto_update_settings(settings)
 
 
-def purge_expired_update_history(now_ts=None, retention_seconds=UPDATE_HISTORY_RETENTION_SECONDS):
+def _update_history_cutoff(now_ts=None, retention_seconds=UPDATE_HISTORY_RETENTION_SECONDS):
     effective_now = float(now_ts if now_ts is not None else time.time())
-    cutoff = effective_now - max(0, int(retention_seconds))
-    conn = get_db()
-    c = conn.cursor()
-    c.execute('DELETE FROM update_history WHERE created_at < ?', (cutoff,))
-    conn.commit()
-    deleted = c.rowcount
-    conn.close()
+    return effective_now - max(0, int(retention_seconds))
+
+
+def purge_expired_update_history(now_ts=None, retention_seconds=UPDATE_HISTORY_RETENTION_SECONDS):
+    """Delete history past retention. Run from the maintenance thread; reads already hide expired rows."""
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute('DELETE FROM update_history WHERE created_at < ?', (_update_history_cutoff(now_ts, retention_seconds),))
+        conn.commit()
+        deleted = c.rowcount
     return deleted
 
 
@@ -384,58 +922,62 @@ def record_update_history(
     metadata=None,
     rollback_of=None,
     actor_username=None,
+    pull_seconds=None,
+    downtime_seconds=None,
 ):
-    conn = get_db()
-    c = conn.cursor()
-    c.execute(
-        '''
-        INSERT INTO update_history (
-            created_at, actor_username, action, target_type, target_id, target_name,
-            previous_version, new_version, result, notes, metadata, rollback_of
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''',
-        (
-            time.time(),
-            actor_username,
-            action,
-            target_type,
-            target_id,
-            target_name,
-            previous_version,
-            new_version,
-            result,
-            notes,
-            json.dumps(metadata or {}, sort_keys=True),
-            rollback_of,
-        ),
-    )
-    conn.commit()
-    event_id = c.lastrowid
-    conn.close()
+    # The container snapshot dwarfs the rest of the metadata; keep it compressed
+    # in its own column so list views never read or decode it.
+    summary = dict(metadata or {})
+    snapshot = summary.pop('snapshot', None)
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute(
+            '''
+            INSERT INTO update_history (
+                created_at, actor_username, action, target_type, target_id, target_name,
+                previous_version, new_version, result, notes, metadata, rollback_of,
+                pull_seconds, downtime_seconds, snapshot
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''',
+            (
+                time.time(),
+                actor_username,
+                action,
+                target_type,
+                target_id,
+                target_name,
+                previous_version,
+                new_version,
+                result,
+                notes,
+                json.dumps(summary, sort_keys=True),
+                rollback_of,
+                None if pull_seconds is None else round(float(pull_seconds), 3),
+                None if downtime_seconds is None else round(float(downtime_seconds), 3),
+                _encode_update_snapshot(snapshot),
+            ),
+        )
+        conn.commit()
+        event_id = c.lastrowid
     return event_id
 
 
-def get_update_history_entry(entry_id):
-    purge_expired_update_history()
-    conn = get_db()
-    c = conn.cursor()
-    c.execute(
-        '''
-        SELECT id, created_at, actor_username, action, target_type, target_id, target_name,
-               previous_version, new_version, result, notes, metadata, rollback_of
-        FROM update_history
-        WHERE id=?
-        ''',
-        (int(entry_id),),
-    )
-    row = c.fetchone()
-    conn.close()
-    if not row:
-        return None
+_UPDATE_HISTORY_COLUMNS = '''
+    id, created_at, actor_username, action, target_type, target_id, target_name,
+    previous_version, new_version, result, notes, metadata, rollback_of,
+    pull_seconds, downtime_seconds
+'''
+
+
+def _update_history_entry_from_row(row, include_snapshot=False):
     try:
         metadata = json.loads(row['metadata']) if row['metadata'] else {}
     except Exception:
         metadata = {}
+    if include_snapshot:
+        snapshot = _decode_update_snapshot(row['snapshot'])
+        if snapshot is not None:
+            metadata['snapshot'] = snapshot
     return {
         'id': row['id'],
         'created_at': row['created_at'],
@@ -450,63 +992,226 @@ def get_update_history_entry(entry_id):
         'notes': row['notes'],
         'metadata': metadata,
         'rollback_of': row['rollback_of'],
+        'pull_seconds': row['pull_seconds'],
+        'downtime_seconds': row['downtime_seconds'],
     }
 
 
+def get_update_history_entry(entry_id):
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute(
+            f'SELECT {_UPDATE_HISTORY_COLUMNS}, snapshot FROM update_history WHERE id=? AND created_at >= ?',
+            (int(entry_id), _update_history_cutoff()),
+        )
+        row = c.fetchone()
+    if not row:
+        return None
+    return _update_history_entry_from_row(row, include_snapshot=True)
+
+
+def disable_update_history_rollback(entry_ids, reason):
+    """Clear rollback_ready on the given history entries and record why."""
+    entry_ids = [int(entry_id) for entry_id in entry_ids or []]
+    if not entry_ids:
+        return 0
+    updated = 0
+    with db_connection() as conn:
+        c = conn.cursor()
+        for entry_id in entry_ids:
+            c.execute('SELECT metadata FROM update_history WHERE id=?', (entry_id,))
+            row = c.fetchone()
+            if not row:
+                continue
+            try:
+                metadata = json.loads(row['metadata']) if row['metadata'] else {}
+            except Exception:
+                metadata = {}
+            metadata['rollback_ready'] = False
+            metadata['rollback_unavailable_reason'] = reason
+            c.execute('UPDATE update_history SET metadata=? WHERE id=?', (json.dumps(metadata), entry_id))
+            updated += 1
+        conn.commit()
+    return updated
+
+
 def list_update_history(limit=100):
-    purge_expired_update_history()
-    conn = get_db()
-    c = conn.cursor()
-    c.execute(
-        '''
-        SELECT id, created_at, actor_username, action, target_type, target_id, target_name,
-               previous_version, new_version, result, notes, metadata, rollback_of
-        FROM update_history
-        ORDER BY created_at DESC, id DESC
-        LIMIT ?
-        ''',
-        (int(limit),),
-    )
-    rows = []
-    for row in c.fetchall():
-        try:
-            metadata = json.loads(row['metadata']) if row['metadata'] else {}
-        except Exception:
-            metadata = {}
-        rows.append({
-            'id': row['id'],
-            'created_at': row['created_at'],
-            'actor_username': row['actor_username'],
-            'action': row['action'],
-            'target_type': row['target_type'],
-            'target_id': row['target_id'],
-            'target_name': row['target_name'],
-            'previous_version': row['previous_version'],
-            'new_version': row['new_version'],
-            'result': row['result'],
-            'notes': row['notes'],
-            'metadata': metadata,
-            'rollback_of': row['rollback_of'],
-        })
-    conn.close()
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute(
+            f'''
+            SELECT {_UPDATE_HISTORY_COLUMNS}
+            FROM update_history
+            WHERE created_at >= ?
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+            ''',
+            (_update_history_cutoff(), int(limit)),
+        )
+        rows = [_update_history_entry_from_row(row) for row in c.fetchall()]
     return rows
 
 
+def list_update_history_with_rollback_state(limit=100):
+    """Latest history entries plus a rolled_back flag, in one indexed query.
+
+    limit=None returns every entry still inside the retention window.
+    """
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute(
+            f'''
+            SELECT {_UPDATE_HISTORY_COLUMNS},
+                   EXISTS (SELECT 1 FROM update_history AS rb WHERE rb.rollback_of = update_history.id) AS rolled_back
+            FROM update_history
+            WHERE created_at >= ?
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+            ''',
+            (_update_history_cutoff(), -1 if limit is None else int(limit)),
+        )
+        rows = []
+        for row in c.fetchall():
+            entry = _update_history_entry_from_row(row)
+            entry['rolled_back'] = bool(row['rolled_back'])
+            rows.append(entry)
+    return rows
+
+
+def latest_update_history_id():
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute('SELECT MAX(id) FROM update_history')
+        row = c.fetchone()
+    return row[0] if row else None
+
+
 def list_latest_successful_update_timestamps():
-    purge_expired_update_history()
-    conn = get_db()
-    c = conn.cursor()
-    c.execute(
-        '''
-        SELECT target_type, target_name, MAX(created_at) AS last_updated_at
-        FROM update_history
-        WHERE action='update' AND result='success'
-        GROUP BY target_type, target_name
-        '''
-    )
-    rows = {
-        (row['target_type'], row['target_name']): row['last_updated_at']
-        for row in c.fetchall()
-    }
-    conn.close()
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute(
+            '''
+            SELECT target_type, target_name, MAX(created_at) AS last_updated_at
+            FROM update_history
+            WHERE action='update' AND result='success' AND created_at >= ?
+            GROUP BY target_type, target_name
+            ''',
+            (_update_history_cutoff(),),
+        )
+        rows = {
+            (row['target_type'], row['target_name']): row['last_updated_at']
+            for row in c.fetchall()
+        }
     return rows
+
+
+# --- Update check persistence ---
+def save_update_check(container_id, image_ref, update_available, details, checked_at):
+    with db_connection() as conn:
+        conn.execute(
+            'INSERT OR REPLACE INTO update_checks (container_id, image_ref, update_available, details, checked_at) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (
+                container_id,
+                image_ref,
+                None if update_available is None else int(bool(update_available)),
+                json.dumps(details or {}, sort_keys=True, default=str),
+                float(checked_at),
+            ),
+        )
+        conn.commit()
+
+
+def load_update_checks():
+    """Return {container_id: {'update_available', 'details', 'checked_at'}} for every stored check."""
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute('SELECT container_id, update_available, details, checked_at FROM update_checks')
+        checks = {}
+        for row in c.fetchall():
+            try:
+                details = json.loads(row['details']) if row['details'] else {}
+            except Exception:
+                details = {}
+            update_available = row['update_available']
+            checks[row['container_id']] = {
+                'update_available': None if update_available is None else bool(update_available),
+                'details': details,
+                'checked_at': row['checked_at'],
+            }
+    return checks
+
+
+def delete_update_checks(container_ids):
+    container_ids = list(container_ids or [])
+    if not container_ids:
+        return
+    with db_connection() as conn:
+        conn.executemany('DELETE FROM update_checks WHERE container_id=?', [(cid,) for cid in container_ids])
+        conn.commit()
+
+
+# --- Update job persistence ---
+_UPDATE_JOB_FIELDS = (
+    'id', 'target_type', 'target_id', 'target_name', 'registry', 'priority', 'source', 'state',
+    'message', 'history_entry_id', 'created_at', 'started_at', 'finished_at',
+    'actor_username', 'actor_role', 'remote_addr',
+)
+
+
+def save_update_job(job):
+    with db_connection() as conn:
+        conn.execute(
+            f"INSERT OR REPLACE INTO update_jobs ({', '.join(_UPDATE_JOB_FIELDS)}) "
+            f"VALUES ({', '.join('?' for _ in _UPDATE_JOB_FIELDS)})",
+            tuple(job.get(field) for field in _UPDATE_JOB_FIELDS),
+        )
+        conn.commit()
+
+
+def list_update_jobs(limit=100, states=None):
+    """Newest-first update jobs, optionally restricted to the given states."""
+    params = []
+    where = ''
+    if states:
+        states = list(states)
+        where = f"WHERE state IN ({', '.join('?' for _ in states)})"
+        params.extend(states)
+    params.append(int(limit))
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute(
+            f"SELECT {', '.join(_UPDATE_JOB_FIELDS)} FROM update_jobs {where} ORDER BY created_at DESC, id DESC LIMIT ?",
+            params,
+        )
+        jobs = [{field: row[field] for field in _UPDATE_JOB_FIELDS} for row in c.fetchall()]
+    return jobs
+
+
+def get_update_job(job_id):
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute(f"SELECT {', '.join(_UPDATE_JOB_FIELDS)} FROM update_jobs WHERE id=?", (str(job_id),))
+        row = c.fetchone()
+    if not row:
+        return None
+    return {field: row[field] for field in _UPDATE_JOB_FIELDS}
+
+
+def trim_finished_update_jobs(keep=200):
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute(
+            """
+            DELETE FROM update_jobs
+            WHERE state NOT IN ('queued', 'running')
+              AND id NOT IN (
+                  SELECT id FROM update_jobs WHERE state NOT IN ('queued', 'running')
+                  ORDER BY created_at DESC LIMIT ?
+              )
+            """,
+            (int(keep),),
+        )
+        conn.commit()
+        deleted = c.rowcount
+    return deleted